@@ -20,9 +20,42 @@ from snapshot import (
     Edge,
     SnapshotEntity)
 
+from deep_json import (
+    DeepJsonDecoder,
+    DeepJsonEncoder)
+
+from snapshot_size_policy import SnapshotSizePolicy
+
 from record_stream import (
+    MappedRecordInputStream,
     RecordInputStream,
-    RecordOutputStream)
+    RecordOutputStream,
+    map_record_file)
+
+from entity_interning import (
+    InternedEntityResolver,
+    SnapshotEntityInterner)
+
+from compressed_stream import (
+    GzipInputStream,
+    GzipOutputStream,
+    can_detect_compression,
+    make_compressed_output_stream,
+    open_possibly_compressed)
+
+from journal_codec import (
+    JournalCodec,
+    JsonJournalCodec,
+    MsgpackJournalCodec,
+    decode_journal_header,
+    encode_journal_header,
+    make_journal_codec,
+    register_journal_codec)
+
+from journal_index import (
+    JournalIndex,
+    JournalIndexContext,
+    index_path_for_journal)
 
 from journal import Journal
 from journal_logger import (
@@ -35,6 +68,10 @@ from global_journal import (
     set_global_journal,
     unset_global_journal)
 
+from json_diff import (
+    apply_json_diff,
+    diff_json)
+
 from json_scrubber import JsonScrubber
 from base_test_case import BaseTestCase
 from test_runner import TestRunner
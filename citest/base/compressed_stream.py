@@ -0,0 +1,226 @@
+# Copyright 2015 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Implements streams that transparently compress the data written into them.
+
+The output streams compress each write() as its own chunk and flush it
+through to the underlying stream. When each write is a complete record frame,
+a file truncated by a crash can still be decompressed up to the last complete
+frame. The input streams decompress as much as is available and treat a
+truncated file as the end of the stream so the record layer can report any
+incomplete frame at the end.
+
+Readers detect the compression from the magic bytes at the start of the file
+so that compressed and uncompressed files can be opened the same way.
+"""
+
+import os
+import zlib
+
+
+class GzipOutputStream(object):
+  """Writes data into a delegate stream using gzip compression."""
+
+  # The magic bytes starting every gzip stream.
+  MAGIC = '\x1f\x8b'
+
+  @property
+  def stream(self):
+    """Returns the delegate stream being written to."""
+    return self.__stream
+
+  def __init__(self, stream, compresslevel=6):
+    """Constructor.
+
+    Args:
+      stream: [stream] The stream to write the compressed data into.
+      compresslevel: [int] The zlib compression level from 1 (fastest)
+         to 9 (smallest).
+    """
+    self.__stream = stream
+    # The wbits offset of 16 tells zlib to use a gzip header and trailer.
+    self.__compressor = zlib.compressobj(
+        compresslevel, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+  def write(self, data):
+    """Compresses data as a chunk that can be decompressed on its own.
+
+    The compression history is retained across chunks so repetitive data
+    among chunks still compresses well.
+
+    Args:
+      data: [string] The data to write.
+    """
+    self.__stream.write(self.__compressor.compress(data)
+                        + self.__compressor.flush(zlib.Z_SYNC_FLUSH))
+
+  def flush(self):
+    """Flushes the delegate stream."""
+    flush = getattr(self.__stream, 'flush', None)
+    if flush is not None:
+      flush()
+
+  def close(self):
+    """Writes the gzip trailer then closes the delegate stream."""
+    self.__stream.write(self.__compressor.flush(zlib.Z_FINISH))
+    self.__stream.close()
+
+
+class GzipInputStream(object):
+  """Reads gzip compressed data from a delegate stream."""
+
+  # The number of compressed bytes to read from the delegate at a time.
+  READ_SIZE = 64 * 1024
+
+  @property
+  def stream(self):
+    """Returns the delegate stream being read from."""
+    return self.__stream
+
+  def __init__(self, stream):
+    """Constructor.
+
+    Args:
+      stream: [stream] The stream to read the compressed data from.
+    """
+    self.__stream = stream
+    self.__decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    self.__buffer = ''
+    self.__offset = 0
+    self.__position = 0
+
+  def close(self):
+    """Closes the delegate stream."""
+    self.__stream.close()
+
+  def tell(self):
+    """Returns the current offset into the decompressed data."""
+    return self.__position
+
+  def seek(self, offset):
+    """Positions the stream at an offset into the decompressed data.
+
+    Gzip does not support random access, so this decompresses up to the
+    offset, starting over from the beginning if seeking backwards.
+
+    Args:
+      offset: [int] The offset into the decompressed data.
+    """
+    if offset < self.__position:
+      self.__stream.seek(0)
+      self.__decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+      self.__buffer = ''
+      self.__offset = 0
+      self.__position = 0
+
+    while self.__position < offset:
+      if not self.read(min(offset - self.__position, self.READ_SIZE)):
+        break
+
+  def read(self, size=-1):
+    """Reads decompressed data.
+
+    Args:
+      size: [int] The maximum number of bytes to read, or negative for all.
+
+    Returns:
+      The decompressed data, which is shorter than size only at the end
+      of the data. The data ends early if the compressed data was truncated.
+    """
+    while size < 0 or len(self.__buffer) - self.__offset < size:
+      compressed = self.__stream.read(self.READ_SIZE)
+      if not compressed:
+        # Forget reaching the end of the file in case the file is still
+        # being written, so that later reads see the data written since.
+        self.__stream.seek(self.__stream.tell())
+        break
+      self.__buffer = (self.__buffer[self.__offset:]
+                       + self.__decompress(compressed))
+      self.__offset = 0
+
+    end = len(self.__buffer) if size < 0 else self.__offset + size
+    result = self.__buffer[self.__offset:end]
+    self.__offset += len(result)
+    self.__position += len(result)
+    return result
+
+  def __decompress(self, compressed):
+    """Decompress the next block of data, which may span gzip members."""
+    fragments = []
+    while compressed:
+      fragments.append(self.__decompressor.decompress(compressed))
+      compressed = self.__decompressor.unused_data
+      if compressed:
+        # Concatenated gzip files are a valid gzip file.
+        self.__decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    return ''.join(fragments)
+
+
+# Output stream classes keyed by the compression name.
+_OUTPUT_STREAM_CLASSES = {
+    'gzip': GzipOutputStream
+}
+
+# Input stream classes keyed by the magic bytes identifying them.
+_INPUT_STREAM_CLASSES = {
+    GzipOutputStream.MAGIC: GzipInputStream
+}
+
+
+def make_compressed_output_stream(compression, stream):
+  """Wraps a stream to compress the data written into it.
+
+  Args:
+    compression: [string] The name of the compression (e.g. 'gzip').
+    stream: [stream] The stream to write the compressed data into.
+
+  Raises:
+    KeyError if the compression is not known.
+  """
+  stream_class = _OUTPUT_STREAM_CLASSES.get(compression)
+  if stream_class is None:
+    raise KeyError('Unknown compression "{0}"'.format(compression))
+  return stream_class(stream)
+
+
+def can_detect_compression(path):
+  """Determines whether a file is long enough to tell if it is compressed.
+
+  This is only a concern for files that are still being written.
+
+  Args:
+    path: [string] The path to the file to check.
+  """
+  magic_len = max(len(magic) for magic in _INPUT_STREAM_CLASSES)
+  return os.path.getsize(path) >= magic_len
+
+
+def open_possibly_compressed(path):
+  """Opens a file for reading, decompressing it if it is compressed.
+
+  Args:
+    path: [string] The path to the file to open.
+
+  Returns:
+    A stream reading the uncompressed file contents.
+  """
+  stream = open(path, 'rb')
+  magic_len = max(len(magic) for magic in _INPUT_STREAM_CLASSES)
+  magic = stream.read(magic_len)
+  stream.seek(0)
+  for prefix, stream_class in _INPUT_STREAM_CLASSES.items():
+    if magic.startswith(prefix):
+      return stream_class(stream)
+  return stream
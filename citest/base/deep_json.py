@@ -0,0 +1,242 @@
+# Copyright 2015 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""JSON encoding and decoding of values nested deeper than the recursion limit.
+
+The standard json module recurses once per level of nesting, so raises a
+RuntimeError on values nested deeper than the interpreter's recursion limit.
+The classes here use the standard implementation first since it is much
+faster, and only fall back to one using an explicit stack when that fails.
+Both produce the same results.
+"""
+
+import json
+import re
+
+from json.decoder import scanstring
+from json.encoder import (encode_basestring, encode_basestring_ascii)
+
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_NUMBER = re.compile(r'(-?(?:0|[1-9]\d*))(\.\d+)?([eE][-+]?\d+)?')
+_CONSTANTS = [('null', None), ('true', True), ('false', False),
+              ('NaN', float('nan')), ('Infinity', float('inf')),
+              ('-Infinity', float('-inf'))]
+
+
+class DeepJsonEncoder(json.JSONEncoder):
+  """A json.JSONEncoder that can encode arbitrarily nested values."""
+
+  def encode(self, o):
+    """Overrides json.JSONEncoder."""
+    try:
+      return super(DeepJsonEncoder, self).encode(o)
+    except RuntimeError:
+      return ''.join(self.__iterencode(o))
+
+  def __iterencode(self, o):
+    """Encodes o into a list of chunks using an explicit stack."""
+    chunks = []
+    encode_string = (encode_basestring_ascii if self.ensure_ascii
+                     else encode_basestring)
+    # Each element is a [container, iterator over its items, is first item].
+    stack = []
+    # The ids of the containers in the stack, to detect cycles.
+    markers = set([])
+
+    def begin_value(value):
+      """Appends a value or, if it is a non-empty container, begins it."""
+      while True:
+        if isinstance(value, basestring):
+          if isinstance(value, str) and self.encoding != 'utf-8':
+            value = value.decode(self.encoding)
+          chunks.append(encode_string(value))
+        elif value is None or value is True or value is False:
+          chunks.append(json.dumps(value))
+        elif isinstance(value, (int, long)):
+          chunks.append(str(value))
+        elif isinstance(value, float):
+          chunks.append(self.__float_to_string(value))
+        elif isinstance(value, (list, tuple, dict)):
+          is_dict = isinstance(value, dict)
+          if not value:
+            chunks.append('{}' if is_dict else '[]')
+            return
+          if self.check_circular:
+            if id(value) in markers:
+              raise ValueError('Circular reference detected')
+            markers.add(id(value))
+          chunks.append('{' if is_dict else '[')
+          items = value.items() if is_dict else value
+          if is_dict and self.sort_keys:
+            items = sorted(items)
+          stack.append([value, iter(items), True])
+        else:
+          value = self.default(value)
+          continue
+        return
+
+    begin_value(o)
+    while stack:
+      entry = stack[-1]
+      try:
+        item = next(entry[1])
+      except StopIteration:
+        stack.pop()
+        markers.discard(id(entry[0]))
+        if self.indent is not None:
+          chunks.append('\n' + ' ' * (self.indent * len(stack)))
+        chunks.append('}' if isinstance(entry[0], dict) else ']')
+        continue
+
+      if not entry[2]:
+        chunks.append(self.item_separator)
+      entry[2] = False
+      if self.indent is not None:
+        chunks.append('\n' + ' ' * (self.indent * len(stack)))
+
+      if isinstance(entry[0], dict):
+        key, item = item
+        key = self.__key_to_string(key)
+        if key is None:
+          continue
+        chunks.append(encode_string(key))
+        chunks.append(self.key_separator)
+      begin_value(item)
+
+    return chunks
+
+  def __float_to_string(self, value):
+    """Encodes a float the same way as json.JSONEncoder."""
+    if value != value:
+      text = 'NaN'
+    elif value == float('inf'):
+      text = 'Infinity'
+    elif value == float('-inf'):
+      text = '-Infinity'
+    else:
+      return repr(value)
+    if not self.allow_nan:
+      raise ValueError(
+          'Out of range float values are not JSON compliant: ' + repr(value))
+    return text
+
+  def __key_to_string(self, key):
+    """Returns the string for a dictionary key or None to skip it."""
+    if isinstance(key, basestring):
+      return key
+    if isinstance(key, float):
+      return self.__float_to_string(key)
+    if key is None or key is True or key is False:
+      return json.dumps(key)
+    if isinstance(key, (int, long)):
+      return str(key)
+    if self.skipkeys:
+      return None
+    raise TypeError('key {0!r} is not a string'.format(key))
+
+
+class DeepJsonDecoder(json.JSONDecoder):
+  """A json.JSONDecoder that can decode arbitrarily nested documents.
+
+  The fallback decoder supports only the default decoding options.
+  """
+
+  def decode(self, s, _w=None):
+    """Overrides json.JSONDecoder."""
+    try:
+      return super(DeepJsonDecoder, self).decode(s)
+    except RuntimeError:
+      return _decode_with_stack(s, self.encoding, self.strict)
+
+
+def _decode_with_stack(text, encoding, strict):
+  """Decodes a JSON document using an explicit stack.
+
+  Args:
+    text: [string] The JSON document.
+    encoding: [string] The encoding of text if it is a str.
+    strict: [bool] Whether control characters are disallowed in strings.
+  """
+  def skip_whitespace(index):
+    """Returns the index of the next non-whitespace character."""
+    return _WHITESPACE.match(text, index).end()
+
+  def expect(index, char):
+    """Returns the index after the expected character."""
+    if text[index:index + 1] != char:
+      raise ValueError('Expecting {0!r} at char {1}'.format(char, index))
+    return index + 1
+
+  def decode_key(index):
+    """Returns the dictionary key at index and the index of its value."""
+    key, index = scanstring(text, expect(index, '"'), encoding, strict)
+    index = expect(skip_whitespace(index), ':')
+    return key, skip_whitespace(index)
+
+  # Each element is a [container, the key for the next value if a dict].
+  stack = []
+  index = skip_whitespace(0)
+  while True:
+    char = text[index:index + 1]
+    if char in ('{', '['):
+      container = {} if char == '{' else []
+      index = skip_whitespace(index + 1)
+      if text[index:index + 1] == ('}' if char == '{' else ']'):
+        value = container
+        index += 1
+      else:
+        stack.append([container, None])
+        if char == '{':
+          stack[-1][1], index = decode_key(index)
+        continue
+    elif char == '"':
+      value, index = scanstring(text, index + 1, encoding, strict)
+    else:
+      match = _NUMBER.match(text, index)
+      if match and match.end() > index:
+        integer, fraction, exponent = match.groups()
+        value = (float(integer + (fraction or '') + (exponent or ''))
+                 if fraction or exponent
+                 else int(integer))
+        index = match.end()
+      else:
+        for name, value in _CONSTANTS:
+          if text.startswith(name, index):
+            index += len(name)
+            break
+        else:
+          raise ValueError('No JSON object could be decoded at char {0}'
+                           .format(index))
+
+    # Add the completed value to its container, completing those it ends.
+    while True:
+      if not stack:
+        if skip_whitespace(index) != len(text):
+          raise ValueError('Extra data at char {0}'.format(index))
+        return value
+      container, key = stack[-1]
+      if isinstance(container, dict):
+        container[key] = value
+      else:
+        container.append(value)
+      index = skip_whitespace(index)
+      char = text[index:index + 1]
+      if char == ',':
+        index = skip_whitespace(index + 1)
+        if isinstance(container, dict):
+          stack[-1][1], index = decode_key(index)
+        break
+      index = expect(index, '}' if isinstance(container, dict) else ']')
+      value = stack.pop()[0]
@@ -0,0 +1,556 @@
+# Copyright 2015 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Deduplicates snapshot entities written into a journal by their content.
+
+The same objects (e.g. contract clauses and their specifications) tend to be
+stored into a journal over and over again, each time within a new snapshot.
+When interning, each entity is identified by a hash of its content, which
+includes the content of all the entities it references. Entities whose hash
+was already written earlier in the journal are replaced by a stub naming the
+hash, and the entities only referenced through stubs are omitted entirely.
+
+Written entities are annotated with a '_hash' attribute. Stubs are entities
+with only an '_id' and an '_interned' attribute naming the hash of the
+entity they stand in for. Readers resolve the stubs by copying the earlier
+entities back into the snapshot so that the snapshot is complete again.
+
+Entities within reference cycles can only be interned together with the
+entity that the cycle was entered through, since their content depends on
+where the cycle was entered.
+
+The interner only remembers a bounded number of hashes. When it forgets one
+it lists the hash in the '_released' attribute of the snapshot it is writing
+so that readers can forget the entity too, other than where it is still
+needed to copy the interned entities referencing it.
+
+Interning only reduces the size of the journal. The snapshots are still
+built in full before being interned, and hashing their entities adds to the
+time it takes to write each of them.
+"""
+
+import collections
+import hashlib
+
+from .deep_json import DeepJsonEncoder
+
+
+def remap_entity_references(entity, remap):
+  """Returns a copy of a JSON entity with its entity references replaced.
+
+  Args:
+    entity: [dict] The JSON encoded SnapshotEntity.
+    remap: [callable] Takes a referenced entity id and returns the value
+       to replace it with.
+  """
+  result = dict(entity)
+  edges = entity.get('_edges')
+  if edges:
+    remapped_edges = []
+    for edge in edges:
+      edge = dict(edge)
+      if '_to' in edge:
+        edge['_to'] = remap(edge['_to'])
+      if '_value' in edge:
+        edge['_value'] = _remap_value_references(edge['_value'], remap)
+      remapped_edges.append(edge)
+    result['_edges'] = remapped_edges
+  return result
+
+
+def referenced_entity_ids(entity):
+  """Returns the list of entity ids that a JSON entity references.
+
+  Args:
+    entity: [dict] The JSON encoded SnapshotEntity.
+  """
+  result = []
+  def collect(entity_id):
+    """Collects the referenced id without changing it."""
+    result.append(entity_id)
+    return entity_id
+  remap_entity_references(entity, collect)
+  return result
+
+
+def _remap_value_references(value, remap):
+  """Returns a copy of an edge value with its entity references replaced.
+
+  Values are copied using an explicit stack so they can be nested deeper
+  than the recursion limit.
+
+  Args:
+    value: [any] The JSON encoded value of an edge.
+    remap: [callable] See remap_entity_references().
+  """
+  def copy(value):
+    """Returns a copy of value to be filled in, or value if it is a leaf."""
+    if isinstance(value, list):
+      result = [None] * len(value)
+    elif isinstance(value, dict):
+      result = dict(value)
+      if value.get('_type') == 'EntityReference':
+        result['_id'] = remap(value['_id'])
+        return result
+    else:
+      return value
+    pending.append((value, result))
+    return result
+
+  pending = []
+  root = copy(value)
+  while pending:
+    source, result = pending.pop()
+    keys = range(len(source)) if isinstance(source, list) else source.keys()
+    for key in keys:
+      result[key] = copy(source[key])
+  return root
+
+
+class SnapshotEntityInterner(object):
+  """Interns the entities in snapshots as they are written into a journal.
+
+  The interner remembers the hashes of the entities it has written so it
+  needs to see every snapshot in the order they are written. It forgets the
+  least recently used hashes once it remembers more than max_interned.
+
+  Hashing the entities does not depend on what was written before, so
+  hash_snapshot() may be called from any thread ahead of intern_snapshot().
+  """
+
+  # The default number of hashes to remember.
+  DEFAULT_MAX_INTERNED = 1000
+
+  # Marks entities referring to a cycle that is no longer being hashed.
+  _OUTSIDE_CYCLE = object()
+
+  @property
+  def num_interned(self):
+    """The number of distinct entity hashes currently remembered."""
+    return len(self.__written_hashes)
+
+  def __init__(self, max_interned=DEFAULT_MAX_INTERNED):
+    """Constructor.
+
+    Args:
+      max_interned: [int] The number of hashes to remember, or None to
+         remember them all.
+    """
+    self.__max_interned = max_interned
+    # The remembered hashes, least recently used first.
+    self.__written_hashes = collections.OrderedDict()
+    self.__encoder = DeepJsonEncoder(sort_keys=True, separators=(',', ':'))
+
+  def hash_snapshot(self, snapshot):
+    """Determines the content hash of each entity in a snapshot.
+
+    Args:
+      snapshot: [dict] The JSON encoded JsonSnapshot to be written.
+
+    Returns:
+      Dictionary of hashes keyed by entity id, to pass to intern_snapshot().
+      Entities that cannot be interned because they are within a reference
+      cycle are omitted.
+    """
+    return self.__hash_entities(snapshot.get('_entities') or {})
+
+  def intern_snapshot(self, snapshot, hashes=None):
+    """Interns the entities in a snapshot.
+
+    Args:
+      snapshot: [dict] The JSON encoded JsonSnapshot about to be written.
+      hashes: [dict] The hash_snapshot() of the snapshot, if already known.
+
+    Returns:
+      A copy of the snapshot with interned entities replaced by stubs and
+      the hashes forgotten while interning it listed in '_released'.
+    """
+    entities = snapshot.get('_entities')
+    if not entities:
+      return snapshot
+
+    if hashes is None:
+      hashes = self.__hash_entities(entities)
+    stubs = set([entity_id for entity_id, digest in hashes.items()
+                 if digest in self.__written_hashes])
+
+    # Keep only the entities still reachable without going through a stub.
+    referenced = set([])
+    for entity in entities.values():
+      referenced.update(referenced_entity_ids(entity))
+    roots = [entity_id for entity_id in entities
+             if entity_id not in referenced]
+    roots.append(snapshot['_subject_id'])
+
+    keep = set([])
+    pending = roots
+    while pending:
+      entity_id = pending.pop()
+      if entity_id in keep:
+        continue
+      keep.add(entity_id)
+      if entity_id not in stubs:
+        pending.extend(referenced_entity_ids(entities[entity_id]))
+
+    interned = {}
+    for entity_id in keep:
+      digest = hashes.get(entity_id)
+      if entity_id in stubs:
+        interned[entity_id] = {'_id': entity_id, '_interned': digest}
+      elif digest is not None:
+        entity = dict(entities[entity_id])
+        entity['_hash'] = digest
+        interned[entity_id] = entity
+      else:
+        interned[entity_id] = entities[entity_id]
+
+    for entity_id in keep:
+      digest = hashes.get(entity_id)
+      if digest is not None:
+        # Remembered as the most recently used.
+        self.__written_hashes.pop(digest, None)
+        self.__written_hashes[digest] = True
+
+    released = []
+    while (self.__max_interned is not None
+           and len(self.__written_hashes) > self.__max_interned):
+      released.append(self.__written_hashes.popitem(last=False)[0])
+
+    result = dict(snapshot)
+    result['_entities'] = interned
+    if released:
+      result['_released'] = released
+    return result
+
+  def __hash_entities(self, entities):
+    """Determines the content hash of each entity that can be interned.
+
+    Args:
+      entities: [dict] The JSON encoded entities keyed by their id.
+
+    Returns:
+      Dictionary of hashes keyed by entity id. Entities that cannot be
+      interned because they are within a reference cycle are omitted.
+    """
+    hashes = {}
+    cycle_roots = {}
+    for entity_id in sorted(entities.keys()):
+      if entity_id not in hashes:
+        self.__hash_entity(entity_id, entities, {}, hashes, cycle_roots)
+    return {entity_id: digest for entity_id, digest in hashes.items()
+            if cycle_roots[entity_id] is None}
+
+  def __hash_entity(self, entity_id, entities, depths, hashes, cycle_roots):
+    """Computes the hash of an entity after those it references.
+
+    References back to entities still being hashed are encoded relative to
+    the current depth, and make the referencing entities uninternable.
+
+    Args:
+      entity_id: [int] The entity to hash.
+      entities: [dict] The JSON encoded entities keyed by their id.
+      depths: [dict] The depth of each entity currently being hashed.
+      hashes: [dict] The hash of each entity hashed so far.
+      cycle_roots: [dict] For each hashed entity within a reference cycle,
+         the id of the shallowest entity being hashed that it refers back
+         to, or the _OUTSIDE_CYCLE marker if that is no longer being hashed.
+         None for entities that are not within a cycle.
+    """
+    depth = len(depths)
+    depths[entity_id] = depth
+    root = [None]
+
+    def refer_to(target_id):
+      """Notes a reference back to target_id, which is being hashed."""
+      if target_id not in depths:
+        root[0] = self._OUTSIDE_CYCLE
+      elif (root[0] is None
+            or (root[0] != self._OUTSIDE_CYCLE
+                and depths[target_id] < depths[root[0]])):
+        root[0] = target_id
+
+    def to_token(target_id):
+      """Returns the content denoting a reference to target_id."""
+      if target_id in depths:
+        refer_to(target_id)
+        return '^{0}'.format(depth - depths[target_id])
+      if target_id not in hashes:
+        self.__hash_entity(target_id, entities, depths, hashes, cycle_roots)
+      target_root = cycle_roots[target_id]
+      if target_root is not None:
+        refer_to(target_root)
+      return '#' + hashes[target_id]
+
+    content = remap_entity_references(entities[entity_id], to_token)
+    del content['_id']
+    hashes[entity_id] = hashlib.sha1(self.__encoder.encode(content)).hexdigest()
+
+    del depths[entity_id]
+    cycle_roots[entity_id] = root[0] if root[0] != entity_id else None
+
+
+class InternedEntityResolver(object):
+  """Resolves the interned entity stubs in snapshots read from a journal.
+
+  The resolver remembers the entities it has seen so it needs to see every
+  snapshot in the order they were written. Stubs written by snapshots that
+  were not seen, such as when seeking within the journal, can only be
+  resolved by looking up the snapshot that wrote the interned entity.
+
+  Each remembered entity is kept together with the entities it references
+  that were not interned themselves. Interned entities that it references are
+  kept by their hash for as long as an entity referencing them is kept.
+  """
+
+  def __init__(self, lookup_snapshot=None):
+    """Constructor.
+
+    Args:
+      lookup_snapshot: [callable] If provided, takes the hash of an interned
+         entity and returns the JSON snapshot entry that wrote it, or None
+         if it is not known. See JournalNavigator.find_interned_snapshot().
+    """
+    self.__lookup_snapshot = lookup_snapshot
+
+    # The _InternedRecord of each hashed entity keyed by its hash.
+    self.__records = {}
+
+    # The number of records referencing each hash in __records.
+    self.__ref_counts = {}
+
+    # The hashes that the interner still remembers so might stub again.
+    self.__live_hashes = set([])
+
+  @property
+  def num_remembered(self):
+    """The number of distinct entity hashes currently remembered."""
+    return len(self.__records)
+
+  def resolve_entities(self, entity_map, released=None):
+    """Resolves the stubs in the entities of a snapshot in place.
+
+    Args:
+      entity_map: [dict] The JSON encoded entities in a snapshot keyed by id.
+      released: [list of string] The '_released' hashes of the snapshot.
+
+    Raises:
+      KeyError if a stub refers to an entity that was not seen before
+      and cannot be looked up.
+    """
+    records = _make_records(entity_map)
+    looked_up = {}
+    stubs = [(key, entity) for key, entity in entity_map.items()
+             if '_interned' in entity]
+    if stubs:
+      string_keys = any(isinstance(key, basestring) for key in entity_map)
+      next_id = [max(int(key) for key in entity_map) + 1]
+
+      def allocate_id():
+        """Allocates an unused entity id in the entity map."""
+        entity_id = next_id[0]
+        next_id[0] += 1
+        return entity_id
+
+      for key, stub in stubs:
+        self.__copy_interned(stub['_interned'], stub['_id'], key,
+                             entity_map, string_keys, allocate_id, looked_up)
+
+    self.__remember(records, looked_up)
+    for entity in entity_map.values():
+      entity.pop('_hash', None)
+    for digest in released or []:
+      self.__live_hashes.discard(digest)
+      self.__forget_unreferenced(digest)
+
+  def __remember(self, records, looked_up):
+    """Remembers the entities written in full by the interner.
+
+    Args:
+      records: [dict] The _InternedRecord of each entity written in full.
+      looked_up: [dict] See __find_record(). Those referenced by the records
+         are remembered too, for as long as they are referenced.
+    """
+    self.__live_hashes.update(records.keys())
+    added = {}
+    pending = records.items()
+    while pending:
+      digest, record = pending.pop()
+      # Already remembered if rewritten after being released while still
+      # being referenced.
+      if digest in self.__records or digest in added:
+        continue
+      added[digest] = record
+      for target_digest in set(record.references.values()):
+        if target_digest not in self.__records:
+          pending.append((target_digest, records.get(target_digest)
+                          or looked_up[target_digest]))
+
+    self.__records.update(added)
+    for digest in added:
+      self.__ref_counts[digest] = 0
+    for digest, record in added.items():
+      for target_digest in set(record.references.values()):
+        self.__ref_counts[target_digest] += 1
+
+  def __forget_unreferenced(self, digest):
+    """Forgets an entity, and those it references, if no longer needed."""
+    pending = [digest]
+    while pending:
+      digest = pending.pop()
+      if (digest in self.__live_hashes
+          or self.__ref_counts.get(digest, 1) > 0):
+        continue
+      record = self.__records.pop(digest)
+      del self.__ref_counts[digest]
+      for target_digest in set(record.references.values()):
+        self.__ref_counts[target_digest] -= 1
+        pending.append(target_digest)
+
+  def __find_record(self, digest, looked_up):
+    """Returns the _InternedRecord for a hash.
+
+    Args:
+      digest: [string] The hash of the interned entity.
+      looked_up: [dict] The records from snapshots looked up so far while
+         resolving the current snapshot, keyed by their hash.
+    """
+    record = self.__records.get(digest) or looked_up.get(digest)
+    if record is not None:
+      return record
+
+    snapshot = (self.__lookup_snapshot(digest)
+                if self.__lookup_snapshot is not None
+                else None)
+    if snapshot is not None:
+      # These are only kept while resolving the current snapshot because
+      # the releases in the snapshots that were not seen are not known.
+      looked_up.update(_make_records(snapshot.get('_entities', {})))
+    if digest not in looked_up:
+      raise KeyError(
+          'Interned entity {0} was written by a journal entry that was not'
+          ' read. Read the journal from the start, or look up the entry'
+          ' using the journal index.'.format(digest))
+    return looked_up[digest]
+
+  def __copy_interned(self, digest, entity_id, key, entity_map,
+                      string_keys, allocate_id, looked_up):
+    """Copies an interned entity and the entities it references into a map.
+
+    Args:
+      digest: [string] The hash of the interned entity.
+      entity_id: [int] The id to give the copy of the interned entity.
+      key: [int or string] The key for the copy within entity_map.
+      entity_map: [dict] The entity map to copy into.
+      string_keys: [bool] Whether entity_map is keyed by strings.
+      allocate_id: [callable] Allocates new entity ids within entity_map.
+      looked_up: [dict] See __find_record().
+    """
+    record = self.__find_record(digest, looked_up)
+    # Copies are keyed by the hash of the record and the id within it.
+    copied_ids = {(digest, record.entity_id): entity_id}
+    pending = [(digest, record.entity_id)]
+
+    while pending:
+      source_digest, source_entity_id = pending.pop()
+      record = self.__find_record(source_digest, looked_up)
+
+      def remap(source_target_id):
+        """Returns the id of the copy of the referenced entity."""
+        # pylint: disable=cell-var-from-loop
+        target_digest = record.references.get(source_target_id)
+        if target_digest is None:
+          source_target = (record.digest, source_target_id)
+        else:
+          source_target = (
+              target_digest,
+              self.__find_record(target_digest, looked_up).entity_id)
+        target_id = copied_ids.get(source_target)
+        if target_id is None:
+          target_id = allocate_id()
+          copied_ids[source_target] = target_id
+          pending.append(source_target)
+        return target_id
+
+      copy = remap_entity_references(
+          record.entities[source_entity_id], remap)
+      copy.pop('_hash', None)
+      copy['_id'] = copied_ids[(source_digest, source_entity_id)]
+      if copy['_id'] == entity_id:
+        copy_key = key
+      else:
+        copy_key = str(copy['_id']) if string_keys else copy['_id']
+      entity_map[copy_key] = copy
+
+
+class _InternedRecord(object):
+  """An interned entity together with what is needed to copy it."""
+
+  def __init__(self, digest, entity_id, entities, references):
+    """Constructor.
+
+    Args:
+      digest: [string] The hash of the interned entity.
+      entity_id: [int] The id of the interned entity within entities.
+      entities: [dict] The interned entity and the entities it references,
+         directly or indirectly, that were not interned themselves.
+      references: [dict] The hash of each interned entity referenced by
+         those in entities, keyed by the id it was referenced with.
+    """
+    self.digest = digest
+    self.entity_id = entity_id
+    self.entities = entities
+    self.references = references
+
+
+def _make_records(entity_map):
+  """Returns the _InternedRecord of each hashed entity in a snapshot.
+
+  Args:
+    entity_map: [dict] The JSON encoded entities as written by the interner.
+
+  Returns:
+    Dictionary of records keyed by hash.
+  """
+  def lookup(entity_id):
+    """Returns the entity with the given id."""
+    return entity_map.get(str(entity_id)) or entity_map.get(entity_id)
+
+  digests = {}
+  for entity in entity_map.values():
+    digest = entity.get('_hash') or entity.get('_interned')
+    if digest is not None:
+      digests[entity['_id']] = digest
+
+  records = {}
+  for entity in entity_map.values():
+    digest = entity.get('_hash')
+    if digest is None:
+      continue
+    entity_id = entity['_id']
+    entities = {}
+    references = {}
+    pending = [entity_id]
+    while pending:
+      source_id = pending.pop()
+      if source_id in entities:
+        continue
+      entities[source_id] = lookup(source_id)
+      for target_id in referenced_entity_ids(entities[source_id]):
+        if target_id != entity_id and target_id in digests:
+          references[target_id] = digests[target_id]
+        else:
+          pending.append(target_id)
+    records[digest] = _InternedRecord(digest, entity_id, entities, references)
+  return records
@@ -20,6 +20,8 @@ import os
 import threading
 
 from . import Journal
+from .compressed_stream import make_compressed_output_stream
+from .journal_codec import make_journal_codec
 
 # pylint: disable=invalid-name
 # pylint: disable=global-statement
@@ -40,11 +42,26 @@ def _atexit_handler():
     _global_lock.release()
 
 
-def new_global_journal_with_path(path, **metadata):
+def new_global_journal_with_path(path, _queue_size=None, _codec=None,
+                                 _compression=None, _intern_entities=False,
+                                 _defer_snapshots=False, _size_policy=None,
+                                 **metadata):
   """Creates a global journal persisted at the provided path.
 
   Args:
     path: [string] The path to the journal to open.
+    _queue_size: [int] If provided then the journal writes its entries from
+       a background thread using a queue of this size. See Journal.
+    _codec: [string] If provided then the name of the journal codec to
+       encode entries with. The default is indented JSON.
+    _compression: [string] If provided then the name of the compression to
+       write the journal file with (e.g. 'gzip').
+    _intern_entities: [bool] If True then write snapshot entities that were
+       already written into the journal as stubs referencing them.
+    _defer_snapshots: [bool] If True then export stored objects into
+       snapshots on the background writer thread. Requires a _queue_size.
+    _size_policy: [SnapshotSizePolicy] If provided then bound the size of
+       the values recorded into stored snapshots.
     metadata: [kwargs] The journal metadata to write into the journal.
   """
   global _global_journal
@@ -58,9 +75,16 @@ def new_global_journal_with_path(path, **metadata):
       atexit.register(_atexit_handler)
       _added_atexit = True
 
-    journal_file = open(path, 'w')
+    journal_file = open(path, 'wb')
     os.fchmod(journal_file.fileno(), 0600)  # Protect sensitive data.
-    journal = Journal()
+    if _compression:
+      journal_file = make_compressed_output_stream(_compression, journal_file)
+    journal = Journal(
+        queue_size=_queue_size,
+        codec=make_journal_codec(_codec) if _codec else None,
+        intern_entities=_intern_entities,
+        defer_snapshots=_defer_snapshots,
+        size_policy=_size_policy)
     journal.open_with_file(journal_file, **metadata)
 
     _global_journal = journal
@@ -19,13 +19,54 @@ The JSON snspahosts in a journal are JsonSnashot. A journal is a collection
 of snapshots and, in future, other events.
 """
 
-import json
+import Queue
+import os
 import threading
 import time
 
+from .compressed_stream import make_compressed_output_stream
+from .entity_interning import SnapshotEntityInterner
+from .journal_codec import (JsonJournalCodec, encode_journal_header)
+from .journal_index import (JournalIndex, index_path_for_journal)
 from .record_stream import RecordOutputStream
 from .snapshot import JsonSnapshot
 
+class _DeferredSnapshot(object):
+  """An object to store into the journal once the background writer runs."""
+
+  def __init__(self, obj, metadata, size_policy=None):
+    """Constructor.
+
+    Args:
+      obj: [JsonSnapshotable] The object to store.
+      metadata: [dict] The metadata for the entry, including its timestamp.
+      size_policy: [SnapshotSizePolicy] The size policy for the snapshot.
+    """
+    self.__obj = obj
+    self.__metadata = metadata
+    self.__size_policy = size_policy
+
+  def to_json_object(self):
+    """Exports the object into a snapshot and returns the snapshot JSON."""
+    snapshot = JsonSnapshot(_size_policy=self.__size_policy, **self.__metadata)
+    snapshot.add_data(self.__obj)
+    return snapshot.to_json_object()
+
+
+class _HashedSnapshot(object):
+  """A snapshot entry together with the hashes of its entities to intern."""
+
+  def __init__(self, json_object, hashes):
+    """Constructor.
+
+    Args:
+      json_object: [dict] The JSON encoded JsonSnapshot entry.
+      hashes: [dict] The SnapshotEntityInterner.hash_snapshot() of the entry.
+    """
+    self.json_object = json_object
+    self.hashes = hashes
+
+
 class Journal(object):
   """Stores object snapshots into an output file.
 
@@ -36,34 +77,120 @@ class Journal(object):
   resiliency to premature crashes and invalid json encodings of individual
   entries.
 
+  The entries can be encoded using a different JournalCodec, in which case
+  the journal starts with a header record naming the codec.
+
   The journal is thread-safe so multiple threads can write into it
   concurrently.
+
+  By default entries are encoded and written by the thread adding them.
+  Alternatively the journal can be given a queue_size, in which case entries
+  are put onto a bounded queue and encoded and written by a background
+  writer thread. Entries are written in the order they were queued, so
+  the ordering among entries from any one thread is preserved. Threads adding
+  entries will block while the queue is full. Use flush() to wait until all
+  the queued entries have been written.
+
+  When writing from a background thread, the journal can also defer the
+  export of stored objects into snapshots to the background thread. This
+  takes the cost of building the snapshot off the threads storing them,
+  but the stored objects must not be modified after they are stored.
+
+  The journal can also intern the snapshot entities it writes, in which case
+  entities that were already written into the journal are written as stubs
+  referencing the earlier entity. This makes the journal smaller, not faster
+  to write. See the entity_interning module.
   """
 
-  def __init__(self, now_function=time.time):
+  # The maximum number of queued entries the background writer will write
+  # before flushing the underlying stream.
+  MAX_BATCH_SIZE = 100
+
+  # The text of the final message written when the journal is terminated.
+  # Readers following a journal as it is written use it to tell when the
+  # journal is finished.
+  FINISHED_MESSAGE = 'Finished journal.'
+
+  # Marks the end of the queue for the background writer.
+  __END_OF_QUEUE = object()
+
+  def __init__(self, now_function=time.time, queue_size=None, codec=None,
+               intern_entities=False, defer_snapshots=False,
+               size_policy=None):
     """Constructs new journal.
 
     Args:
       now_function: [time] Optional override for timestamping function.
           Returns a real value indicating the current time.
+      queue_size: [int] If provided then write entries from a background
+          thread, permitting at most this many entries to be queued up
+          before blocking the callers adding new ones.
+      codec: [JournalCodec] The codec for encoding entries. The default is
+          indented JSON.
+      intern_entities: [bool] If True then write snapshot entities that
+          were already written into the journal as stubs referencing them.
+          See SnapshotEntityInterner for how many entities are remembered.
+      defer_snapshots: [bool] If True then store() exports objects into
+          snapshots on the background writer thread rather than the calling
+          thread. This requires a queue_size.
+      size_policy: [SnapshotSizePolicy] If provided then bound the size of
+          the values recorded into the snapshots of stored objects.
     """
-    self.__encoder = json.JSONEncoder(indent=2, separators=(',', ': '))
+    if queue_size is not None and queue_size <= 0:
+      raise ValueError('queue_size={0} must be positive'.format(queue_size))
+    if defer_snapshots and queue_size is None:
+      raise ValueError('defer_snapshots requires a queue_size')
+
+    self.__codec = codec or JsonJournalCodec()
     self.__lock = threading.Lock()
+
+    # The number of entries being put onto the queue outside the lock.
+    # terminate() waits for them so they are not put after the end of queue.
+    self.__pending_puts = 0
+    self.__puts_done = threading.Condition(self.__lock)
     self.__now_function = now_function
     self.__output = None
+    self.__queue_size = queue_size
+    self.__queue = None
+    self.__writer_thread = None
+    self.__writer_error = None
+    self.__index = None
+    self.__index_path = None
+    self.__journal_path = None
+    self.__interner = SnapshotEntityInterner() if intern_entities else None
+    self.__defer_snapshots = defer_snapshots
+    self.__size_policy = size_policy
 
   def now(self):
     """Returns current timestamp for marking journal entries."""
     return self.__now_function()
 
-  def open_with_path(self, _path, **metadata):
+  def open_with_path(self, _path, _compression=None, _index=False,
+                     **metadata):
     """Start a new journal file at the given path.
 
     Args:
       _path: [string] Path to file to write into.
+      _compression: [string] If provided, the name of the compression to use
+          when writing the file (e.g. 'gzip'). Each record is compressed as
+          it is written so the file can be read up to the last complete
+          record should it be truncated.
+      _index: [bool] If True then also write a JournalIndex into a sidecar
+          file when the journal is terminated. Any existing sidecar is
+          removed either way since it would describe an earlier journal.
       metadata: [kwargs] Metadata for initial entry.
     """
-    self.open_with_file(open(_path, 'r'), **metadata)
+    index_path = index_path_for_journal(_path)
+    if os.path.exists(index_path):
+      os.remove(index_path)
+    output = open(_path, 'wb')
+    if _compression:
+      output = make_compressed_output_stream(_compression, output)
+    if _index:
+      self.__index = JournalIndex()
+      self.__index_path = index_path
+      self.__journal_path = _path
+    self.open_with_file(output, **metadata)
 
   def open_with_file(self, _output, **metadata):
     """
@@ -77,26 +204,72 @@ class Journal(object):
         raise ValueError('Journal is already open.')
 
       self.__output = RecordOutputStream(_output)
+      if self.__codec.needs_header:
+        self.__output.append(encode_journal_header(self.__codec))
+      if self.__queue_size is not None:
+        self.__queue = Queue.Queue(self.__queue_size)
+        self.__writer_thread = threading.Thread(
+            name='JournalWriter', target=self.__writer_loop)
+        self.__writer_thread.daemon = True
+        self.__writer_thread.start()
     finally:
       self.__lock.release()
 
     self.write_message('Starting journal.', **metadata)
 
+  def flush(self):
+    """Waits until all the entries written so far are in the output stream.
+
+    Raises:
+      Exception raised by the background writer while writing an entry.
+    """
+    if self.__queue is not None:
+      self.__queue.join()
+      self.__raise_writer_error()
+      return
+
+    self.__lock.acquire(True)
+    try:
+      if self.__output is not None:
+        self.__flush_output()
+    finally:
+      self.__lock.release()
+
   def terminate(self, **metadata):
     """Stops writing into journal.
 
     Args:
       metadata: [kwargs]  Defines final metadata entry summarizing the journal.
     """
-    self.write_message('Finished journal.', **metadata)
+    self.write_message(self.FINISHED_MESSAGE, **metadata)
     self.__lock.acquire(True)
     try:
       if self.__output is None:
         raise ValueError('Journal is already terminated.')
+      writer_queue = self.__queue
+      self.__queue = None
+      while self.__pending_puts:
+        self.__puts_done.wait()
+    finally:
+      self.__lock.release()
+
+    if writer_queue is not None:
+      writer_queue.put(self.__END_OF_QUEUE)
+      self.__writer_thread.join()
+      self.__writer_thread = None
+
+    self.__lock.acquire(True)
+    try:
       self._do_close()
       self.__output = None
+      if self.__index is not None:
+        self.__index.write_to_path(
+            self.__index_path,
+            journal_bytes=os.path.getsize(self.__journal_path))
+        self.__index = None
     finally:
       self.__lock.release()
+    self.__raise_writer_error()
 
   def begin_context(self, _title, **metadata):
     """Write a begin context marker into the journal.
@@ -148,9 +321,19 @@ class Journal(object):
 
     Args:
       obj: [JsonSnapshotable] The object to store into the journal.
+         If the journal defers snapshots then obj should not be modified
+         after calling this.
       metadata: [kwargs] Additional metadata for the entry.
     """
-    snapshot = JsonSnapshot(**metadata)
+    if self.__defer_snapshots:
+      # The timestamp and thread are those of the call, not the export.
+      metadata.setdefault('_timestamp', self.now())
+      metadata.setdefault('_thread', threading.current_thread().ident)
+      self.__write_entry(
+          _DeferredSnapshot(obj, metadata, size_policy=self.__size_policy))
+      return
+
+    snapshot = JsonSnapshot(_size_policy=self.__size_policy, **metadata)
     snapshot.add_data(obj)
     self.__write_json_object(snapshot.to_json_object())
 
@@ -171,14 +354,140 @@ class Journal(object):
     json_copy = dict(json_object)
     json_copy.setdefault('_timestamp', self.now())
     json_copy.setdefault('_thread', threading.current_thread().ident)
+    self.__write_entry(self.__hash_entry(json_copy))
+
+  def __hash_entry(self, json_object):
+    """Hashes the entities of a snapshot entry ahead of interning them.
+
+    This is called outside the lock so that threads writing entries are not
+    serialized on hashing, leaving only the bookkeeping of the interner to
+    be done while holding it.
+
+    Args:
+      json_object: [dict] The JSON entry to write.
+
+    Returns:
+      A _HashedSnapshot if the entry is to be interned, otherwise json_object.
+    """
+    if (self.__interner is None
+        or json_object.get('_type') != 'JsonSnapshot'):
+      return json_object
+    return _HashedSnapshot(json_object,
+                           self.__interner.hash_snapshot(json_object))
+
+  def __write_entry(self, entry):
+    """Writes an entry into the journal file, or queues it to be written.
 
-    # protect both the encoder and the output stream.
+    Args:
+      entry: [dict, _HashedSnapshot or _DeferredSnapshot] The entry to write.
+    """
+    # protect both the codec and the output stream.
     self.__lock.acquire(True)
     try:
       if self.__output is None:
         raise ValueError('Journal is not open')
 
-      text = self.__encoder.encode(json_copy)
-      self.__output.append(text)
+      writer_queue = self.__queue
+      if writer_queue is None:
+        self.__append_entry(entry)
+        return
+      self.__pending_puts += 1
+    finally:
+      self.__lock.release()
+
+    # Queue outside the lock so that blocking on a full queue does not
+    # also block the writer from releasing it.
+    try:
+      writer_queue.put(entry)
+    finally:
+      self.__lock.acquire(True)
+      try:
+        self.__pending_puts -= 1
+        self.__puts_done.notify_all()
+      finally:
+        self.__lock.release()
+
+  def __append_entry(self, json_object):
+    """Encode and append an entry to the output while holding the lock."""
+    if isinstance(json_object, _DeferredSnapshot):
+      # Stored while the journal was terminating its background writer.
+      json_object = self.__hash_entry(json_object.to_json_object())
+    if isinstance(json_object, _HashedSnapshot):
+      # Interned here so that stubs are always written after what they
+      # reference, even when entries are queued from multiple threads.
+      json_object = self.__interner.intern_snapshot(
+          json_object.json_object, hashes=json_object.hashes)
+    offset = self.__output.position
+    self.__output.append(self.__codec.encode(json_object))
+    if self.__index is not None:
+      self.__index.add_entry(offset, json_object)
+
+  def __flush_output(self):
+    """Flushes the output stream, if the stream supports flushing."""
+    flush = getattr(self.__output.stream, 'flush', None)
+    if flush is not None:
+      flush()
+
+  def __raise_writer_error(self):
+    """Raise the error that the background writer encountered, if any."""
+    error = self.__writer_error
+    if error is not None:
+      self.__writer_error = None
+      raise error
+
+  def __writer_loop(self):
+    """Runs the background writer thread until the end of the queue."""
+    writer_queue = self.__queue
+    while True:
+      batch = [writer_queue.get()]
+      try:
+        while (batch[-1] is not self.__END_OF_QUEUE
+               and len(batch) < self.MAX_BATCH_SIZE):
+          batch.append(writer_queue.get_nowait())
+      except Queue.Empty:
+        pass
+
+      try:
+        self.__write_batch(batch)
+      finally:
+        for _ in batch:
+          writer_queue.task_done()
+
+      if batch[-1] is self.__END_OF_QUEUE:
+        return
+
+  def __write_batch(self, batch):
+    """Encode and write a batch of queued entries, then flush the output.
+
+    Args:
+      batch: [list of dict, _HashedSnapshot or _DeferredSnapshot] The entries
+          to write, possibly ending with the end of queue marker.
+    """
+    # Export and hash deferred snapshots before taking the lock so that
+    # threads writing new entries are not blocked while they are exported.
+    json_objects = []
+    for entry in batch:
+      if entry is self.__END_OF_QUEUE:
+        break
+      if isinstance(entry, _DeferredSnapshot):
+        try:
+          entry = self.__hash_entry(entry.to_json_object())
+        except Exception as ex:
+          self.__writer_error = self.__writer_error or ex
+          continue
+      json_objects.append(entry)
+
+    self.__lock.acquire(True)
+    try:
+      for json_object in json_objects:
+        try:
+          self.__append_entry(json_object)
+        except Exception as ex:
+          # Keep the first error to report back at the next barrier.
+          self.__writer_error = self.__writer_error or ex
+      try:
+        self.__flush_output()
+      except Exception as ex:
+        self.__writer_error = self.__writer_error or ex
     finally:
       self.__lock.release()
@@ -0,0 +1,246 @@
+# Copyright 2015 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Implements the codecs used to encode individual journal entries.
+
+Each journal entry is encoded into a single record frame. By default entries
+are encoded as JSON. Other codecs can be used to make the journal smaller
+or cheaper to process.
+
+Journals using a codec other than JSON start with a header record naming the
+codec so that readers can determine how to decode the remaining records.
+The header record itself is always compact JSON. Journals without a header
+are JSON, which is also how journals were written before codecs were
+introduced.
+"""
+
+import json
+import re
+
+from .deep_json import (DeepJsonDecoder, DeepJsonEncoder)
+
+try:
+  import msgpack
+except ImportError:
+  msgpack = None
+
+
+# The _type of the header record naming the codec used by the journal.
+JOURNAL_HEADER_TYPE = 'JournalHeader'
+
+
+class JournalCodec(object):
+  """Interface for encoding and decoding individual journal entries."""
+
+  @property
+  def name(self):
+    """The name recorded in the journal header to identify the codec."""
+    raise NotImplementedError('{0}.name'.format(self.__class__))
+
+  @property
+  def needs_header(self):
+    """Whether readers need a header in order to decode the journal.
+
+    Codecs that produce JSON dont need one since that is what readers assume.
+    """
+    return True
+
+  def could_be_type(self, data, entry_types):
+    """Cheaply determines whether a record might contain one of entry_types.
+
+    This permits readers to skip decoding records they are not interested in.
+
+    Args:
+      data: [string] The record frame data written by encode().
+      entry_types: [list of string] The entry _type values of interest.
+
+    Returns:
+      False if the record is certainly not one of entry_types.
+      True if it might be, in which case it needs decoding to know for sure.
+    """
+    # pylint: disable=unused-argument
+    return True
+
+  def encode(self, json_object):
+    """Encodes a journal entry.
+
+    Args:
+      json_object: [dict] The JSON encodable journal entry.
+
+    Returns:
+      The encoded string to write into the record frame.
+    """
+    raise NotImplementedError('{0}.encode'.format(self.__class__))
+
+  def decode(self, data):
+    """Decodes a journal entry.
+
+    Args:
+      data: [string] The record frame data written by encode().
+
+    Returns:
+      The decoded JSON object.
+    """
+    raise NotImplementedError('{0}.decode'.format(self.__class__))
+
+
+class JsonJournalCodec(JournalCodec):
+  """Encodes journal entries as JSON documents.
+
+  Entries nested deeper than the recursion limit are still encoded and
+  decoded, only more slowly.
+  """
+
+  @property
+  def name(self):
+    """Implements JournalCodec interface."""
+    return 'json'
+
+  @property
+  def needs_header(self):
+    """Implements JournalCodec interface."""
+    return False
+
+  def could_be_type(self, data, entry_types):
+    """Implements JournalCodec interface.
+
+    This looks for the encoded _type attribute within the raw JSON text.
+    The text might contain it within a nested value, but if the text does
+    not contain it at all then the entry is certainly not of that type.
+    The data can also be a buffer, in which case it is searched in place.
+    """
+    key = tuple(entry_types)
+    regex = self.__type_regexes.get(key)
+    if regex is None:
+      regex = re.compile('"_type": ?"(?:{0})"'.format(
+          '|'.join([re.escape(entry_type) for entry_type in entry_types])))
+      self.__type_regexes[key] = regex
+    return regex.search(data) is not None
+
+  def __init__(self, compact=False):
+    """Constructor.
+
+    Args:
+      compact: [bool] If True then encode without any whitespace.
+         Otherwise encode with indentation so the journal is human readable.
+    """
+    if compact:
+      self.__encoder = DeepJsonEncoder(separators=(',', ':'))
+    else:
+      self.__encoder = DeepJsonEncoder(indent=2, separators=(',', ': '))
+    self.__decoder = DeepJsonDecoder()
+    self.__type_regexes = {}
+
+  def encode(self, json_object):
+    """Implements JournalCodec interface."""
+    return self.__encoder.encode(json_object)
+
+  def decode(self, data):
+    """Implements JournalCodec interface."""
+    if not isinstance(data, basestring):
+      data = str(data)  # The JSON decoder cannot decode buffers.
+    return self.__decoder.decode(data)
+
+
+class MsgpackJournalCodec(JournalCodec):
+  """Encodes journal entries using MessagePack.
+
+  This requires the msgpack module to be installed.
+  """
+
+  @property
+  def name(self):
+    """Implements JournalCodec interface."""
+    return 'msgpack'
+
+  def __init__(self):
+    """Constructor."""
+    if msgpack is None:
+      raise ImportError('The msgpack module is required for {0}'.format(
+          self.__class__.__name__))
+
+  def encode(self, json_object):
+    """Implements JournalCodec interface."""
+    return msgpack.packb(json_object, use_bin_type=False)
+
+  def decode(self, data):
+    """Implements JournalCodec interface."""
+    # Snapshot entity maps are keyed by int, which JSON would have converted
+    # into strings but msgpack preserves.
+    return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+
+# Factories keyed by the name used to specify the codec.
+# Note that 'compact_json' produces codecs named 'json' since the journal
+# is still read as JSON.
+_CODEC_FACTORIES = {
+    'json': JsonJournalCodec,
+    'compact_json': lambda: JsonJournalCodec(compact=True),
+    'msgpack': MsgpackJournalCodec
+}
+
+
+def register_journal_codec(name, factory):
+  """Registers a codec so it can be made by name.
+
+  Args:
+    name: [string] The name of the codec, as written into journal headers.
+    factory: [callable] Takes no arguments and returns a JournalCodec.
+  """
+  _CODEC_FACTORIES[name] = factory
+
+
+def make_journal_codec(name):
+  """Returns a new codec instance.
+
+  Args:
+    name: [string] The name of a registered codec.
+
+  Raises:
+    KeyError if the codec is not known.
+  """
+  factory = _CODEC_FACTORIES.get(name)
+  if factory is None:
+    raise KeyError('Unknown journal codec "{0}"'.format(name))
+  return factory()
+
+
+def encode_journal_header(codec):
+  """Returns the header record naming the codec.
+
+  Args:
+    codec: [JournalCodec] The codec used to encode the journal entries.
+  """
+  return json.JSONEncoder(separators=(',', ':')).encode(
+      {'_type': JOURNAL_HEADER_TYPE, 'codec': codec.name})
+
+
+def decode_journal_header(data):
+  """Determines the codec from the first record in a journal.
+
+  Args:
+    data: [string] The first record in the journal.
+
+  Returns:
+    The codec named by the header, or None if data was not a header.
+    Journals without headers are JSON.
+  """
+  try:
+    header = json.JSONDecoder().decode(str(data))
+  except (ValueError, UnicodeDecodeError):
+    return None
+  if not isinstance(header, dict) or header.get('_type') != JOURNAL_HEADER_TYPE:
+    return None
+  return make_journal_codec(header['codec'])
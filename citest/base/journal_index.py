@@ -0,0 +1,274 @@
+# Copyright 2015 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Implements an index into the records of a journal.
+
+The index is kept in a sidecar file next to the journal. It maps each
+journal entry to the byte offset of its record so that readers can seek
+directly to the entries they are interested in rather than decoding every
+record before them. Offsets are into the uncompressed record stream, so
+they are the same whether or not the journal file itself is compressed.
+
+When the journal interns snapshot entities, the index also records which
+entry first wrote each interned entity so that readers starting part way
+through the journal can find the entities that stubs refer to.
+
+The index also records the size of the journal file it was written for so
+that readers can tell when the sidecar does not belong to the journal next
+to it, such as when the journal was later rewritten without an index.
+"""
+
+import json
+import os
+
+
+def index_path_for_journal(journal_path):
+  """Returns the path of the index sidecar file for a journal."""
+  return journal_path + '.index'
+
+
+class JournalIndexContext(object):
+  """Describes where a context appears within a journal."""
+
+  @property
+  def title(self):
+    """The title of the context."""
+    return self.__title
+
+  @property
+  def depth(self):
+    """The nesting depth of the context, where 1 is a top level context."""
+    return self.__depth
+
+  @property
+  def begin_entry(self):
+    """The entry number of the BEGIN control."""
+    return self.__begin_entry
+
+  @property
+  def end_entry(self):
+    """The entry number of the END control, or None if it never ended."""
+    return self.__end_entry
+
+  @property
+  def relation(self):
+    """The relation given by the END control, if any."""
+    return self.__relation
+
+  def __init__(self, title, depth, begin_entry, end_entry=None, relation=None):
+    """Constructor.
+
+    Args:
+      title: [string] The title of the context.
+      depth: [int] The nesting depth of the context.
+      begin_entry: [int] The entry number of the BEGIN control.
+      end_entry: [int] The entry number of the END control, if known.
+      relation: [string] The relation given by the END control, if known.
+    """
+    self.__title = title
+    self.__depth = depth
+    self.__begin_entry = begin_entry
+    self.__end_entry = end_entry
+    self.__relation = relation
+
+  def end(self, end_entry, relation):
+    """Records the END control for the context."""
+    self.__end_entry = end_entry
+    self.__relation = relation
+
+  def to_json_object(self):
+    """Returns the context as a dictionary that is json encodable."""
+    return {'title': self.__title,
+            'depth': self.__depth,
+            'begin': self.__begin_entry,
+            'end': self.__end_entry,
+            'relation': self.__relation}
+
+  @staticmethod
+  def from_json_object(obj):
+    """Returns a JournalIndexContext from to_json_object()."""
+    return JournalIndexContext(obj['title'], obj['depth'], obj['begin'],
+                               end_entry=obj.get('end'),
+                               relation=obj.get('relation'))
+
+
+class JournalIndex(object):
+  """An index of the records within a journal.
+
+  Entries are numbered in the order they appear in the journal. For each
+  entry the index records the offset of its record, its timestamp and its
+  _type. It also records the entries that begin and end each context,
+  and the entry that first wrote each interned snapshot entity.
+  """
+
+  @property
+  def contexts(self):
+    """The JournalIndexContext list in the order the contexts began."""
+    return self.__contexts
+
+  @property
+  def num_entries(self):
+    """The number of entries in the index."""
+    return len(self.__entries)
+
+  @property
+  def journal_bytes(self):
+    """The size of the journal file the index was written for, if known."""
+    return self.__journal_bytes
+
+  def __init__(self):
+    """Constructor."""
+    # Each entry is an [offset, timestamp, _type] list.
+    self.__entries = []
+    self.__journal_bytes = None
+    self.__contexts = []
+    self.__open_contexts = []
+    # The entry number that first wrote each interned entity, keyed by hash.
+    self.__interned_entries = {}
+
+  def add_entry(self, offset, json_object):
+    """Adds the next entry in the journal to the index.
+
+    Args:
+      offset: [int] The offset of the record containing the entry.
+      json_object: [dict] The journal entry written into the record.
+    """
+    entry_number = len(self.__entries)
+    entry_type = json_object.get('_type')
+    self.__entries.append(
+        [offset, json_object.get('_timestamp'), entry_type])
+    if entry_type == 'JsonSnapshot':
+      for entity in (json_object.get('_entities') or {}).values():
+        digest = entity.get('_hash')
+        if digest is not None:
+          self.__interned_entries.setdefault(digest, entry_number)
+      return
+    if entry_type != 'JournalContextControl':
+      return
+
+    control = json_object.get('control')
+    if control == 'BEGIN':
+      context = JournalIndexContext(
+          json_object.get('_title'), len(self.__open_contexts) + 1,
+          entry_number)
+      self.__contexts.append(context)
+      self.__open_contexts.append(context)
+    elif control == 'END' and self.__open_contexts:
+      self.__open_contexts.pop().end(entry_number,
+                                     json_object.get('relation'))
+
+  def get_entry_offset(self, entry_number):
+    """Returns the offset of the record for the given entry number."""
+    return self.__entries[entry_number][0]
+
+  def get_entry_timestamp(self, entry_number):
+    """Returns the timestamp of the given entry number."""
+    return self.__entries[entry_number][1]
+
+  def get_entry_type(self, entry_number):
+    """Returns the _type of the given entry number."""
+    return self.__entries[entry_number][2]
+
+  def find_interned_entry(self, digest):
+    """Returns the number of the entry that wrote an interned entity.
+
+    Args:
+      digest: [string] The hash of the interned entity.
+
+    Returns:
+      The entry number or None if no entry wrote the entity.
+    """
+    return self.__interned_entries.get(digest)
+
+  def find_contexts(self, title, depth=None):
+    """Returns the contexts with the given title.
+
+    Args:
+      title: [string] The title of the contexts to find.
+      depth: [int] If provided then only contexts at this nesting depth.
+    """
+    return [context for context in self.__contexts
+            if context.title == title
+            and (depth is None or context.depth == depth)]
+
+  def find_entries_in_time_window(self, start_time, end_time):
+    """Returns the entry numbers timestamped within the given time window.
+
+    Args:
+      start_time: [float] The earliest timestamp to include, if any.
+      end_time: [float] The latest timestamp to include, if any.
+    """
+    return [index for index, entry in enumerate(self.__entries)
+            if entry[1] is not None
+            and (start_time is None or entry[1] >= start_time)
+            and (end_time is None or entry[1] <= end_time)]
+
+  def matches_journal(self, journal_path):
+    """Determines whether the index was written for the given journal file.
+
+    Args:
+      journal_path: [string] The path to the journal file.
+
+    Returns:
+      False if the journal file is not the size the index was written for.
+    """
+    return (self.__journal_bytes is not None
+            and os.path.getsize(journal_path) == self.__journal_bytes)
+
+  def to_json_object(self):
+    """Returns the index as a dictionary that is json encodable."""
+    return {'_type': 'JournalIndex',
+            'journal_bytes': self.__journal_bytes,
+            'entries': self.__entries,
+            'contexts': [context.to_json_object()
+                         for context in self.__contexts],
+            'interned': self.__interned_entries}
+
+  @staticmethod
+  def from_json_object(obj):
+    """Returns a JournalIndex from to_json_object()."""
+    index = JournalIndex()
+    # pylint: disable=protected-access
+    index.__entries = obj['entries']
+    index.__journal_bytes = obj.get('journal_bytes')
+    index.__contexts = [JournalIndexContext.from_json_object(context)
+                        for context in obj['contexts']]
+    index.__interned_entries = obj.get('interned', {})
+    return index
+
+  def write_to_path(self, path, journal_bytes=None):
+    """Writes the index into a file.
+
+    Args:
+      path: [string] The path to write the index into.
+      journal_bytes: [int] The size of the finished journal file, which
+         readers check to confirm the index belongs to the journal.
+    """
+    if journal_bytes is not None:
+      self.__journal_bytes = journal_bytes
+    with open(path, 'w') as stream:
+      stream.write(json.JSONEncoder(separators=(',', ':')).encode(
+          self.to_json_object()))
+
+  @staticmethod
+  def load_from_path(path):
+    """Loads an index written by write_to_path().
+
+    Args:
+      path: [string] The path to the index file.
+    """
+    with open(path, 'r') as stream:
+      return JournalIndex.from_json_object(
+          json.JSONDecoder().decode(stream.read()))
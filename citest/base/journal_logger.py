@@ -180,7 +180,8 @@ class JournalLogHandler(logging.StreamHandler):
      _joural_message [string]: Journal this instead of the LogRecord message.
   """
 
-  def __init__(self, path):
+  def __init__(self, path, queue_size=None, codec=None, compression=None,
+               defer_snapshots=False):
     """Construct a handler using the global journal.
 
     Ideally we'd like to inject a journal in here.
@@ -191,11 +192,25 @@ class JournalLogHandler(logging.StreamHandler):
     Args:
       path: [string] Specifies the path for the global journal, if it does not
           already exist.
+      queue_size: [int] If provided and the global journal does not already
+          exist, then create it to write from a background thread using a
+          queue of this size.
+      codec: [string] If provided and the global journal does not already
+          exist, then the name of the codec to create it with
+          (e.g. 'compact_json').
+      compression: [string] If provided and the global journal does not
+          already exist, then the name of the compression to write the
+          journal file with (e.g. 'gzip').
+      defer_snapshots: [bool] If True and the global journal does not already
+          exist, then create it to export stored objects on its background
+          writer thread. This requires a queue_size.
     """
     super(JournalLogHandler, self).__init__()
     self.__journal = get_global_journal()
     if self.__journal is None:
-      self.__journal = new_global_journal_with_path(path)
+      self.__journal = new_global_journal_with_path(
+          path, _queue_size=queue_size, _codec=codec,
+          _compression=compression, _defer_snapshots=defer_snapshots)
 
   def emit(self, record):
     """Emit the record to the journal."""
@@ -0,0 +1,214 @@
+# Copyright 2015 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Computes and applies structural differences between JSON values.
+
+A diff is a list of operations, each of which is a dictionary with an 'op'
+and a 'path'. The path is the list of dictionary keys and list indexes
+leading from the root of the value to where the operation applies.
+  'add': Inserts the operation's 'value' at the path.
+  'remove': Removes the element at the path.
+  'replace': Replaces the element at the path with the operation's 'value'.
+
+The operations are applied in order, so the paths within an operation
+refer to the value as changed by the operations preceding it.
+"""
+
+import copy
+import difflib
+import hashlib
+import json
+
+
+_ENCODER = json.JSONEncoder(sort_keys=True, separators=(',', ':'))
+
+
+def diff_json(old, new):
+  """Returns the diff that changes one JSON value into another.
+
+  The values are compared using an explicit stack so they can be nested
+  deeper than the recursion limit.
+
+  Args:
+    old: [any] The JSON value to change from.
+    new: [any] The JSON value to change into.
+
+  Returns:
+    A list of diff operations. The list is empty if the values are equal.
+  """
+  ops = []
+  memo = {}
+  # Each pending item is either an operation to append, or an (old, new,
+  # path) tuple to expand into the items changing old into new. They are
+  # popped in the order the operations need to be applied.
+  pending = [(old, new, [])]
+  while pending:
+    item = pending.pop()
+    if isinstance(item, dict):
+      ops.append(item)
+    else:
+      old, new, path = item
+      pending.extend(reversed(_diff_items(old, new, path, memo)))
+  return ops
+
+
+def apply_json_diff(value, diff):
+  """Applies a diff from diff_json() to a JSON value.
+
+  Args:
+    value: [any] The JSON value to change. This is not modified.
+    diff: [list] The diff operations to apply.
+
+  Returns:
+    The changed copy of value.
+
+  Raises:
+    KeyError, IndexError or ValueError if the diff does not apply to value.
+  """
+  value = copy.deepcopy(value)
+  for operation in diff:
+    op = operation['op']
+    path = operation['path']
+    if not path:
+      if op != 'replace':
+        raise ValueError('Cannot {0} the root value'.format(op))
+      value = copy.deepcopy(operation['value'])
+      continue
+
+    container = value
+    for key in path[:-1]:
+      container = container[key]
+    key = path[-1]
+    if op == 'remove':
+      del container[key]
+    elif op == 'add' and isinstance(container, list):
+      container.insert(key, copy.deepcopy(operation['value']))
+    elif op in ('add', 'replace'):
+      container[key] = copy.deepcopy(operation['value'])
+    else:
+      raise ValueError('Unknown diff operation {0!r}'.format(op))
+  return value
+
+
+def _diff_items(old, new, path, memo):
+  """Returns the items changing old into new.
+
+  Args:
+    old: [any] The JSON value to change from.
+    new: [any] The JSON value to change into.
+    path: [list] The path to old within the root value.
+    memo: [dict] See _content_key().
+
+  Returns:
+    A list of operations and (old, new, path) tuples denoting the changes
+    to the values within old and new, in the order they are applied.
+  """
+  items = []
+  if isinstance(old, dict) and isinstance(new, dict):
+    for key in sorted(old.keys()):
+      if key not in new:
+        items.append({'op': 'remove', 'path': path + [key]})
+      else:
+        items.append((old[key], new[key], path + [key]))
+    for key in sorted(new.keys()):
+      if key not in old:
+        items.append({'op': 'add', 'path': path + [key], 'value': new[key]})
+  elif isinstance(old, list) and isinstance(new, list):
+    items = _diff_list_items(old, new, path, memo)
+  elif type(old) != type(new) or old != new:
+    items.append({'op': 'replace', 'path': path, 'value': new})
+  return items
+
+
+def _diff_list_items(old, new, path, memo):
+  """Returns the items changing the list old into the list new.
+
+  Elements are matched by their content so that elements inserted into or
+  removed from the middle of the list do not change the elements after them.
+
+  Args:
+    old: [list] The list to change from.
+    new: [list] The list to change into.
+    path: [list] The path to old within the root value.
+    memo: [dict] See _content_key().
+
+  Returns:
+    See _diff_items().
+  """
+  matcher = difflib.SequenceMatcher(
+      None, [_content_key(elem, memo) for elem in old],
+      [_content_key(elem, memo) for elem in new], autojunk=False)
+
+  # Apply the changes from the end of the list so that the indexes of
+  # the earlier changes are unaffected by those made after them.
+  items = []
+  for tag, old_begin, old_end, new_begin, new_end in reversed(
+      matcher.get_opcodes()):
+    if tag == 'equal':
+      continue
+    if tag == 'replace' and old_end - old_begin == new_end - new_begin:
+      for offset in reversed(range(old_end - old_begin)):
+        items.append((old[old_begin + offset], new[new_begin + offset],
+                      path + [old_begin + offset]))
+      continue
+    for index in reversed(range(old_begin, old_end)):
+      items.append({'op': 'remove', 'path': path + [index]})
+    for offset, elem in enumerate(new[new_begin:new_end]):
+      items.append({'op': 'add', 'path': path + [old_begin + offset],
+                    'value': elem})
+  return items
+
+
+def _content_key(value, memo):
+  """Returns a string that is the same for values with the same content.
+
+  Primitive values are keyed by their encoding. Lists and dictionaries are
+  keyed by a digest of the keys of their elements, which is remembered so
+  that each is only visited once however deeply it is nested within the
+  values being diffed. This also works beyond the recursion limit.
+
+  Args:
+    value: [any] The JSON value to key.
+    memo: [dict] The digests of the lists and dictionaries keyed so far
+       within the values being diffed, keyed by their id.
+  """
+  if not isinstance(value, (list, dict)):
+    return _ENCODER.encode(value)
+
+  def leaf_key(elem):
+    """Returns the key of an element whose own elements were keyed."""
+    if isinstance(elem, (list, dict)):
+      return memo[id(elem)]
+    return _ENCODER.encode(elem)
+
+  # Each pending item is a (value, whether its elements were keyed) tuple.
+  pending = [(value, False)]
+  while pending:
+    elem, expanded = pending.pop()
+    if not isinstance(elem, (list, dict)) or id(elem) in memo:
+      continue
+    children = elem.values() if isinstance(elem, dict) else elem
+    if not expanded:
+      pending.append((elem, True))
+      pending.extend([(child, False) for child in children])
+      continue
+    if isinstance(elem, dict):
+      text = '{' + ','.join(
+          [_ENCODER.encode(key) + ':' + leaf_key(elem[key])
+           for key in sorted(elem.keys())]) + '}'
+    else:
+      text = '[' + ','.join([leaf_key(child) for child in elem]) + ']'
+    memo[id(elem)] = '#' + hashlib.sha1(text).hexdigest()
+  return memo[id(value)]
@@ -14,18 +14,128 @@
 
 """Implements a JsonScrubber to remove sensitive data from a JSON document."""
 
+import bisect
 import re
 from json import JSONDecoder
 from json import JSONEncoder
 
 
+# Fragments of regular expressions for tokenizing JSON text.
+_WS = r'[ \t\n\r]*'
+_STRING = r'"[^"\\]*(?:\\.[^"\\]*)*"'
+_SCALAR = (r'-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?'
+           r'|true|false|null')
+
+# Matches an object member up to the start of its value, or the object end.
+# The groups are the key, then the value as either a string literal, other
+# scalar or the start of a container, then the end of the object.
+_MEMBER_RE = re.compile(
+    '{ws}(?:({string}){ws}:{ws}(?:({string})|({scalar})|([[{{]))|(}}))'.format(
+        ws=_WS, string=_STRING, scalar=_SCALAR), re.DOTALL)
+
+# Matches an array element up to the start of its value, or the array end.
+# The groups are a string literal, other scalar, the start of a container,
+# then the end of the array.
+_ELEMENT_RE = re.compile(
+    '{ws}(?:({string})|({scalar})|([[{{])|(]))'.format(
+        ws=_WS, string=_STRING, scalar=_SCALAR), re.DOTALL)
+
+# Matches what follows a value within a container.
+_SEPARATOR_RE = re.compile('{ws}([,}}\\]])'.format(ws=_WS))
+
+# Matches regular expressions whose matches within JSON text might differ
+# from their matches within the decoded strings.
+_CONTEXT_SENSITIVE_RE = re.compile(r'[$^]|\\[AZ]|\(\?<?[=!]')
+
+# The deepest nesting of containers that can be skipped over at once.
+_MAX_SKIPPED_DEPTH = 5
+
+# pylint: disable=invalid-name
+# pylint: disable=global-statement
+_skip_res = None
+
+
+def _get_skip_res():
+  """Returns the regular expressions for skipping over JSON text.
+
+  These match well formed JSON without tokenizing it. They are only used
+  on text known to have nothing in it to redact, and only match containers
+  nested up to _MAX_SKIPPED_DEPTH deep. They are compiled on first use.
+
+  Returns:
+    A (member_run_re, element_run_re, value_re) tuple. The first two match a
+    run of object members or array elements, each followed by a comma. The
+    last matches a single value.
+  """
+  global _skip_res
+  if _skip_res is None:
+    value = '(?:{string}|{scalar})'.format(string=_STRING, scalar=_SCALAR)
+    for _ in range(_MAX_SKIPPED_DEPTH):
+      element = _WS + value + _WS
+      member = _WS + _STRING + _WS + ':' + element
+      value = (r'(?:{string}|{scalar}'
+               r'|\[(?:{element}(?:,(?!{ws}\])|(?=\])))*{ws}\]'
+               r'|\{{(?:{member}(?:,(?!{ws}\}})|(?=\}})))*{ws}\}})').format(
+                   string=_STRING, scalar=_SCALAR, element=element,
+                   member=member, ws=_WS)
+
+    # Members named 'key' or 'value' are not skipped because they determine
+    # whether the containing object is a key/value pair to be redacted.
+    member_run = r'(?:{ws}(?!"(?:key|value)"){string}{ws}:{ws}{value}{ws},)*'
+    element_run = r'(?:{ws}{value}{ws},)*'
+    _skip_res = tuple(
+        re.compile(pattern)
+        for pattern in [member_run.format(ws=_WS, string=_STRING, value=value),
+                        element_run.format(ws=_WS, value=value),
+                        value])
+  return _skip_res
+
+
+class _JsonTextContainer(object):
+  """The scrubbing state of an object or array within JSON text."""
+
+  def __init__(self, is_object):
+    self.is_object = is_object
+    self.expect = 'key_or_end' if is_object else 'value_or_end'
+    self.key = None             # The name of the current object member.
+    self.num_members = 0
+    self.skipped_members = False  # Whether any other members were skipped.
+    self.key_member = None      # The string value of a member named 'key'.
+    self.value_begin = None     # The first piece of a member named 'value'.
+    self.value_span = None      # The pieces of a member named 'value'.
+
+
 class JsonScrubber(object):
-  """Scrubber to redact output from content."""
+  """Scrubber to redact output from content.
+
+  Scrubbing does not modify the data being scrubbed, so a scrubber can be
+  shared among threads. Whether or not to redact a given key name is
+  remembered because the same names tend to repeat across list elements.
+  """
 
   REDACTED = '*' * 5
 
+  # The maximum number of key decisions to remember. This protects against
+  # unbounded growth when keys are themselves data (e.g. ids).
+  MAX_CACHED_KEYS = 10000
+
   def __init__(self, regex='(?i)(?:password|secret|private)'):
     self.__re = re.compile(regex)
+    self.__redact_key_cache = {}
+    self.__redacted_json = JSONEncoder().encode(self.REDACTED)
+
+    # If the regex is also matched against JSON text in order to find where
+    # there might be keys to redact, then the regex to search the text with
+    # and whether to lower the case of the text before searching it.
+    # Case insensitive searches are much slower so are avoided if possible.
+    if _CONTEXT_SENSITIVE_RE.search(regex):
+      self.__text_re = None
+    elif regex.startswith('(?i)') and '\\' not in regex:
+      self.__text_re = re.compile(regex[len('(?i)'):].lower())
+      self.__lower_text = True
+    else:
+      self.__text_re = self.__re
+      self.__lower_text = False
 
     base64 = '[a-zA-Z0-9+/\n]'
     pad = '(?:=|\u003d)'
@@ -34,6 +144,22 @@ class JsonScrubber(object):
     self.__key_re = re.compile('(?ms){begin}\n{base64}+{pad}*\n{end}\n'.format(
         begin=begin_marker, base64=base64, pad=pad, end=end_marker))
 
+  def should_redact_key(self, name):
+    """Determine whether values with the given key name should be redacted.
+
+    Args:
+      name: [string] The key name.
+
+    Returns:
+      True if the name matches the scrubber's regex.
+    """
+    redact = self.__redact_key_cache.get(name)
+    if redact is None:
+      redact = self.__re.search(name) is not None
+      if len(self.__redact_key_cache) >= self.MAX_CACHED_KEYS:
+        self.__redact_key_cache.clear()
+      self.__redact_key_cache[name] = redact
+    return redact
 
   def process_text(self, value):
     """Scrub text.
@@ -42,6 +168,9 @@ class JsonScrubber(object):
     Returns:
       scrubbed value.
     """
+    # Every key block has a BEGIN marker so most text needs no regex search.
+    if 'BEGIN' not in value:
+      return value
     match = self.__key_re.search(value)
     if not match:
       return value
@@ -52,7 +181,7 @@ class JsonScrubber(object):
     """Scrub elements of a list.
 
     Args:
-      l: [list] The list to redact from.
+      l: [list] The list to redact from. This is not modified.
 
     Returns:
       Redacted list.
@@ -72,32 +201,31 @@ class JsonScrubber(object):
     """Scrub elements of a dictionary.
 
     Args:
-      d: [dict] The dictionary to redact from.
+      d: [dict] The dictionary to redact from. This is not modified.
 
     Returns:
       Redacted dict.
     """
-    if len(d) == 2:
-        # pylint: disable=bad-indentation
-        keys = d.keys()
-        if 'key' in keys and 'value' in keys:
-          match = self.__re.search(d['key'])
+    redact_value = False
+    if len(d) == 2 and 'key' in d and 'value' in d:
+      key = d['key']
+      redact_value = (isinstance(key, basestring)
+                      and self.should_redact_key(key))
 
-          if match:
-            d['value'] = self.REDACTED
-
-    for name, value in d.items():
+    result = {}
+    for name, value in d.iteritems():
         # pylint: disable=bad-indentation
-        match = self.__re.search(name)
-        if match:
-          d[name] = self.REDACTED
+        if self.should_redact_key(name) or (redact_value and name == 'value'):
+          result[name] = self.REDACTED
         elif isinstance(value, list):
-          d[name] = self.process_list(value)
+          result[name] = self.process_list(value)
         elif isinstance(value, dict):
-          d[name] = self.process_dict(value)
+          result[name] = self.process_dict(value)
         elif isinstance(value, basestring):
-          d[name] = self.process_text(value)
-    return d
+          result[name] = self.process_text(value)
+        else:
+          result[name] = value
+    return result
 
   def __call__(self, data):
     """Scrub data.
@@ -113,11 +241,240 @@ class JsonScrubber(object):
     if isinstance(data, list):
       return self.process_list(data)
     if isinstance(data, basestring):
-      try:
-        value = JSONDecoder().decode(data)
-        scrubbed_value = self(value)
-        return JSONEncoder().encode(scrubbed_value)
-      except (TypeError, ValueError):
-        pass
+      return self.process_json_text(data)
 
     return data
+
+  def process_json_text(self, text):
+    """Scrub JSON text without decoding it.
+
+    The text is scrubbed the same as its decoded JSON value would be, but
+    the text is only tokenized so the value is never built. Only the
+    redacted values are changed; the remaining text is left as it was.
+
+    Args:
+      text: [string] The text to scrub.
+
+    Returns:
+      The scrubbed text, or the original text if it is not JSON.
+    """
+    candidates = None
+    if self.__text_re is not None:
+      candidates = self.__find_candidates(text)
+      if not candidates[0]:
+        # There is nothing to redact regardless of whether this is JSON.
+        return text
+
+    try:
+      return self.__scrub_json_text(text, candidates)
+    except ValueError:
+      return text
+
+  def __find_candidates(self, text):
+    """Finds where JSON text might have something to redact.
+
+    Args:
+      text: [string] The JSON text.
+
+    Returns:
+      A (begins, ends) pair of sorted lists of offsets into the text that
+      cover each match of the regex, BEGIN marker, and unicode escape (which
+      might hide a match). Text outside of these has nothing to redact.
+    """
+    searched = text.lower() if self.__lower_text else text
+    spans = [match.span() for match in self.__text_re.finditer(searched)]
+    for marker in ['BEGIN', '\\u']:
+      index = text.find(marker)
+      while index >= 0:
+        spans.append((index, index + len(marker)))
+        index = text.find(marker, index + 1)
+    spans.sort()
+
+    begins = []
+    ends = []
+    for begin, end in spans:
+      if ends and begin <= ends[-1]:
+        ends[-1] = max(end, ends[-1])
+      else:
+        begins.append(begin)
+        ends.append(end)
+    return begins, ends
+
+  def __decode_string(self, literal):
+    """Returns the value of a JSON string literal."""
+    if '\\' not in literal:
+      return literal[1:-1]
+    return JSONDecoder().decode(literal)
+
+  def __scrub_json_text(self, text, candidates):
+    """Implements process_json_text.
+
+    Args:
+      text: [string] The JSON text to scrub.
+      candidates: [tuple] The offsets from __find_candidates(), or None if
+         anywhere in the text might have something to redact.
+
+    Raises:
+      ValueError if the text is not JSON.
+    """
+    # pylint: disable=too-many-branches
+    # pylint: disable=too-many-statements
+    pieces = []
+    copied = 0           # The end of the text already added to pieces.
+    stack = []           # The _JsonTextContainer for each open container.
+    parent = None        # The innermost open container.
+    skip_depth = None    # The stack depth of the value being redacted.
+    redacted_json = self.__redacted_json
+    decode_string = self.__decode_string
+    should_redact_key = self.should_redact_key
+    skip_members, skip_elements, skip_value = [
+        skip_re.match for skip_re in _get_skip_res()]
+    if candidates is not None:
+      candidate_begins, candidate_ends = candidates
+    else:
+      candidate_begins = candidate_ends = None
+    end = len(text)
+
+    def skip_limit(pos):
+      """Returns the offset that text can be skipped from pos up to."""
+      if skip_depth is not None:
+        return end  # The value being skipped is redacted regardless.
+      if candidate_ends is None:
+        return pos
+      index = bisect.bisect_right(candidate_ends, pos)
+      return candidate_begins[index] if index < len(candidate_begins) else end
+
+    pos = 0
+
+    while True:
+      if parent is not None and parent.expect == 'comma_or_end':
+        match = _SEPARATOR_RE.match(text, pos)
+        if match is None:
+          raise ValueError('Expected , at offset {0}'.format(pos))
+        pos = match.end()
+        separator = match.group(1)
+        if separator == ',':
+          parent.expect = 'key' if parent.is_object else 'value'
+          continue
+        if (separator == '}') != parent.is_object:
+          raise ValueError('Unexpected {0} at offset {1}'.format(
+              separator, match.start(1)))
+        closed = True
+      else:
+        if parent is None:
+          if stack or pos:
+            break
+          match = _ELEMENT_RE.match(text, pos)
+          key = None
+        elif parent.is_object:
+          limit = skip_limit(pos)
+          if limit > pos:
+            skipped = skip_members(text, pos, limit).end()
+            if skipped > pos:
+              pos = skipped
+              parent.skipped_members = True
+              parent.expect = 'key'
+          match = _MEMBER_RE.match(text, pos)
+        else:
+          limit = skip_limit(pos)
+          if limit > pos:
+            skipped = skip_elements(text, pos, limit).end()
+            if skipped > pos:
+              pos = skipped
+              parent.expect = 'value'
+          match = _ELEMENT_RE.match(text, pos)
+        if match is None:
+          raise ValueError('Invalid JSON at offset {0}'.format(pos))
+
+        pos = match.end()
+        groups = match.groups()
+        if parent is not None and parent.is_object:
+          if groups[4] is not None:
+            if parent.expect != 'key_or_end':
+              raise ValueError('Unexpected }} at offset {0}'.format(pos - 1))
+            closed = True
+          else:
+            closed = False
+            key = decode_string(groups[0])
+            parent.key = key
+            parent.num_members += 1
+            literal, scalar, opener = groups[1:4]
+            start = match.start(1 + groups.index(literal or scalar or opener,
+                                                 1, 4))
+        elif groups[3] is not None:
+          if parent is None or parent.expect != 'value_or_end':
+            raise ValueError('Unexpected ] at offset {0}'.format(pos - 1))
+          closed = True
+        else:
+          closed = False
+          literal, scalar, opener = groups[0:3]
+          start = match.start(1 + groups.index(literal or scalar or opener,
+                                               0, 3))
+
+      if closed:
+        stack.pop()
+        if (parent.is_object and parent.num_members == 2
+            and not parent.skipped_members
+            and parent.value_span is not None
+            and isinstance(parent.key_member, basestring)
+            and skip_depth is None
+            and should_redact_key(parent.key_member)):
+          pieces.append(text[copied:pos])
+          copied = pos
+          begin, value_end = parent.value_span
+          pieces[begin:value_end] = [redacted_json]
+        parent = stack[-1] if stack else None
+        if parent is not None:
+          key = parent.key if parent.is_object else None
+      else:
+        # A value begins at start.
+        if parent is not None and parent.is_object and skip_depth is None:
+          if should_redact_key(key):
+            pieces.extend([text[copied:start], redacted_json])
+            skip_depth = len(stack)
+          elif key == 'value':
+            pieces.append(text[copied:start])
+            copied = start
+            parent.value_begin = len(pieces)
+
+        if opener is not None:
+          limit = skip_limit(start)
+          skipped = limit > start and skip_value(text, start, limit)
+          if skipped:
+            # The whole container can be treated like a scalar.
+            pos = skipped.end()
+          else:
+            parent = _JsonTextContainer(opener == '{')
+            stack.append(parent)
+            continue
+
+        if (literal is not None and skip_depth is None
+            and parent is not None and parent.is_object):
+          if key == 'key':
+            parent.key_member = decode_string(literal)
+          if ('BEGIN' in literal
+              and self.process_text(decode_string(literal)) == self.REDACTED):
+            pieces.extend([text[copied:start], redacted_json])
+            copied = pos
+
+      # The value ending at pos is complete.
+      if skip_depth is not None:
+        if skip_depth == len(stack):
+          copied = pos
+          skip_depth = None
+      elif (parent is not None and key == 'value'
+            and parent.value_begin is not None):
+        pieces.append(text[copied:pos])
+        copied = pos
+        parent.value_span = (parent.value_begin, len(pieces))
+        parent.value_begin = None
+      if parent is None:
+        break
+      parent.expect = 'comma_or_end'
+
+    if text[pos:].strip():
+      raise ValueError('Extra data at offset {0}'.format(pos))
+    if copied == 0:
+      return text
+    pieces.append(text[copied:])
+    return ''.join(pieces)
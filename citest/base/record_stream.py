@@ -14,6 +14,7 @@
 
 
 """Implements a frame protocol for writing sized blocks of binary data."""
+import mmap
 import struct
 
 
@@ -25,6 +26,11 @@ class RecordOutputStream(object):
     """Returns the delegate stream being written to."""
     return self.__stream
 
+  @property
+  def position(self):
+    """Returns the offset that the next record will be written at."""
+    return self.__position
+
   def __init__(self, stream):
     """Constructor.
 
@@ -32,6 +38,7 @@ class RecordOutputStream(object):
       stream: [stream] The stream to write into.
     """
     self.__stream = stream
+    self.__position = 0
 
   def close(self):
     """Closes the delegate stream."""
@@ -46,8 +53,11 @@ class RecordOutputStream(object):
     if not isinstance(data, basestring):
       raise TypeError('{0} is not a string'.format(type(data)))
     count = len(data)
-    self.__stream.write(struct.pack('!I', count))
-    self.__stream.write(data)
+
+    # Write the whole frame at once so streams that process each write
+    # independently (e.g. GzipOutputStream) see complete frames.
+    self.__stream.write(struct.pack('!I', count) + data)
+    self.__position += 4 + count
 
 
 class RecordInputStream(object):
@@ -65,6 +75,7 @@ class RecordInputStream(object):
       stream: [stream] The stream to read from.
     """
     self.__stream = stream
+    self.__partial = ''
 
   def __iter__(self):
     """Makes this iterable over the frames."""
@@ -74,6 +85,54 @@ class RecordInputStream(object):
     """Closes the delegate stream."""
     self.__stream.close()
 
+  def seek(self, offset):
+    """Positions the stream to read the record at the given offset.
+
+    Args:
+      offset: [int] The offset of a record, such as from
+         RecordOutputStream.position when the record was written.
+    """
+    self.__stream.seek(offset)
+    self.__partial = ''
+
+  def try_next(self):
+    """Reads the next frame if it has been completely written.
+
+    This is for reading streams that are still being written. Unlike next(),
+    an incomplete frame at the end of the stream is not an error. The part
+    read so far is retained so that a later call can complete the frame
+    once the remainder has been written.
+
+    Returns:
+      The next binary string data written into the stream,
+      or None if there is no complete frame available yet.
+    """
+    partial = self.__partial
+    if len(partial) < 4:
+      partial += self.__read_available(4 - len(partial))
+      if len(partial) < 4:
+        self.__partial = partial
+        return None
+
+    count = struct.unpack('!I', partial[:4])[0]
+    if len(partial) < 4 + count:
+      partial += self.__read_available(4 + count - len(partial))
+      if len(partial) < 4 + count:
+        self.__partial = partial
+        return None
+
+    self.__partial = ''
+    return partial[4:]
+
+  def __read_available(self, size):
+    """Reads up to size bytes from a stream that might still be written."""
+    data = self.__stream.read(size)
+    if len(data) < size:
+      # Files remember that they reached the end, so reposition the file
+      # where it is to forget that and see any data written later.
+      self.__stream.seek(self.__stream.tell())
+    return data
+
   def next(self):
     """Reads the next frame data from the stream.
 
@@ -97,3 +156,99 @@ class RecordInputStream(object):
       raise ValueError(
           'Frame is corrupted -- missing {0}'.format(count - len(value)))
     return value
+
+
+def map_record_file(path):
+  """Maps a file of framed records into memory for MappedRecordInputStream.
+
+  The mapping is read-only and remains valid after this returns, so it
+  can be shared among multiple MappedRecordInputStream readers.
+
+  Args:
+    path: [string] The path to the file to map.
+
+  Returns:
+    A buffer containing the file contents.
+  """
+  with open(path, 'rb') as stream:
+    stream.seek(0, 2)
+    if stream.tell() == 0:
+      # Empty files cannot be mapped, but they have no records either.
+      return ''
+    return mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class MappedRecordInputStream(object):
+  """Reads data elements from a memory mapped framed stream.
+
+  Rather than reading each frame from a file, the frames are returned as
+  read-only buffer slices into the mapping so no data is copied unless the
+  consumer copies it. Each reader keeps its own position so multiple readers
+  can share the same mapping.
+  """
+
+  @property
+  def mapping(self):
+    """Returns the mapping being read from."""
+    return self.__mapping
+
+  def __init__(self, mapping):
+    """Constructor.
+
+    Args:
+      mapping: [buffer] The framed records, such as from map_record_file().
+    """
+    self.__mapping = mapping
+    self.__size = len(mapping)
+    self.__position = 0
+
+  def __iter__(self):
+    """Makes this iterable over the frames."""
+    return self
+
+  def close(self):
+    """Releases the mapping.
+
+    The mapping itself is not closed since it might be shared.
+    """
+    self.__mapping = None
+
+  def tell(self):
+    """Returns the offset of the next record to read."""
+    return self.__position
+
+  def seek(self, offset):
+    """Positions the stream to read the record at the given offset.
+
+    Args:
+      offset: [int] The offset of a record, such as from
+         RecordOutputStream.position when the record was written.
+    """
+    self.__position = offset
+
+  def next(self):
+    """Reads the next frame data from the mapping.
+
+    Returns:
+      A read-only buffer over the next record written into the stream.
+
+    Raises:
+      StopIteration if there are no more records.
+      ValueError if the stream is corrupt.
+    """
+    position = self.__position
+    if position >= self.__size:
+      raise StopIteration()
+
+    if position + 4 > self.__size:
+      raise ValueError('Frame is corrupted len={0} of 4'.format(
+          self.__size - position))
+
+    count = struct.unpack_from('!I', self.__mapping, position)[0]
+    start = position + 4
+    end = start + count
+    if end > self.__size:
+      raise ValueError(
+          'Frame is corrupted -- missing {0}'.format(end - self.__size))
+    self.__position = end
+    return buffer(self.__mapping, start, count)
@@ -59,9 +59,32 @@ the following names and concepts:
      of interest from a testing perspective.
 """
 
+import collections
 import json
 
 
+# The types of values that are already JSON primitives.
+_PRIMITIVE_TYPES = (basestring, bool, int, long, float, None.__class__)
+
+
+def _has_entity_reference(value):
+  """Determines whether a snapshot value contains any entity references.
+
+  Args:
+    value: [any] A value returned by JsonSnapshotHelper.ToJsonSnapshotValue.
+  """
+  pending = [value]
+  while pending:
+    value = pending.pop()
+    if isinstance(value, list):
+      pending.extend(value)
+    elif isinstance(value, dict):
+      if value.get('_type') == 'EntityReference':
+        return True
+      pending.extend(value.values())
+  return False
+
+
 def _normalize_metadata_value(value):
   """Convert value into an appropriate format to use as metadata.
 
@@ -326,37 +349,52 @@ class JsonSnapshotHelper(object):
     However lists and dictionaries may reference other entities that need
     to be snapshotted. For example references to other entities, or other
     object types that need to be converted.
+
+    Nested lists and dictionaries are converted using an explicit stack
+    rather than recursion so that arbitrarily deep values can be converted.
     """
     # pylint: disable=invalid-name
     # pylint: disable=unused-argument
-    if isinstance(value, (basestring, bool, int, long, float, None.__class__)):
+    if isinstance(value, _PRIMITIVE_TYPES):
       return value
 
-    if isinstance(value, JsonSnapshotable):
-      # Turn value into an entity within the snapshot,
-      # and continue the method as if we got the entity.
-      value = snapshot.make_entity_for_data(value)
-
-    if isinstance(value, SnapshotEntity):
-      return {'_type': 'EntityReference', '_id': value.id}
-
-    if isinstance(value, list):
-      return [cls.ToJsonSnapshotValue(elem, snapshot) for elem in value]
-
-    if isinstance(value, dict):
-      result = {}
-      for name, elem in value.items():
-        result[name] = cls.ToJsonSnapshotValue(elem, snapshot)
-      return result
-
-    if isinstance(value, type):
-      return 'type ' + value.__name__
-
-    if isinstance(value, BaseException):
-      return '{0}: {1}'.format(value.__class__.__name__, value)
+    # Each pending conversion is a (value, container, key) tuple where the
+    # converted value is stored into container[key].
+    root = [None]
+    pending = [(value, root, 0)]
+    while pending:
+      value, container, key = pending.pop()
+      if isinstance(value, _PRIMITIVE_TYPES):
+        container[key] = value
+        continue
+
+      if isinstance(value, JsonSnapshotable):
+        # Turn value into an entity within the snapshot,
+        # and continue as if we got the entity.
+        value = snapshot.make_entity_for_data(value)
+
+      if isinstance(value, SnapshotEntity):
+        container[key] = {'_type': 'EntityReference', '_id': value.id}
+      elif isinstance(value, list):
+        converted = [None] * len(value)
+        container[key] = converted
+        # Reversed so the elements are converted in order as they are popped.
+        pending.extend(reversed(
+            [(elem, converted, index) for index, elem in enumerate(value)]))
+      elif isinstance(value, dict):
+        converted = {}
+        container[key] = converted
+        pending.extend(reversed(
+            [(elem, converted, name) for name, elem in value.items()]))
+      elif isinstance(value, type):
+        container[key] = 'type ' + value.__name__
+      elif isinstance(value, BaseException):
+        container[key] = '{0}: {1}'.format(value.__class__.__name__, value)
+      else:
+        raise TypeError(
+            '{0} is not implicitly JsonSnapshotable.'.format(value.__class__))
 
-    raise TypeError(
-        '{0} is not implicitly JsonSnapshotable.'.format(value.__class__))
+    return root[0]
 
   @staticmethod
   def AssertExpectedValue(expect, have, msg=None):
@@ -435,14 +473,19 @@ class JsonSnapshotEdgeBuilder(object):
 
   #pylint: disable=missing-docstring
 
-  def __init__(self, snapshot):
+  def __init__(self, snapshot, size_policy=None):
     """Constructs builder.
 
     Args:
       snapshot: [JsonSnapshot] The snapshot holding the entities.
+      size_policy: [SnapshotSizePolicy] If provided then bound the size of
+         the values that make() adds to entities.
     """
     self.__snapshot = snapshot
     self.__value_helper = JsonSnapshotHelper
+    self.__size_policy = size_policy
+    self.__entity_bytes = {}
+    self.__snapshot_bytes = 0
 
   def new_edge(self, _label, _value, **metadata):
     """Creates a new edge to a target value.
@@ -499,45 +542,63 @@ class JsonSnapshotEdgeBuilder(object):
     The edge will be labeled with |_label| and annotated with |**metadata|
     and added to |_from|.
 
+    If the builder has a size policy and the value is not an entity, then
+    the value may be replaced by an excerpt to keep within the policy's
+    limits, in which case the edge is annotated with 'truncated_bytes',
+    'sha1' and possibly 'blob' describing the original value.
+
+    Values referencing entities (e.g. lists of JsonSnapshotable) are never
+    replaced since an excerpt would leave the entities unreferenced. They
+    still count towards the limits, as do the values within the entities.
+
     Args:
       _from: [SnapshotEntity] The entity to attach the edge source endpoint to.
       _label: [string] The value of a 'label' annotation.
       _value: [any] See new_edge().
       metadata: [kwargs] Additional annotation for the edge.
     """
-    return _from.add_edge(self.new_edge(_label, _value, **metadata))
+    if (self.__size_policy is None
+        or isinstance(_value, (SnapshotEntity, JsonSnapshotable))):
+      return _from.add_edge(self.new_edge(_label, _value, **metadata))
 
-  def make_input(self, _from, _label, _value, **metadata):
+    value = self.__value_helper.ToJsonSnapshotValue(_value, self.__snapshot)
+    entity_bytes = self.__entity_bytes.get(_from.id, 0)
+    if _has_entity_reference(value):
+      num_bytes = self.__size_policy.measure_value(value)
+      truncation = None
+    else:
+      value, num_bytes, truncation = self.__size_policy.bound_value(
+          value, entity_bytes, self.__snapshot_bytes)
+    self.__entity_bytes[_from.id] = entity_bytes + num_bytes
+    self.__snapshot_bytes += num_bytes
+    if truncation:
+      metadata.update(truncation)
     return _from.add_edge(
-        self.new_edge(_label, _value, relation='INPUT', **metadata))
+        self.__new_value_edge(value, label=_label, **metadata))
+
+  def make_input(self, _from, _label, _value, **metadata):
+    return self.make(_from, _label, _value, relation='INPUT', **metadata)
 
   def make_output(self, _from, _label, _value, **metadata):
-    return _from.add_edge(
-        self.new_edge(_label, _value, relation='OUTPUT', **metadata))
+    return self.make(_from, _label, _value, relation='OUTPUT', **metadata)
 
   def make_mechanism(self, _from, _label, _value, **metadata):
-    return _from.add_edge(
-        self.new_edge(_label, _value, relation='MECHANISM', **metadata))
+    return self.make(_from, _label, _value, relation='MECHANISM', **metadata)
 
   def make_control(self, _from, _label, _value, **metadata):
-    return _from.add_edge(
-        self.new_edge(_label, _value, relation='CONTROL', **metadata))
+    return self.make(_from, _label, _value, relation='CONTROL', **metadata)
 
   def make_data(self, _from, _label, _value, **metadata):
-    return _from.add_edge(
-        self.new_edge(_label, _value, relation='DATA', **metadata))
+    return self.make(_from, _label, _value, relation='DATA', **metadata)
 
   def make_error(self, _from, _label, _value, **metadata):
-    return _from.add_edge(
-        self.new_edge(_label, _value, relation='ERROR', **metadata))
+    return self.make(_from, _label, _value, relation='ERROR', **metadata)
 
   def make_valid(self, _from, _label, _value, **metadata):
-    return _from.add_edge(
-        self.new_edge(_label, _value, relation='VALID', **metadata))
+    return self.make(_from, _label, _value, relation='VALID', **metadata)
 
   def make_invalid(self, _from, _label, _value, **metadata):
-    return _from.add_edge(
-        self.new_edge(_label, _value, relation='INVALID', **metadata))
+    return self.make(_from, _label, _value, relation='INVALID', **metadata)
 
   @staticmethod
   def object_count_to_summary(obj, subject='object', plural=None):
@@ -611,10 +672,12 @@ class JsonSnapshot(object):
     """Facilitate associating relations among data within the snapshot."""
     return self.__edge_builder
 
-  def __init__(self, **metadata):
+  def __init__(self, _size_policy=None, **metadata):
     """Constructs snapshot.
 
     Args:
+      _size_policy: [SnapshotSizePolicy] If provided then bound the size of
+         the values recorded into the snapshot by its edge_builder.
       metadata: [kwargs] Metadata to associate with the snapshot.
     """
     self.__last_id = 0
@@ -622,7 +685,12 @@ class JsonSnapshot(object):
     self.__snapshotable_entities = {}
     self.__metadata = _normalize_metadata_kwargs(metadata)
     self.__subject_entity = None
-    self.__edge_builder = JsonSnapshotEdgeBuilder(self)
+    self.__edge_builder = JsonSnapshotEdgeBuilder(
+        self, size_policy=_size_policy)
+
+    # The (snapshotable, entity) pairs waiting to be exported while
+    # another export is in progress, or None when nothing is exporting.
+    self.__pending_exports = None
 
   def add_metadata(self, key, value):
     """Adds a new metadata key.
@@ -645,6 +713,10 @@ class JsonSnapshot(object):
   def make_entity_for_data(self, snapshotable):
     """Returns a possibly shared node for |snapshotable|.
 
+    When called while exporting another snapshotable, the returned entity
+    is not exported until that export finishes. This keeps the export of
+    deeply linked data from recursing through each link.
+
     Args:
       snapshotable: [JsonSnapshotable] Data for a unique entity. The
         entity may already exist with |snapshotable| (as opposed to an
@@ -658,9 +730,28 @@ class JsonSnapshot(object):
       entity = self.new_entity()
       entity.add_metadata('class', snapshotable.__class__)
       self.__snapshotable_entities[id(snapshotable)] = entity
-      snapshotable.export_to_json_snapshot(self, entity)
+      self.__export(snapshotable, entity)
     return entity
 
+  def __export(self, snapshotable, entity):
+    """Exports snapshotable into its entity, along with any it adds.
+
+    Args:
+      snapshotable: [JsonSnapshotable] The data to export.
+      entity: [SnapshotEntity] The entity to export the data into.
+    """
+    if self.__pending_exports is not None:
+      self.__pending_exports.append((snapshotable, entity))
+      return
+
+    self.__pending_exports = collections.deque([(snapshotable, entity)])
+    try:
+      while self.__pending_exports:
+        snapshotable, entity = self.__pending_exports.popleft()
+        snapshotable.export_to_json_snapshot(self, entity)
+    finally:
+      self.__pending_exports = None
+
   def new_entity(self, **metadata):
     """Returns a new entity.
 
@@ -0,0 +1,199 @@
+# Copyright 2015 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Bounds the size of the values recorded into snapshots.
+
+Observations such as listed resources or command output can be megabytes
+of JSON, and are recorded again on every attempt at verifying a clause.
+A SnapshotSizePolicy limits how many bytes of edge values are recorded per
+edge, per entity and per snapshot. Values that do not fit are replaced by
+an excerpt of their head and tail, and the edge is annotated with the size
+and digest of the original value. The original value can optionally be
+written into a side blob file named by its digest.
+
+Sizes are measured as the length of the compact JSON encoding of the value,
+or the length of the value itself if it is a string.
+"""
+
+import hashlib
+import os
+import tempfile
+
+from .deep_json import DeepJsonEncoder
+
+
+class SnapshotSizePolicy(object):
+  """Specifies the limits on the size of values recorded into a snapshot.
+
+  The policy is only configuration, so can be shared among snapshots.
+  The bytes recorded so far are tracked by each snapshot's edge builder.
+  """
+
+  @property
+  def max_value_bytes(self):
+    """The maximum bytes recorded for an individual edge value, or None."""
+    return self.__max_value_bytes
+
+  @property
+  def max_entity_bytes(self):
+    """The maximum bytes of edge values recorded per entity, or None."""
+    return self.__max_entity_bytes
+
+  @property
+  def max_snapshot_bytes(self):
+    """The maximum bytes of edge values recorded per snapshot, or None."""
+    return self.__max_snapshot_bytes
+
+  @property
+  def excerpt_bytes(self):
+    """The number of bytes kept from each end of a truncated value."""
+    return self.__excerpt_bytes
+
+  @property
+  def blob_dir(self):
+    """The directory to write truncated values into, or None."""
+    return self.__blob_dir
+
+  def __init__(self, max_value_bytes=None, max_entity_bytes=None,
+               max_snapshot_bytes=None, excerpt_bytes=256, blob_dir=None):
+    """Constructor.
+
+    Args:
+      max_value_bytes: [int] If provided, the maximum size of any one value.
+      max_entity_bytes: [int] If provided, the maximum total size of the
+         values on the edges of any one entity.
+      max_snapshot_bytes: [int] If provided, the maximum total size of the
+         values on the edges within any one snapshot.
+      excerpt_bytes: [int] The number of bytes to keep from both the head
+         and the tail of values that are truncated. Excerpts are kept even
+         if they exceed the remaining entity or snapshot budget.
+      blob_dir: [string] If provided, the directory to write the complete
+         value of truncated values into. The files are named by the digest
+         of their content so repeated values are only written once.
+    """
+    for name, value in [('max_value_bytes', max_value_bytes),
+                        ('max_entity_bytes', max_entity_bytes),
+                        ('max_snapshot_bytes', max_snapshot_bytes),
+                        ('excerpt_bytes', excerpt_bytes)]:
+      if value is not None and value < 0:
+        raise ValueError('{0}={1} must not be negative'.format(name, value))
+
+    self.__max_value_bytes = max_value_bytes
+    self.__max_entity_bytes = max_entity_bytes
+    self.__max_snapshot_bytes = max_snapshot_bytes
+    self.__excerpt_bytes = excerpt_bytes
+    self.__blob_dir = blob_dir
+    self.__encoder = DeepJsonEncoder(separators=(',', ':'))
+
+  def bound_value(self, value, entity_bytes=0, snapshot_bytes=0):
+    """Bounds the size of an edge value.
+
+    Args:
+      value: [any] The JSON encodable edge value.
+      entity_bytes: [int] The bytes already recorded for the entity.
+      snapshot_bytes: [int] The bytes already recorded for the snapshot.
+
+    Returns:
+      A (value, num_bytes, metadata) tuple where value is either the
+      original value or an excerpt of it, num_bytes is the size of the
+      returned value, and metadata is a dictionary of edge annotations
+      describing the truncation, or None if the value was not truncated.
+    """
+    text = self.__to_text(value)
+    if text is None:
+      return value, 0, None
+
+    num_bytes = len(text)
+    if not self.__exceeds(num_bytes, entity_bytes, snapshot_bytes):
+      return value, num_bytes, None
+
+    digest = hashlib.sha1(text).hexdigest()
+    metadata = {'truncated_bytes': num_bytes, 'sha1': digest}
+    if self.__blob_dir is not None:
+      metadata['blob'] = self.__write_blob(
+          text, digest, '.txt' if isinstance(value, basestring) else '.json')
+
+    keep = self.__excerpt_bytes
+    if keep * 2 >= num_bytes:
+      # The budget was exhausted but the value is no bigger than its excerpt.
+      excerpt = text
+    else:
+      excerpt = '{head}\n... [{omitted} bytes omitted] ...\n{tail}'.format(
+          head=text[:keep], omitted=num_bytes - 2 * keep,
+          tail=text[num_bytes - keep:])
+    excerpt = excerpt.decode('utf-8', 'replace')
+    return excerpt, len(excerpt), metadata
+
+  def measure_value(self, value):
+    """Returns the size of an edge value, as measured by bound_value().
+
+    Args:
+      value: [any] The JSON encodable edge value.
+    """
+    text = self.__to_text(value)
+    return 0 if text is None else len(text)
+
+  def __to_text(self, value):
+    """Returns the text a value is measured and excerpted by.
+
+    Returns:
+      The encoded value or None if the value is primitive so is not bounded.
+    """
+    if value is None or isinstance(value, (bool, int, long, float)):
+      return None
+    if isinstance(value, basestring):
+      return value.encode('utf-8') if isinstance(value, unicode) else value
+    return self.__encoder.encode(value)
+
+  def __exceeds(self, num_bytes, entity_bytes, snapshot_bytes):
+    """Determines whether num_bytes more bytes would exceed any limit."""
+    return ((self.__max_value_bytes is not None
+             and num_bytes > self.__max_value_bytes)
+            or (self.__max_entity_bytes is not None
+                and entity_bytes + num_bytes > self.__max_entity_bytes)
+            or (self.__max_snapshot_bytes is not None
+                and snapshot_bytes + num_bytes > self.__max_snapshot_bytes))
+
+  def __write_blob(self, text, digest, extension):
+    """Writes the complete text of a truncated value into the blob_dir.
+
+    Returns:
+      The path to the blob file.
+    """
+    path = os.path.join(self.__blob_dir, digest + extension)
+    if os.path.exists(path):
+      return path
+
+    try:
+      os.makedirs(self.__blob_dir)
+    except OSError:
+      if not os.path.isdir(self.__blob_dir):
+        raise
+
+    # Write then rename so that readers never see partial blobs. Each writer
+    # has its own temporary file since other threads or processes might be
+    # writing the same blob concurrently.
+    fd, tmp_path = tempfile.mkstemp(dir=self.__blob_dir, suffix='.tmp')
+    try:
+      with os.fdopen(fd, 'wb') as stream:
+        stream.write(text)
+      os.rename(tmp_path, path)
+    except (IOError, OSError):
+      if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+      # Blobs are named by their content, so another writer's is as good.
+      if not os.path.exists(path):
+        raise
+    return path
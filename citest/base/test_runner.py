@@ -77,6 +77,22 @@ _DEFAULT_LOG_CONFIG = """{
 """
 
 
+def write_journal_html_report(journal_path):
+  """Renders a journal into an HTML report in the current directory.
+
+  This is the default TestRunner journal processor.
+
+  Args:
+    journal_path: [string] The path to the finished journal.
+  """
+  # The reporting package depends on this one, so import it only when
+  # needed rather than when this module is loaded.
+  from citest.reporting.generate_html_report import render_journal
+  render_journal(journal_path)
+  sys.stdout.write('Wrote {0}.html\n'.format(
+      os.path.basename(os.path.splitext(journal_path)[0])))
+
+
 class TestRunner(object):
   """Provides additional reporting for existing TestRunners.
 
@@ -132,6 +148,16 @@ class TestRunner(object):
     """
     return self.__default_binding_overrides
 
+  @property
+  def journal_processors(self):
+    """List of callable objects taking the path of the finished journal.
+
+    These are run within this process once the tests finish. The default
+    renders the journal into an HTML report. Programs can add their own
+    processors or remove the default.
+    """
+    return self.__journal_processors
+
   @staticmethod
   def global_runner():
     """Returns the TestRunner instance.
@@ -194,22 +220,28 @@ class TestRunner(object):
       journal_path = os.path.join(
           self.bindings['LOG_DIR'],
           self.bindings['LOG_FILEBASE'] + '.journal')
-      # Ideally we just call generate_html_report.main here directly.
-      # However, this leads to a circular dependency. So, we'll fork a
-      # process for it to decouple the modules when parsing.
-      generate_command = ['python',
-                          '-m', 'citest.reporting.generate_html_report',
-                          '--noindex', journal_path]
-      logger.info('Running %s', generate_command)
-      retcode = os.system(' '.join(generate_command))
-      if not retcode:
-        sys.stdout.write('Wrote {0}.html\n'.format(
-            os.path.splitext(journal_path)[0]))
-      else:
-        logger.error('Could not write %s.html\n', journal_path)
+      self.process_journal(journal_path)
 
     return len(result.failures) + len(result.errors)
 
+  def process_journal(self, journal_path):
+    """Runs each of the journal_processors on the finished journal.
+
+    A processor failing is logged rather than failing the test run.
+
+    Args:
+      journal_path: [string] The path to the finished journal.
+    """
+    logger = logging.getLogger(__name__)
+    for processor in self.__journal_processors:
+      name = getattr(processor, '__name__', repr(processor))
+      logger.info('Running %s on %s', name, journal_path)
+      try:
+        processor(journal_path)
+      except Exception as ex:
+        logger.exception('%s failed to process %s: %s',
+                         name, journal_path, ex)
+
   def __init__(self, runner=None):
     TestRunner.__global_runner = self
     self.__delegate = runner or unittest.TextTestRunner(verbosity=2)
@@ -217,6 +249,7 @@ class TestRunner(object):
     self.__bindings = {}
     self.__default_binding_overrides = {}
     self.__journal = None
+    self.__journal_processors = [write_journal_html_report]
 
   def run(self, obj_or_suite):
     """Run tests.
@@ -43,6 +43,9 @@ from observation_failure import (
     ObservationFailureVerifier)
 
 
+from attempt_history import ClauseAttemptHistory
+
+
 # The contract module provides a means to specify and verify contracts on
 # expected system state, and how to collect that state using observations.
 from contract import (
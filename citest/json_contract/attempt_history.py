@@ -0,0 +1,112 @@
+# Copyright 2015 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Records the history of attempts at verifying a contract clause.
+
+Clauses that are retried until they hold typically observe almost the same
+thing on every attempt while waiting for an eventually consistent resource
+to converge. The history records the first observation in full then only
+the differences from the previous observation for each later attempt.
+"""
+
+import time
+
+from ..base import (
+    DeepJsonDecoder,
+    DeepJsonEncoder,
+    JsonSnapshotable,
+    diff_json)
+
+
+class ClauseAttemptHistory(JsonSnapshotable):
+  """The observations made by each attempt at verifying a clause.
+
+  Each attempt is exported as an edge labeled 'Attempt <N>'. The value of
+  the first edge is the attempt's observation encoded as a JSON dictionary
+  with 'objects', 'errors' and 'valid' keys. The values of the later edges
+  are the diff_json() from the previous attempt's value, and the edges are
+  annotated with 'delta_of' naming the label of the previous edge.
+  """
+
+  @property
+  def num_attempts(self):
+    """The number of attempts recorded."""
+    return len(self.__attempts)
+
+  def __init__(self, now_function=time.time):
+    """Constructor.
+
+    Args:
+      now_function: [time] Returns the current time to record attempts with.
+    """
+    self.__now_function = now_function
+    # Observations can be nested deeper than the recursion limit.
+    self.__encoder = DeepJsonEncoder(default=repr)
+    self.__decoder = DeepJsonDecoder()
+
+    # The (timestamp, valid, value) of each attempt where value is the full
+    # value for the first attempt and the diff from the previous otherwise.
+    self.__attempts = []
+    self.__last_value = None
+
+  def add_attempt(self, observation, verify_result):
+    """Records an attempt.
+
+    Args:
+      observation: [Observation] The observation made by the attempt.
+      verify_result: [PredicateResult] The result of verifying observation.
+    """
+    # Encoding then decoding copies the observation into plain JSON values
+    # so that the history is unaffected by later changes to the objects.
+    value = self.__decoder.decode(self.__encoder.encode({
+        'objects': observation.objects,
+        'errors': [str(error) for error in observation.errors],
+        'valid': bool(verify_result)}))
+
+    if self.__attempts:
+      recorded = diff_json(self.__last_value, value)
+    else:
+      recorded = value
+    self.__attempts.append((self.__now_function(), bool(verify_result),
+                            recorded))
+    self.__last_value = value
+
+  def freeze(self):
+    """Returns a copy of the history unaffected by later attempts.
+
+    This is what should be stored into a journal, since the journal might
+    export it into a snapshot later while attempts are still being added.
+    """
+    frozen = ClauseAttemptHistory(now_function=self.__now_function)
+    # pylint: disable=protected-access
+    # The recorded attempts are never modified, only appended to.
+    frozen.__attempts = list(self.__attempts)
+    frozen.__last_value = self.__last_value
+    return frozen
+
+  def export_to_json_snapshot(self, snapshot, entity):
+    """Implements JsonSnapshotable interface."""
+    builder = snapshot.edge_builder
+    entity.add_metadata('_title', 'Attempt History')
+    entity.add_metadata(
+        'summary', builder.object_count_to_summary(self.__attempts, 'attempt'))
+    for index, attempt in enumerate(self.__attempts):
+      timestamp, valid, value = attempt
+      metadata = {'format': 'json', 'timestamp': timestamp}
+      if index > 0:
+        metadata['delta_of'] = 'Attempt {0}'.format(index)
+      builder.make(entity, 'Attempt {0}'.format(index + 1), value,
+                   relation=builder.determine_valid_relation(valid),
+                   **metadata)
@@ -31,6 +31,7 @@ from ..base import JsonSnapshotable
 from ..json_predicate import predicate
 from . import observer as ob
 from . import observation_verifier as ov
+from .attempt_history import ClauseAttemptHistory
 
 
 class ContractClauseVerifyResult(predicate.PredicateResult):
@@ -117,6 +118,21 @@ class ContractClause(predicate.ValuePredicate):
     """The name of the clause for reporting purposes."""
     return self.__title
 
+  @property
+  def attempt_history(self):
+    """The ClauseAttemptHistory being recorded, or None if not recording.
+
+    verify() starts a new history each time it is called. Calls to
+    verify_once() add to the current history. verify() journals a frozen
+    copy of its history so later calls do not change what was journaled.
+    """
+    return self.__attempt_history
+
+  @property
+  def decide_fast(self):
+    """Whether intermediate attempts only decide if the clause holds."""
+    return self.__decide_fast
+
   def __str__(self):
     return 'Clause {0}  verifier={1}'.format(self.__title, self.__verifier)
 
@@ -132,7 +148,8 @@ class ContractClause(predicate.ValuePredicate):
     snapshot.edge_builder.make_mechanism(entity, 'Verifier', self.__verifier)
 
   def __init__(self, title, observer=None, verifier=None,
-               retryable_for_secs=0):
+               retryable_for_secs=0, record_attempts=False,
+               decide_fast=False):
     """Construct clause.
 
     Args:
@@ -141,11 +158,21 @@ class ContractClause(predicate.ValuePredicate):
       verifier: A ObservationVerifier on the observer's Observations.
       retryable_for_secs: If > 0, then how long to continue retrying
         when a verification attempt fails.
+      record_attempts: If True then record the observation made by each
+        verification attempt into an attempt_history, and journal the
+        history when verify() finishes.
+      decide_fast: If True then verify() only determines whether each
+        attempt holds, stopping at the first failed constraint, then
+        verifies the final observation again in full for the report.
     """
     self.__title = title
     self.__observer = observer
     self.__verifier = verifier
     self.__retryable_for_secs = retryable_for_secs
+    self.__record_attempts = record_attempts
+    self.__decide_fast = decide_fast
+    self.__attempt_history = (ClauseAttemptHistory() if record_attempts
+                              else None)
     self.logger = logging.getLogger(__name__)
 
   def verify(self):
@@ -183,11 +210,15 @@ class ContractClause(predicate.ValuePredicate):
     """
 
     # self.logger.debug('Verifying Contract: %s', self.__title)
+    if self.__record_attempts:
+      self.__attempt_history = ClauseAttemptHistory()
     start_time = time.time()
     end_time = start_time + self.__retryable_for_secs
 
     while True:
-      clause_result = self.verify_once()
+      observation = self.__observe()
+      clause_result = self.__verify_observation(
+          observation, decide_fast=self.__decide_fast)
       if clause_result:
         break
 
@@ -206,6 +237,18 @@ class ContractClause(predicate.ValuePredicate):
           self.__title, secs_remaining, sleep, clause_result)
       time.sleep(sleep)
 
+    if self.__decide_fast:
+      # The attempts only decided whether the clause held, so verify the
+      # final observation again to report all the details.
+      clause_result = self.__verify_observation(
+          observation, decide_fast=False, record=False)
+
+    if self.__attempt_history is not None:
+      # The journal might export the history after more attempts were added.
+      JournalLogger.delegate(
+          "store", self.__attempt_history.freeze(),
+          _title='Attempt History of "{0}"'.format(self.__title))
+
     summary = clause_result.enumerated_summary_message
     ok_str = 'OK' if clause_result else 'FAILED'
     JournalLogger.delegate(
@@ -215,15 +258,27 @@ class ContractClause(predicate.ValuePredicate):
                       ok_str, self.__title, summary)
     return clause_result
 
-  def verify_once(self):
+  def verify_once(self, decide_fast=False):
     """Make a single attempt to collect an observation and verify it.
 
+    Args:
+      decide_fast: [bool] If True then only determine whether the clause
+         holds, without collecting all the details as to why.
+
     Raises:
       ValueError of the clause is not yet fully specified.
 
     Returns:
       ContractClauseVerifyResult from verifying the observation
     """
+    return self.__verify_observation(self.__observe(), decide_fast)
+
+  def __observe(self):
+    """Collects a new observation to verify.
+
+    Raises:
+      ValueError of the clause is not yet fully specified.
+    """
     if not self.__observer:
       raise ValueError(
           'No ObjectObserver bound to clause {0!r}'.format(self.__title))
@@ -233,8 +288,23 @@ class ContractClause(predicate.ValuePredicate):
 
     observation = ob.Observation()
     self.__observer.collect_observation(observation)
+    return observation
+
+  def __verify_observation(self, observation, decide_fast, record=True):
+    """Verifies an observation made by __observe().
+
+    Args:
+      observation: [Observation] The observation to verify.
+      decide_fast: [bool] Whether to only determine if the clause holds.
+      record: [bool] Whether to add the attempt to the attempt_history.
 
-    verify_result = self.__verifier(observation)
+    Returns:
+      ContractClauseVerifyResult from verifying the observation
+    """
+    verify_result = (self.__verifier(observation, decide_fast=True)
+                     if decide_fast else self.__verifier(observation))
+    if record and self.__attempt_history is not None:
+      self.__attempt_history.add_attempt(observation, verify_result)
     return ContractClauseVerifyResult(
         verify_result.__nonzero__(), self, verify_result)
 
@@ -265,6 +335,26 @@ class ContractClauseBuilder(object):
     """Set how long to continue validating the clause until it holds."""
     self.__retryable_for_secs = secs
 
+  @property
+  def record_attempts(self):
+    """Whether the clause records the history of its verification attempts."""
+    return self.__record_attempts
+
+  @record_attempts.setter
+  def record_attempts(self, record):
+    """Sets whether the clause records its verification attempts."""
+    self.__record_attempts = record
+
+  @property
+  def decide_fast(self):
+    """Whether intermediate attempts only decide if the clause holds."""
+    return self.__decide_fast
+
+  @decide_fast.setter
+  def decide_fast(self, decide_fast):
+    """Sets whether intermediate attempts only decide if the clause holds."""
+    self.__decide_fast = decide_fast
+
   @property
   def observer(self):
     """The observer used to gather the required data to verify."""
@@ -293,6 +383,8 @@ class ContractClauseBuilder(object):
     self.__verifier_builder = (verifier_builder
                                or ov.ObservationVerifierBuilder(title))
     self.__retryable_for_secs = retryable_for_secs
+    self.__record_attempts = False
+    self.__decide_fast = False
     if strict:
       logger = logging.getLogger(__name__)
       logger.warning('Strict flag is DEPRECATED in %s', title)
@@ -303,7 +395,9 @@ class ContractClauseBuilder(object):
         title=self.__title,
         observer=self.__observer,
         verifier=self.__verifier_builder.build(),
-        retryable_for_secs=self.__retryable_for_secs)
+        retryable_for_secs=self.__retryable_for_secs,
+        record_attempts=self.__record_attempts,
+        decide_fast=self.__decide_fast)
 
 
 class ContractVerifyResult(predicate.PredicateResult):
@@ -293,11 +293,15 @@ class ObservationVerifier(predicate.ValuePredicate):
   def __str__(self):
     return 'ObservationVerifier {0!r}'.format(self.__dnf_verifiers)
 
-  def __call__(self, observation):
+  def __call__(self, observation, decide_fast=False):
     """Verify the observation.
 
     Args:
       observation: The observation to verify.
+      decide_fast: [bool] If True then the result only needs to be valid or
+         not, so verifiers may stop before collecting all the details
+         about why. This is intended for intermediate attempts at a clause
+         that will be retried anyway.
 
     Returns:
       ObservationVerifyResult containing the verification results.
@@ -315,7 +319,10 @@ class ObservationVerifier(predicate.ValuePredicate):
        term_valid = True
        # Inner terms are and'd together.
        for v in term:
-          result = v(observation)
+          # Only pass decide_fast when set so that verifiers predating it
+          # still work in the default mode.
+          result = (v(observation, decide_fast=True) if decide_fast
+                    else v(observation))
           builder.add_observation_verify_result(result)
           if not result:
             term_valid = False
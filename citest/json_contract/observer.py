@@ -17,6 +17,9 @@
 
 
 from ..base import JsonSnapshotable
+from ..json_predicate import (
+    PathValueIndex,
+    ValuePredicate)
 
 class Observation(JsonSnapshotable):
   """Tracks details for ObjectObserver and ObservationVerifier."""
@@ -31,9 +34,21 @@ class Observation(JsonSnapshotable):
     """Failed PredicateResult objects or other observer errors."""
     return self.__errors
 
+  @property
+  def path_index(self):
+    """A PathValueIndex on the observed objects.
+
+    This is shared by the predicates verifying the observation so that
+    paths are only traversed once. It is reset when objects are added.
+    """
+    if self.__path_index is None:
+      self.__path_index = PathValueIndex(self.__objects)
+    return self.__path_index
+
   def __init__(self):
     self.__objects = []
     self.__errors = []
+    self.__path_index = None
 
   def export_to_json_snapshot(self, snapshot, entity):
     """Implements JsonSnapshotable interface."""
@@ -73,6 +88,7 @@ class Observation(JsonSnapshotable):
       obj: The object to add.
     """
     self.__objects.append(obj)
+    self.__path_index = None
 
   def add_all_objects(self, objs):
     """Adds a list of observed objects.
@@ -82,6 +98,7 @@ class Observation(JsonSnapshotable):
         To add the list as a single object, call add_object.
     """
     self.__objects.extend(objs)
+    self.__path_index = None
 
   def extend(self, observation):
     """Extend the observation by another call.
@@ -91,6 +108,7 @@ class Observation(JsonSnapshotable):
     """
     self.__objects.extend(observation.objects)
     self.__errors.extend(observation.errors)
+    self.__path_index = None
 
   @staticmethod
   def error_lists_equal(list_a, list_b):
@@ -160,9 +178,14 @@ class ObjectObserver(JsonSnapshotable):
 
     if not isinstance(objects, list):
       objects = [objects]
+
+    # Only whether each object passes matters, so compile the filter.
+    if isinstance(self.__filter, ValuePredicate):
+      passes = self.__filter.compile()
+    else:
+      passes = self.__filter
     for obj in objects:
-      obj_result = self.__filter(obj)
-      if obj_result:
+      if passes(obj):
         observation.add_object(obj)
 
   def collect_observation(self, observation, trace=True):
@@ -163,7 +163,18 @@ class ValueObservationVerifier(ov.ObservationVerifier):
     self.__strict = strict
     self.__constraints = constraints
 
-  def __call__(self, observation):
+  def __call__(self, observation, decide_fast=False):
+    """Verify the observation.
+
+    Args:
+      observation: [Observation] The observation to verify.
+      decide_fast: [bool] If True then only determine whether the
+         observation is valid. The constraints are compiled and only the
+         first failed constraint is reported.
+
+    Returns:
+      ObservationVerifyResult containing the verification results.
+    """
     if observation.errors:
       logging.getLogger(__name__).debug(
           'Failing because of observation errors %s', observation.errors)
@@ -175,6 +186,7 @@ class ValueObservationVerifier(ov.ObservationVerifier):
           comment='Observation Failed.')
 
     all_objects = observation.objects
+    path_index = None
     if not all_objects:
       # If we have no objects, then we will not iterate over anything
       # so will not check any contracts.
@@ -185,6 +197,12 @@ class ValueObservationVerifier(ov.ObservationVerifier):
       object_list = [None]
     else:
       object_list = all_objects
+      path_index = observation.path_index
+
+    if decide_fast and not self.__strict:
+      # Strict verifiers count the objects each constraint validated,
+      # so need the detailed results.
+      return self.__decide(observation, object_list)
 
     # Every constraint must be satisfied by at least one object.
     # If strict then every object must be verified by at least one
@@ -196,7 +214,12 @@ class ValueObservationVerifier(ov.ObservationVerifier):
       logging.getLogger(__name__).debug('Verifying constraint=%s',
                                         constraint)
 
-      if isinstance(constraint, path_predicate.ProducesPathPredicateResult):
+      if isinstance(constraint, (path_predicate.PathPredicate,
+                                 cardinality_predicate.CardinalityPredicate)):
+        # These share the traversal of paths through the objects.
+        constraint_result = constraint(object_list, path_index=path_index)
+      elif isinstance(constraint,
+                      path_predicate.ProducesPathPredicateResult):
         constraint_result = constraint(object_list)
       else:
         constraint_result = (
@@ -207,6 +230,8 @@ class ValueObservationVerifier(ov.ObservationVerifier):
         valid = False
 
       final_builder.add_path_predicate_result(constraint_result)
+      if decide_fast and not valid:
+        break
 
     if valid and self.__strict:
       len_validated = len(final_builder.validated_object_set)
@@ -219,3 +244,25 @@ class ValueObservationVerifier(ov.ObservationVerifier):
         logging.getLogger(__name__).info(comment)
 
     return final_builder.build(valid)
+
+  def __decide(self, observation, object_list):
+    """Determines whether the constraints hold without explaining why.
+
+    Args:
+      observation: [Observation] The observation being verified.
+      object_list: [list] The objects to apply the constraints to.
+
+    Returns:
+      ObservationVerifyResult noting the first failed constraint, if any.
+    """
+    builder = ov.ObservationVerifyResultBuilder(observation)
+    for constraint in self.__constraints:
+      if isinstance(constraint, path_predicate.ProducesPathPredicateResult):
+        holds = constraint.compile()
+      else:
+        holds = path_predicate.PathPredicate('', constraint).compile()
+      if not holds(object_list):
+        logging.getLogger(__name__).debug('FAILED constraint=%s', constraint)
+        builder.add_failed_constraint(constraint)
+        return builder.build(False)
+    return builder.build(True)
@@ -55,7 +55,8 @@ from .path_predicate_result import (
 
 from .path_predicate import (
     DONT_ENUMERATE_TERMINAL,
-    PathPredicate)
+    PathPredicate,
+    PathValueIndex)
 
 from .binary_predicate import (
     BinaryPredicate,
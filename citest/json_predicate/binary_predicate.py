@@ -21,6 +21,7 @@ predicate to.
 """
 
 
+import collections
 import inspect
 
 from . import predicate
@@ -129,6 +130,117 @@ class StandardBinaryPredicate(BinaryPredicate):
     return PathValueResult(pred=self, source=value, target_path='',
                            path_value=PathValue('', value), valid=valid)
 
+  def compile(self):
+    """Implements ValuePredicate interface."""
+    operand = self.operand
+    operand_type = self.__type
+    comparison_op = self.__comparison_op
+    if not operand_type:
+      return lambda value: bool(comparison_op(value, operand))
+    return lambda value: (isinstance(value, operand_type)
+                          and bool(comparison_op(value, operand)))
+
+
+# The _quick_* functions below determine the same outcome as the predicates
+# they correspond to, but without constructing any predicates or results.
+# They return True or False if the predicate would be valid or not, or
+# None if they are not certain (e.g. the predicate would raise an error).
+
+
+def _quick_is_subset(a, b):
+  """Determine whether the dict |a| is a subset of the dict |b|.
+
+  This corresponds to DictSubsetPredicate._is_subset.
+  """
+  for name, a_value in a.iteritems():
+    if name not in b:
+      return False
+    b_value = b[name]
+    if isinstance(b_value, dict):
+      if not isinstance(a_value, dict):
+        return None
+      outcome = _quick_is_subset(a_value, b_value)
+    elif isinstance(b_value, list):
+      if isinstance(a_value, list):
+        outcome = _quick_list_subset(a_value, b_value)
+      else:
+        outcome = _quick_contains(a_value, b_value)
+    else:
+      outcome = a_value == b_value
+    if outcome is not True:
+      return outcome
+  return True
+
+
+def _quick_list_subset(a, b):
+  """Determine whether the list |a| is a subset of the list |b|.
+
+  This corresponds to a non-strict ListSubsetPredicate.
+  """
+  list_index = _ListIndex.make_if_worthwhile(a, b)
+  for elem in a:
+    if isinstance(elem, (int, long, float, basestring)):
+      try:
+        found = (list_index.contains(elem) if list_index is not None
+                 else elem in b)
+      except TypeError:
+        found = elem in b
+      if not found:
+        return False
+      continue
+
+    if isinstance(elem, dict):
+      candidates = (list_index.subset_candidates(elem)
+                    if list_index is not None else b)
+      quick_check = _quick_is_subset
+      elem_type = dict
+    elif isinstance(elem, list):
+      candidates = b
+      quick_check = _quick_list_subset
+      elem_type = list
+    else:
+      return None
+
+    for value in candidates:
+      if isinstance(value, elem_type):
+        outcome = quick_check(elem, value)
+        if outcome is not False:
+          if outcome is None:
+            return None
+          break
+    else:
+      return False
+  return True
+
+
+def _quick_contains(operand, value):
+  """Determine whether |value| contains |operand|.
+
+  This corresponds to ContainsPredicate.
+  """
+  if isinstance(value, basestring):
+    if not isinstance(operand, basestring):
+      return None
+    return value.find(operand) >= 0
+  if isinstance(value, dict):
+    if not isinstance(operand, dict):
+      return None
+    return _quick_is_subset(operand, value)
+  if isinstance(value, int):
+    if not isinstance(operand, (int, long, float)):
+      return None
+    return value == operand
+  if not isinstance(value, list):
+    return None
+  if isinstance(operand, list):
+    return _quick_list_subset(operand, value)
+
+  for elem in value:
+    outcome = _quick_contains(operand, elem)
+    if outcome is not False:
+      return outcome
+  return False
+
 
 class DictSubsetPredicate(BinaryPredicate):
   """Implements binary predicate comparison predicates against dict values."""
@@ -142,8 +254,27 @@ class DictSubsetPredicate(BinaryPredicate):
   def __call__(self, value):
     if not isinstance(value, dict):
       return TypeMismatchError(dict, value.__class__, value)
+
+    # Subsets usually hold, so first check without building any results.
+    # Only if that is not certain is the check repeated to explain why.
+    if _quick_is_subset(self.operand, value) is True:
+      return PathValueResult(
+          pred=self, source=value, target_path='',
+          path_value=PathValue('', value), valid=True)
     return self._is_subset(value, '', self.operand, value)
 
+  def compile(self):
+    """Implements ValuePredicate interface."""
+    operand = self.operand
+    def is_subset(value):
+      if not isinstance(value, dict):
+        return False
+      outcome = _quick_is_subset(operand, value)
+      if outcome is None:
+        return bool(self._is_subset(value, '', operand, value))
+      return outcome
+    return is_subset
+
   def _is_subset(self, source, path, a, b):
     """Determine if |a| is a subset of |b|.
 
@@ -179,7 +310,7 @@ class DictSubsetPredicate(BinaryPredicate):
         elem_pred = LIST_SUBSET if isinstance(a_value, list) else CONTAINS
         result = elem_pred(a_value)(b_value)
         if not result:
-          return result.clone_in_context(source, namepath)
+          return result.clone_in_context(source, namepath, namepath)
         continue
 
       # Otherwise, we want an exact match.
@@ -212,6 +343,145 @@ class DictSubsetPredicate(BinaryPredicate):
         path_value=PathValue(path, b), valid=True)
 
 
+_SCALAR_TYPES = (int, long, float, basestring, type(None))
+
+
+def _freeze_json(value):
+  """Returns a hashable form of a JSON value.
+
+  The frozen forms of two values are equal if and only if the values are.
+
+  Raises:
+    TypeError if the value is not JSON.
+  """
+  if isinstance(value, _SCALAR_TYPES):
+    return value
+  if isinstance(value, list):
+    return tuple([_freeze_json(elem) for elem in value])
+  if isinstance(value, dict):
+    return frozenset([(key, _freeze_json(elem))
+                      for key, elem in value.iteritems()])
+  raise TypeError('Unhandled type {0}'.format(value.__class__))
+
+
+class _ListIndex(object):
+  """Hashes the elements of a list to find members without scanning it.
+
+  The hashes are built on first use then shared by each element looked up.
+  """
+
+  # Scanning is faster than indexing unless there are more comparisons.
+  MIN_INDEXED_COMPARISONS = 256
+
+  @staticmethod
+  def make_if_worthwhile(elems, the_list):
+    """Returns an index of the_list for looking up elems, or None.
+
+    Args:
+      elems: [list] The elements that will be looked up.
+      the_list: [list] The list to look them up in.
+
+    Returns:
+      A _ListIndex or None if the_list should be scanned instead.
+    """
+    if (len(elems) > 1
+        and len(elems) * len(the_list) >= _ListIndex.MIN_INDEXED_COMPARISONS):
+      return _ListIndex(the_list)
+    return None
+
+  def __init__(self, the_list):
+    """Constructor.
+
+    Args:
+      the_list: [list] The list to index. This must not be changed.
+    """
+    self.__list = the_list
+    self.__members = None
+    self.__buckets = {}
+
+  def contains(self, elem):
+    """Determine whether elem is equal to a member of the list.
+
+    Raises:
+      TypeError if elem or an element of the list is not JSON.
+    """
+    if self.__members is None:
+      try:
+        self.__members = set([_freeze_json(value) for value in self.__list])
+      except TypeError:
+        self.__members = False
+    if self.__members is False:
+      raise TypeError('The list is not JSON')
+    return _freeze_json(elem) in self.__members
+
+  def subset_candidates(self, elem):
+    """Returns the members of the list that might be supersets of elem.
+
+    Members can only be supersets of the dict elem if they are dicts with
+    matching values for each of the scalar values in elem, and with list
+    values containing each scalar in the lists in elem. The candidates are
+    those matching the value with the fewest such members.
+
+    Args:
+      elem: [dict] The dictionary to find supersets of.
+    """
+    candidates = None
+    for key, value in elem.iteritems():
+      if isinstance(value, _SCALAR_TYPES):
+        by_value, _, containers = self.__get_bucket(key)
+        matches = by_value.get(value, []) + containers
+      elif isinstance(value, list):
+        _, by_member, containers = self.__get_bucket(key)
+        member = None
+        for member in value:
+          if isinstance(member, _SCALAR_TYPES):
+            break
+        else:
+          continue
+        # Lists contain the member, and dicts cannot be supersets of lists.
+        matches = by_member.get(member, []) + [
+            container for container in containers
+            if isinstance(container[key], dict)]
+      else:
+        continue
+      if candidates is None or len(matches) < len(candidates):
+        candidates = matches
+    if candidates is None:
+      return [value for value in self.__list if isinstance(value, dict)]
+    return candidates
+
+  def __get_bucket(self, key):
+    """Returns the members of the list by their value of key.
+
+    Returns:
+      A (by_value, by_member, containers) tuple. by_value is a dictionary of
+      the members keyed by their scalar value for key. by_member is a
+      dictionary of the members whose value for key is a list, keyed by
+      each scalar in that list. containers are the members whose value for
+      key is a list or dict, in the order they appear.
+    """
+    bucket = self.__buckets.get(key)
+    if bucket is None:
+      by_value = {}
+      by_member = {}
+      containers = []
+      for value in self.__list:
+        if not isinstance(value, dict) or key not in value:
+          continue
+        key_value = value[key]
+        if isinstance(key_value, _SCALAR_TYPES):
+          by_value.setdefault(key_value, []).append(value)
+          continue
+        containers.append(value)
+        if isinstance(key_value, list):
+          for member in set([member for member in key_value
+                             if isinstance(member, _SCALAR_TYPES)]):
+            by_member.setdefault(member, []).append(value)
+      bucket = (by_value, by_member, containers)
+      self.__buckets[key] = bucket
+    return bucket
+
+
 class _BaseListMembershipPredicate(BinaryPredicate):
   """Implements binary predicate comparison predicate for list membership."""
 
@@ -225,12 +495,14 @@ class _BaseListMembershipPredicate(BinaryPredicate):
     self.__strict = strict
     super(_BaseListMembershipPredicate, self).__init__(name, operand)
 
-  def _verify_elem(self, elem, the_list):
+  def _verify_elem(self, elem, the_list, list_index=None):
     """Verify if |elem| is in |the_list|
 
     Args:
       elem [object]: The value to test.
       the_list [list]: The list of objects to test against.
+      list_index [_ListIndex]: If provided, an index of |the_list| to
+         lookup elements in rather than scanning the list.
 
     Returns:
       True if the value is a member of the list or strict checking is disabled
@@ -238,6 +510,11 @@ class _BaseListMembershipPredicate(BinaryPredicate):
       False otherwise.
     """
     if self.__strict or isinstance(elem, (int, long, float, basestring)):
+      if list_index is not None:
+        try:
+          return list_index.contains(elem)
+        except TypeError:
+          pass
       return elem in the_list
 
     if self.__strict:
@@ -252,6 +529,8 @@ class _BaseListMembershipPredicate(BinaryPredicate):
     else:
       raise TypeError('Unhandled type {0}'.format(elem.__class__))
 
+    if list_index is not None and isinstance(elem, dict):
+      the_list = list_index.subset_candidates(elem)
     for value in the_list:
       if pred(value):
         return True
@@ -274,8 +553,9 @@ class ListSubsetPredicate(_BaseListMembershipPredicate):
     if not isinstance(value, list):
       return TypeMismatchError(list, value.__class__, value)
 
+    list_index = _ListIndex.make_if_worthwhile(self.operand, value)
     for elem in self.operand:
-      if not self._verify_elem(elem, the_list=value):
+      if not self._verify_elem(elem, the_list=value, list_index=list_index):
         return PathValueResult(pred=self, valid=False,
                                path_value=PathValue('', value),
                                source=value, target_path='')
@@ -284,6 +564,21 @@ class ListSubsetPredicate(_BaseListMembershipPredicate):
         pred=self, valid=True, path_value=PathValue('', value),
         source=value, target_path='')
 
+  def compile(self):
+    """Implements ValuePredicate interface."""
+    if self.strict:
+      return super(ListSubsetPredicate, self).compile()
+
+    operand = self.operand
+    def is_subset(value):
+      if not isinstance(value, list):
+        return False
+      outcome = _quick_list_subset(operand, value)
+      if outcome is None:
+        return bool(self(value))
+      return outcome
+    return is_subset
+
 
 class ListMembershipPredicate(_BaseListMembershipPredicate):
   """Implements binary predicate comparison predicate for list membership."""
@@ -344,6 +639,44 @@ class ContainsPredicate(BinaryPredicate):
                            source=value, target_path='',
                            path_value=PathValue('', bad_values))
 
+  def compile(self):
+    """Implements ValuePredicate interface."""
+    operand = self.operand
+    def contains(value):
+      outcome = _quick_contains(operand, value)
+      if outcome is None:
+        return bool(self(value))
+      return outcome
+    return contains
+
+
+def _compile_by_value_type(pred, dispatch):
+  """Compiles a BinaryPredicate that compares each type of value differently.
+
+  Args:
+    pred: [BinaryPredicate] The predicate to compile. Values whose type is
+       not in dispatch are deferred to it.
+    dispatch: [list of (value_type, operand_type, pred_factory)] Values of
+       value_type are decided by pred_factory(pred.operand), or are invalid
+       if the operand is not an operand_type.
+
+  Returns:
+    The compiled function.
+  """
+  compiled = []
+  for value_type, operand_type, pred_factory in dispatch:
+    if isinstance(pred.operand, operand_type):
+      compiled.append((value_type, pred_factory(pred.operand).compile()))
+    else:
+      compiled.append((value_type, lambda value: False))
+
+  def by_value_type(value):
+    for value_type, compiled_pred in compiled:
+      if isinstance(value, value_type):
+        return compiled_pred(value)
+    return bool(pred(value))
+  return by_value_type
+
 
 class EquivalentPredicate(BinaryPredicate):
   """Specifies a predicate that expects the value and operand are "equal".
@@ -358,6 +691,7 @@ class EquivalentPredicate(BinaryPredicate):
       operand: [any] The value to compare the argument against.
     """
     super(EquivalentPredicate, self).__init__('Equivalent', operand)
+    self.__bound_preds = {}
 
   def __check_operand_and_call(self, operand_type, value, pred_factory):
     """Ensure the operand is of the expected type and apply the predicate.
@@ -372,7 +706,18 @@ class EquivalentPredicate(BinaryPredicate):
     """
     if not isinstance(self.operand, operand_type):
       return TypeMismatchError(operand_type, self.operand.__class__, value)
-    return pred_factory(self.operand)(value)
+    return self.__bind_pred(pred_factory)(value)
+
+  def __bind_pred(self, pred_factory):
+    """Returns the predicate from pred_factory bound to the operand.
+
+    The predicate is only constructed once then reused for each value.
+    """
+    pred = self.__bound_preds.get(pred_factory)
+    if pred is None:
+      pred = pred_factory(self.operand)
+      self.__bound_preds[pred_factory] = pred
+    return pred
 
   def __call__(self, value):
     """Implements the predicate by determining if value == operand."""
@@ -387,6 +732,12 @@ class EquivalentPredicate(BinaryPredicate):
     raise NotImplementedError(
         'Unhandled value class {0}'.format(value.__class__))
 
+  def compile(self):
+    """Implements ValuePredicate interface."""
+    return _compile_by_value_type(
+        self, [(basestring, basestring, STR_EQ), (dict, dict, DICT_EQ),
+               (list, list, LIST_SIMILAR), (int, (int, long, float), NUM_EQ)])
+
 
 class DifferentPredicate(BinaryPredicate):
   """Specifies a predicate that expects the value and operand are not "equal".
@@ -401,6 +752,7 @@ class DifferentPredicate(BinaryPredicate):
       operand: [any] The value to compare the argument against.
     """
     super(DifferentPredicate, self).__init__('Different', operand)
+    self.__bound_preds = {}
 
   def __check_operand_and_call(self, operand_type, value, pred_factory):
     """Ensure the operand is of the expected type and apply the predicate.
@@ -416,7 +768,18 @@ class DifferentPredicate(BinaryPredicate):
     if not isinstance(self.operand, operand_type):
       return TypeMismatchError(
           operand_type, self.operand.__class__, value)
-    return pred_factory(self.operand)(value)
+    return self.__bind_pred(pred_factory)(value)
+
+  def __bind_pred(self, pred_factory):
+    """Returns the predicate from pred_factory bound to the operand.
+
+    The predicate is only constructed once then reused for each value.
+    """
+    pred = self.__bound_preds.get(pred_factory)
+    if pred is None:
+      pred = pred_factory(self.operand)
+      self.__bound_preds[pred_factory] = pred
+    return pred
 
   def __call__(self, value):
     """Implements the predicate by determining if value != operand."""
@@ -431,6 +794,12 @@ class DifferentPredicate(BinaryPredicate):
     raise NotImplementedError(
         'Unhandled value class {0}'.format(value.__class__))
 
+  def compile(self):
+    """Implements ValuePredicate interface."""
+    return _compile_by_value_type(
+        self, [(basestring, basestring, STR_NE), (dict, dict, DICT_NE),
+               (list, list, LIST_NE), (int, (int, long, float), NUM_NE)])
+
 
 NUM_LE = StandardBinaryPredicateFactory(
     '<=', lambda a, b: a <= b, operand_type=(int, long, float))
@@ -460,12 +829,41 @@ LIST_NE = StandardBinaryPredicateFactory(
     '!=', lambda a, b: a != b, operand_type=list)
 
 def lists_equivalent(a, b):
+  """Determine whether two lists have equal elements in any order.
+
+  Args:
+    a: [list] The first list.
+    b: [list] The second list.
+
+  Returns:
+    True if each element of a is equal to a distinct element of b.
+  """
   if len(a) != len(b):
     return False
-  sorted_a = sorted(a)
-  sorted_b = sorted(b)
-  for index, value in enumerate(sorted_a):
-    if sorted_b[index] != value:
+  if a == b:
+    # Lists are typically listed in the same order each time.
+    return True
+
+  try:
+    return sorted(a) == sorted(b)
+  except TypeError:
+    # The elements are not ordered with respect to one another.
+    pass
+
+  try:
+    return (collections.Counter([_freeze_json(elem) for elem in a])
+            == collections.Counter([_freeze_json(elem) for elem in b]))
+  except TypeError:
+    # The elements are not JSON so cannot be hashed.
+    pass
+
+  remaining = list(b)
+  for elem in a:
+    for index, other in enumerate(remaining):
+      if elem == other:
+        del remaining[index]
+        break
+    else:
       return False
   return True
 
@@ -249,16 +249,24 @@ class CardinalityPredicate(predicate.ValuePredicate,
     return 'Cardinality({0}) {1}..{2}'.format(
         self.__path_pred, self.__min, self.__max)
 
-  def __call__(self, obj):
+  def __decisive_count(self):
+    """The number of matches after which the verdict can no longer change."""
+    if self.__max is None:
+      return max(self.__min or 0, 1)
+    return max(self.__max + 1, 1)
+
+  def __call__(self, obj, path_index=None):
     """Attempt to match object.
 
     Args:
       obj: JSON object to match.
+      path_index: [PathValueIndex] If provided and indexes obj, then
+         the values are looked up from the index.
 
     Returns:
       PredicateResponse
     """
-    collected_result = self.__path_pred(obj)
+    collected_result = self.__path_pred(obj, path_index=path_index)
     count = len(collected_result.path_values)
 
     if not count:
@@ -283,3 +291,17 @@ class CardinalityPredicate(predicate.ValuePredicate,
 
     return result_type(valid=valid, cardinality_pred=self,
                        path_pred_result=collected_result)
+
+  def compile(self):
+    """Implements ValuePredicate interface."""
+    count_valid = self.__path_pred.compile_counter()
+    decisive_count = self.__decisive_count()
+    min_count = self.__min
+    max_count = self.__max
+    def in_range(obj):
+      count = count_valid(obj, decisive_count)
+      if not count:
+        return max_count == 0
+      return (max_count != 0 and count >= min_count
+              and (max_count is None or count <= max_count))
+    return in_range
@@ -60,6 +60,16 @@ class ConjunctivePredicate(predicate.ValuePredicate):
     return predicate.CompositePredicateResult(
         valid=valid, pred=self, results=everything)
 
+  def compile(self):
+    """Implements ValuePredicate interface."""
+    compiled = [pred.compile() for pred in self.__conjunction]
+    def conjunction(value):
+      for pred in compiled:
+        if not pred(value):
+          return False
+      return True
+    return conjunction
+
 
 class DisjunctivePredicate(predicate.ValuePredicate):
   """A ValuePredicate that calls a sequence of predicates until one succeeds."""
@@ -103,6 +113,16 @@ class DisjunctivePredicate(predicate.ValuePredicate):
     return predicate.CompositePredicateResult(
         valid=valid, pred=self, results=everything)
 
+  def compile(self):
+    """Implements ValuePredicate interface."""
+    compiled = [pred.compile() for pred in self.__disjunction]
+    def disjunction(value):
+      for pred in compiled:
+        if pred(value):
+          return True
+      return False
+    return disjunction
+
 
 class NegationPredicate(predicate.ValuePredicate):
   """A ValuePredicate that negates another predicate."""
@@ -134,6 +154,11 @@ class NegationPredicate(predicate.ValuePredicate):
     return predicate.CompositePredicateResult(
         valid=not base_result.valid, pred=self, results=[base_result])
 
+  def compile(self):
+    """Implements ValuePredicate interface."""
+    compiled = self.__pred.compile()
+    return lambda value: not compiled(value)
+
 
 class ConditionalPredicate(predicate.ValuePredicate):
   """A ValuePredicate that implements IF/THEN.
@@ -216,6 +241,17 @@ class ConditionalPredicate(predicate.ValuePredicate):
     return predicate.CompositePredicateResult(
         valid=result.valid, pred=self, results=tried)
 
+  def compile(self):
+    """Implements ValuePredicate interface."""
+    if self.__demorgan_pred:
+      return self.__demorgan_pred.compile()
+
+    if_pred = self.__if_pred.compile()
+    then_pred = self.__then_pred.compile()
+    else_pred = self.__else_pred.compile()
+    return lambda value: (then_pred(value) if if_pred(value)
+                          else else_pred(value))
+
 
 AND = ConjunctivePredicate
 OR = DisjunctivePredicate
@@ -212,6 +212,21 @@ class MapPredicate(predicate.ValuePredicate):
         good_map=good_map,
         bad_map=bad_map)
 
+  def compile(self):
+    """Implements ValuePredicate interface."""
+    pred = self.__pred.compile()
+    min_count = self.__min
+    max_count = self.__max
+    def in_range(obj):
+      if not isinstance(obj, list) and obj != None:
+        obj_list = [obj]
+      else:
+        obj_list = obj or []
+      num_good = len([elem for elem in obj_list if pred(elem)])
+      return not (min_count != None and num_good < min_count
+                  or max_count != None and num_good > max_count)
+    return in_range
+
   def export_to_json_snapshot(self, snapshot, entity):
     """Implements JsonSnapshotable interface."""
     builder = snapshot.edge_builder
@@ -78,11 +78,6 @@ from .path_result import (
     IndexBoundsError)
 
 
-# An internal data structure used to queue path values as we navigate.
-_QueueElement = collections.namedtuple('QueueElem',
-                                       ['path_offset', 'path_value'])
-
-
 # Terminal used to mean dont enumerate the value if it is a list
 DONT_ENUMERATE_TERMINAL = '@'
 
@@ -97,125 +92,222 @@ _SEGMENT_RE = re.compile(r'\{0}?([^\{0}\{1}\[]+)'.format(
     PATH_SEP, DONT_ENUMERATE_TERMINAL))
 
 
-def _process_dict_element(elem, target_path):
-  """Helper function for processing dictionary objects in the queue.
+# A step in a compiled path.
+#   offset: The offset of the step within the path.
+#   index: The list index the step specifies, or None.
+#   segment: The dictionary key the step specifies if index is None.
+#      None if the step is a trailing PATH_SEP.
+_PathStep = collections.namedtuple('_PathStep', ['offset', 'index', 'segment'])
+
+
+def _compile_path(path):
+  """Compiles a path into the steps taken to traverse it.
 
   Args:
-    elem: [_QueueElement] Element to process has a list value.
-    target_path: [string] The desired path we were looking for.
+    path: [string] The path without any terminal decoration.
 
   Returns:
-    array of _QueueElement
+    list of _PathStep
   """
-  path_offset = elem.path_offset
-  from_path_value = elem.path_value
-
-  # The value of the path to this point is the end of the trace.
-  base_path = from_path_value.path
-  source = from_path_value.value
-
-  # Continue tracing from this object to the path remainder.
-  # Determine the next path segment we are looking for.
-  match = _INDEX_RE.search(target_path, path_offset)
-  if match is not None and match.start(0) == path_offset:
-    return TypeMismatchError(list, dict, source, target_path, from_path_value)
-  match = _SEGMENT_RE.search(target_path, path_offset)
-  if match is None:
-    next_offset = len(target_path)
-    next_segment = target_path[path_offset:]
-
-    if path_offset == next_offset - 1 and next_segment == PATH_SEP:
-      # Terminal enumerated dict is just itself.
-      return [_QueueElement(next_offset, from_path_value)], []
-  else:
-    next_offset = match.end(0)
-    next_segment = match.groups(0)[0]
-
-  # Add the segment to the path to this value.
-  # This is not strictly the path up to the next offset
-  # because we might be decorating the path (e.g. array indexes taken).
-  if not base_path:
-    value_path = next_segment
-  else:
-    value_path = PATH_SEP.join([base_path, next_segment])
-
-  # Get the segment value, if any.
-  value = source.get(next_segment, None)
-  if value is None:
-    return (
-        [],
-        [MissingPathError(source, next_segment, path_value=from_path_value)])
-
-  return ([_QueueElement(next_offset, PathValue(value_path, value))], [])
-
-
-def _process_list_element(elem, target_path):
-  """Helper function for processing list objects in the queue.
+  steps = []
+  offset = 0
+  while offset < len(path):
+    match = _INDEX_RE.match(path, offset)
+    if match is not None:
+      steps.append(_PathStep(offset, int(match.group(1)), None))
+      offset = match.end(0)
+      continue
+
+    match = _SEGMENT_RE.search(path, offset)
+    if match is not None:
+      steps.append(_PathStep(offset, None, match.group(1)))
+      offset = match.end(0)
+    elif offset == len(path) - 1 and path[offset] == PATH_SEP:
+      steps.append(_PathStep(offset, None, None))
+      offset = len(path)
+    else:
+      steps.append(_PathStep(offset, None, path[offset:]))
+      offset = len(path)
+  return steps
+
+
+def _collect_path_values(source, path, steps):
+  """Collects the values at the end of a path.
 
   Args:
-    elem: [_QueueElement] Element to process has a list value.
-    target_path: [string] The desired path we were looking for.
+    source: [obj] The JSON object to traverse.
+    path: [string] The path without any terminal decoration.
+    steps: [list of _PathStep] The compiled path.
 
   Returns:
-    array of _QueueElement
+    A (final_values, failures) tuple where final_values is the list of
+    PathValue reached at the end of the path and failures is the list of
+    PathResult explaining where the path could not be followed.
   """
-  path_offset = elem.path_offset
-  from_path_value = elem.path_value
-
-  # The value of the path to this point is the end of the trace.
-  base_path = from_path_value.path
-  source = from_path_value.value
-
-  filter_index = None
-  match = _INDEX_RE.search(target_path, path_offset)
-  if match is not None and match.start(0) == path_offset:
-    filter_index = int(match.groups(0)[0])
-    if filter_index >= len(source):
-      return [], [IndexBoundsError(filter_index, list,
-                                   target_path=target_path[path_offset:],
-                                   path_value=from_path_value)]
-
-    path_offset = match.end(0)
-
-  # Try to follow the path from each of the objects in the list.
-  candidates = []
-  fails = []
-  for index, value in enumerate(source):
-    if filter_index is not None and index != filter_index:
+  failures = []
+  num_steps = len(steps)
+
+  # The queue contains (step number, path, value) tuples of values reached
+  # by traversing the steps before the step number. A PathValue is only
+  # made for the values that are reported.
+  queue = collections.deque([(0, '', source)])
+  final_values = []
+  while queue:
+    step_number, value_path, value = queue.popleft()
+    if step_number >= num_steps:
+      final_values.append(PathValue(value_path, value))
       continue
 
-    elem_path = '{0}[{1}]'.format(base_path, index)
-    candidates.append(
-        _QueueElement(path_offset, PathValue(elem_path, value)))
+    step = steps[step_number]
+    if isinstance(value, dict):
+      if step.index is not None:
+        failures.append(
+            TypeMismatchError(list, dict, value, path,
+                              PathValue(value_path, value)))
+        continue
+      segment = step.segment
+      if segment is None:
+        # Terminal enumerated dict is just itself.
+        queue.append((step_number + 1, value_path, value))
+        continue
+
+      segment_value = value.get(segment, None)
+      if segment_value is None:
+        failures.append(
+            MissingPathError(value, segment,
+                             path_value=PathValue(value_path, value)))
+      else:
+        # Add the segment to the path to this value.
+        # This is not strictly the path up to the next offset
+        # because we might be decorating the path (e.g. array indexes).
+        queue.append((step_number + 1,
+                      value_path + PATH_SEP + segment if value_path
+                      else segment,
+                      segment_value))
+
+    elif isinstance(value, list):
+      index = step.index
+      if index is None:
+        # Try to follow the path from each of the objects in the list.
+        queue.extend([(step_number, '%s[%d]' % (value_path, elem_index), elem)
+                      for elem_index, elem in enumerate(value)])
+      elif index >= len(value):
+        failures.append(
+            IndexBoundsError(index, list,
+                             target_path=path[step.offset:],
+                             path_value=PathValue(value_path, value)))
+      else:
+        queue.append((step_number + 1, '%s[%d]' % (value_path, index),
+                      value[index]))
+
+    else:
+      offset = step.offset
+      if path[offset] == PATH_SEP:
+        offset += 1
+      failures.append(
+          MissingPathError(value, path[offset:],
+                           path_value=PathValue(value_path, value)))
+
+  return final_values, failures
 
-  return candidates, fails
 
+def _iter_path_values(source, steps, enumerate_terminal):
+  """Generates the values at the end of a path.
 
-def _process_queue_element(top, target_path):
-  """Determine all the next values in the given path for the queue element.
+  This visits the same values as _collect_path_values, in the same order,
+  but without tracking their paths or why other paths could not be followed.
 
   Args:
-    top: [_QueueElement] The queue element to process.
-    target_path: [string] The original desired path.
+    source: [obj] The JSON object to traverse.
+    steps: [list of _PathStep] The compiled path.
+    enumerate_terminal: [bool] Whether to generate the elements of values
+       that are lists rather than the lists themselves.
+  """
+  num_steps = len(steps)
+  queue = collections.deque([(0, source)])
+  while queue:
+    step_number, value = queue.popleft()
+    if step_number >= num_steps:
+      if enumerate_terminal and isinstance(value, list):
+        for elem in value:
+          yield elem
+      else:
+        yield value
+      continue
 
-  Returns:
-    array of _QueueElement
+    step = steps[step_number]
+    if isinstance(value, dict):
+      if step.index is not None:
+        continue
+      if step.segment is None:
+        queue.append((step_number + 1, value))
+        continue
+      segment_value = value.get(step.segment, None)
+      if segment_value is not None:
+        queue.append((step_number + 1, segment_value))
+
+    elif isinstance(value, list):
+      index = step.index
+      if index is None:
+        queue.extend([(step_number, elem) for elem in value])
+      elif index < len(value):
+        queue.append((step_number + 1, value[index]))
+
+
+def _enumerate_list(path_value):
+  """Returns the PathValue of each element of a list value."""
+  base_path = path_value.path
+  return [PathValue('%s[%d]' % (base_path, index), value)
+          for index, value in enumerate(path_value.value)]
+
+
+class PathValueIndex(object):
+  """Memoizes the values along paths within a JSON object.
+
+  Several PathPredicates looking at the same object along the same path
+  would otherwise each traverse the object. Passing an index into each of
+  them traverses the object once per distinct path instead.
+
+  The index assumes the object is not changed while it is being used.
+  Call clear() if the object does change.
   """
 
-  if isinstance(top.path_value.value, dict):
-    return _process_dict_element(top, target_path)
+  @property
+  def source(self):
+    """The JSON object that is indexed."""
+    return self.__source
 
-  if isinstance(top.path_value.value, list):
-    return _process_list_element(top, target_path)
+  def __init__(self, source):
+    """Constructor.
 
-  source = top.path_value.value
-  path_offset = top.path_offset
-  if target_path[path_offset] == PATH_SEP:
-    path_offset += 1
+    Args:
+      source: [obj] The JSON object to index.
+    """
+    self.__source = source
+    self.__collected = {}
 
-  return ([],
-          [MissingPathError(source, target_path[path_offset:],
-                            path_value=top.path_value)])
+  def clear(self):
+    """Forgets all the values collected so far."""
+    self.__collected = {}
+
+  def collect(self, path):
+    """Collects the values at the end of a path.
+
+    Args:
+      path: [string] The path without any terminal decoration.
+
+    Returns:
+      A (final_values, failures) tuple where final_values is the list of
+      PathValue reached at the end of the path and failures is the list of
+      PathResult explaining where the path could not be followed.
+      These are shared so must not be modified.
+    """
+    collected = self.__collected.get(path)
+    if collected is None:
+      collected = _collect_path_values(self.__source, path,
+                                       _compile_path(path))
+      self.__collected[path] = collected
+    return collected
 
 
 class ProducesPathPredicateResult(object):
@@ -257,6 +349,15 @@ class PathPredicate(ValuePredicate, ProducesPathPredicateResult):
     self.__pred = pred
     self.__path = path or ''
 
+    # The path is compiled once here rather than parsed on every call.
+    path = self.__path
+    self.__enumerate_terminal = True
+    if path and path[-1] in (PATH_SEP, DONT_ENUMERATE_TERMINAL):
+      self.__enumerate_terminal = path[-1] != DONT_ENUMERATE_TERMINAL
+      path = path[:-1]
+    self.__traversed_path = path
+    self.__steps = _compile_path(path)
+
   def __eq__(self, finder):
     return (self.__class__ == finder.__class__
             and self.__path == finder.path
@@ -265,42 +366,57 @@ class PathPredicate(ValuePredicate, ProducesPathPredicateResult):
   def __str__(self):
     return '"{path}" {pred}'.format(path=self.__path, pred=self.__pred)
 
-  def __call__(self, source):
+  def __call__(self, source, path_index=None):
     """Attempt to lookup the field in a JSON object.
     Args:
       source: JSON object to lookup within.
+      path_index: [PathValueIndex] If provided and indexes source, then
+         the values along the path are looked up from the index.
 
     Returns:
       PredicateResult on the bound predicate applied to the lookup path.
         (i.e. pred(lookup(source, path)))
     """
 
-    path = self.__path
-
     builder = PathPredicateResultBuilder(pred=self, source=source)
-    enumerate_terminal = True
-    if path and path[-1] in (PATH_SEP, DONT_ENUMERATE_TERMINAL):
-      enumerate_terminal = path[-1] != DONT_ENUMERATE_TERMINAL
-      path = path[:-1]
-
-    queue = [_QueueElement(0, PathValue('', source))]
-    if not path and not (enumerate_terminal and isinstance(source, list)):
-      return self.__add_queue_to_builder(builder, queue, enumerate_terminal)
+    if path_index is not None and path_index.source is source:
+      final_values, failures = path_index.collect(self.__traversed_path)
+    else:
+      final_values, failures = _collect_path_values(
+          source, self.__traversed_path, self.__steps)
+    builder.add_all_path_failures(failures)
+    return self.__add_values_to_builder(builder, final_values)
 
-    final_queue = []
-    while queue:
-      top = queue.pop(0)
-      if top.path_offset >= len(path):
-        final_queue.append(top)
-        continue
+  def compile(self):
+    """Implements ValuePredicate interface."""
+    count_valid = self.compile_counter()
+    return lambda source: count_valid(source, 1) > 0
 
-      candidates, fails = _process_queue_element(top, path)
-      queue.extend(candidates)
-      builder.add_all_path_failures(fails)
+  def compile_counter(self):
+    """Returns a function counting the values satisfying this predicate.
 
-    return self.__add_queue_to_builder(builder, final_queue, enumerate_terminal)
+    This is like compile() but for callers that need to know how many values
+    along the path are valid rather than whether any are.
 
-  def __add_queue_to_builder(self, builder, final_queue, enumerate_terminal):
+    Returns:
+      A function taking (source, max_valid) that returns the number of values
+      along the path within source that satisfy the bound predicate. If
+      max_valid is not None then counting stops once it is reached.
+    """
+    steps = self.__steps
+    enumerate_terminal = self.__enumerate_terminal
+    pred = self.__pred.compile() if self.__pred is not None else None
+    def count_valid(source, max_valid=None):
+      num_valid = 0
+      for value in _iter_path_values(source, steps, enumerate_terminal):
+        if pred is None or pred(value):
+          num_valid += 1
+          if num_valid == max_valid:
+            break
+      return num_valid
+    return count_valid
+
+  def __add_values_to_builder(self, builder, final_values):
     """Helper method for processing the final candidates from the queue.
 
     Apply the filter bound to this predicate, if any, to determine whether
@@ -308,38 +424,31 @@ class PathPredicate(ValuePredicate, ProducesPathPredicateResult):
 
     Args:
       builder: [PathPredicateResultBuilder] To add the results into.
-      final_queue: [list of _QueueElement] The final candidate values.
-      enumerate_terminal: [bool] If true, then list values in the queue
-         should be enumerated (one level) into individual elements.
+      final_values: [list of PathValue] The final candidate values.
 
     Returns:
       PathPredicateResult
     """
-    for elem in final_queue:
-      value = elem.path_value.value
-      if enumerate_terminal and isinstance(value, list):
-        candidates, fails = _process_queue_element(elem, self.__path)
+    for final_value in final_values:
+      if self.__enumerate_terminal and isinstance(final_value.value, list):
         # We're already at the end point, so there is no more path based
-        # filtering to do. The above step would have just expanded out
-        # the list elements into individual elements, which should never
-        # fail.
-        assert len(fails) == 0
+        # filtering to do. Just expand out the list into its elements.
+        candidates = _enumerate_list(final_value)
       else:
-        candidates = [elem]
+        candidates = [final_value]
 
       if self.__pred is None:
-        for trial in candidates:
+        for path_value in candidates:
           builder.add_result_candidate(
-              trial.path_value,
+              path_value,
               PathValueResult(source=builder.source,
-                              target_path=trial.path_value.path,
-                              path_value=trial.path_value,
+                              target_path=path_value.path,
+                              path_value=path_value,
                               valid=True,
                               pred=None))
 
       else:
-        for trial in candidates:
-          path_value = trial.path_value
+        for path_value in candidates:
           pred_result = self.__pred(path_value.value)
           if isinstance(pred_result, CloneableWithContext):
             base_path = path_value.path
@@ -43,6 +43,26 @@ class ValuePredicate(JsonSnapshotable):
         '__call__() needs to be specialized for {0}'.format(
             self.__class__.__name__))
 
+  def compile(self):
+    """Returns a function deciding whether values satisfy this predicate.
+
+    The function only returns whether a value is valid, so avoids building
+    the PredicateResult explaining why. This is for callers that evaluate
+    the predicate repeatedly and only need the verdict, such as filters and
+    intermediate retry attempts. Calling the predicate itself is still the
+    way to obtain the details.
+
+    The function reflects the predicate at the time it was compiled, so
+    predicates changed afterwards (e.g. by append()) need compiling again.
+
+    This default implementation calls the predicate. Specialized predicates
+    override it to decide directly.
+
+    Returns:
+      A function taking a value and returning True if it is valid.
+    """
+    return lambda value: bool(self(value))
+
   def __repr__(self):
     """Specializes interface."""
     return str(self)
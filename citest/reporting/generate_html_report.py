@@ -26,18 +26,40 @@ files.
 
 To only generate an index file, invoke with --nohtml.
 To only generate the HTML files, invoke with --noindex.
+To render multiple journals in parallel, invoke with --jobs=N.
+To render journals while they are still being written, invoke with --follow.
+The HTML files are then written as each top-level context completes.
 """
 
 import argparse
+import functools
+import multiprocessing
 import os
 import sys
 
+from citest.base import (GzipOutputStream, map_record_file)
+
 from .html_renderer import HtmlRenderer
 from .html_document_manager import HtmlDocumentManager
-from .html_index_renderer import HtmlIndexRenderer
+from .html_index_renderer import (HtmlIndexRenderer, JournalSummary)
+
+
+def map_journal(input_path):
+  """Maps a journal into memory so it can be shared among multiple passes.
+
+  Args:
+    input_path: [string] Path to the journal file.
+
+  Returns:
+    The mapping, or None if the journal is compressed so cannot be mapped.
+  """
+  mapping = map_record_file(input_path)
+  if mapping[:len(GzipOutputStream.MAGIC)] == GzipOutputStream.MAGIC:
+    return None
+  return mapping
 
 
-def journal_to_html(input_path):
+def journal_to_html(input_path, mapping=None, follow=False):
   """Main program for converting a journal JSON file into HTML.
 
   This will write a file using in the input_path directory with the
@@ -45,28 +67,65 @@ def journal_to_html(input_path):
 
   Args:
     input_path: [string] Path the journal file.
+    mapping: [buffer] If provided, the journal contents from map_journal().
+    follow: [bool] If True then the journal is still being written, so
+       render the entries as they are written until the journal finishes.
+
+  Returns:
+    The JournalSummary of the journal collected while rendering it.
   """
   output_path = os.path.basename(os.path.splitext(input_path)[0]) + '.html'
 
   document_manager = HtmlDocumentManager(
       title='Report for {0}'.format(os.path.basename(input_path)))
 
+  # Stream the document so that completed top-level contexts are written
+  # out as they close rather than holding the whole report in memory.
+  document_manager.begin_stream_to_path(output_path)
   document_manager.write('<table>')
   processor = HtmlRenderer(document_manager)
-  processor.process(input_path)
+  summary = JournalSummary()
+  processor.entry_observers.append(summary)
+  if follow:
+    processor.follow(input_path)
+  else:
+    processor.process(input_path, mapping=mapping)
   processor.terminate()
   document_manager.write('</table>')
 
   document_manager.build_to_path(output_path)
+  return summary
+
+
+def render_journal(input_path, follow=False):
+  """Maps then renders a journal into HTML.
+
+  This is a convenience function for rendering from a process pool.
+
+  Args:
+    input_path: [string] Path to the journal file.
+    follow: [bool] If True then follow the journal while it is being written
+       rather than mapping it.
+
+  Returns:
+    The JournalSummary of the journal.
+  """
+  if follow:
+    return journal_to_html(input_path, follow=True)
+  return journal_to_html(input_path, mapping=map_journal(input_path))
 
 
-def build_index(journal_list):
+def build_index(journal_list, summaries=None):
   """Create an index.html file for HTML output from journal list.
 
   Args:
     journal_list: [array of path] Path to the journal files to put in the index.
        Assumes that there is a corresponding .html file for each to link to.
+    summaries: [dict] If provided, the JournalSummary keyed by path for
+       journals that were already summarized, such as by journal_to_html().
+       The other journals will be processed to summarize them.
   """
+  summaries = summaries or {}
   document_manager = HtmlDocumentManager(title='Journal Summary')
   document_manager.has_key = False
   document_manager.has_global_expand = False
@@ -77,7 +136,11 @@ def build_index(journal_list):
       '<th>'.join(processor.output_column_names)))
 
   for journal in journal_list:
-    processor.process(journal)
+    summary = summaries.get(journal)
+    if summary is not None:
+      processor.add_summary(journal, summary)
+    else:
+      processor.process(journal, mapping=map_journal(journal))
   processor.terminate()
 
   document_manager.write('</table>')
@@ -105,15 +168,32 @@ def main(argv):
                       help='Generate HTML report for each journal.')
   parser.add_argument('--nohtml', dest='html', action='store_false',
                       help='Do not genreate an HTML report for the journals.')
+  parser.add_argument('--jobs', default=1, type=int,
+                      help='The number of journals to render in parallel.')
+  parser.add_argument('--follow', default=False, action='store_true',
+                      help='Render the journals while they are being written'
+                      ' until they are finished.')
 
   options = parser.parse_args(argv[1:])
 
+  # The index is built from the summaries collected while rendering
+  # so that it does not need to process the journals again.
+  summaries = None
   if options.html:
-    for path in options.journals:
-      journal_to_html(path)
+    render = functools.partial(render_journal, follow=options.follow)
+    if options.jobs > 1 and len(options.journals) > 1:
+      pool = multiprocessing.Pool(min(options.jobs, len(options.journals)))
+      try:
+        summary_list = pool.map(render, options.journals)
+      finally:
+        pool.close()
+        pool.join()
+    else:
+      summary_list = [render(path) for path in options.journals]
+    summaries = dict(zip(options.journals, summary_list))
 
   if options.index and len(options.journals) > 1:
-    build_index(options.journals)
+    build_index(options.journals, summaries=summaries)
 
 
 if __name__ == '__main__':
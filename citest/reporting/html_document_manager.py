@@ -121,7 +121,17 @@ _BUILTIN_CSS = """
 
 
 class HtmlDocumentManager(object):
-  """Helper class for organizing and rendering documents."""
+  """Helper class for organizing and rendering documents.
+
+  By default the document body is held in memory until build_to_path().
+  Calling begin_stream_to_path() first instead writes the body into the
+  file as it is written so the document need not fit in memory.
+  """
+
+  @property
+  def is_streaming(self):
+    """Whether the body is being written directly into the output file."""
+    return self.__stream is not None
 
   def __init__(self, title):
     """Constructor.
@@ -132,6 +142,8 @@ class HtmlDocumentManager(object):
     self.__section_count = 0
     self.__title = title
     self.__parts = []
+    self.__stream = None
+    self.__stream_path = None
     self.has_global_expand = True
     self.has_key = True
 
@@ -312,31 +324,78 @@ class HtmlDocumentManager(object):
 
   def write(self, html):
     """Writes some html into the document body."""
-    self.__parts.append(html)
+    if self.__stream is not None:
+      self.__stream.write(html)
+    else:
+      self.__parts.append(html)
+
+  def begin_stream_to_path(self, output_path):
+    """Starts writing the HTML document into a file as the body is written.
+
+    This writes everything up to the body immediately so must be called
+    after configuring has_key and has_global_expand and before any write().
+    The document is finished by calling build_to_path() with the same path.
+
+    Args:
+      output_path: [string] Path of file to write.
+    """
+    if self.__stream is not None:
+      raise ValueError('Already streaming to "{0}"'.format(self.__stream_path))
+    if self.__parts:
+      raise ValueError('The body was already written into memory.')
+    self.__stream = open(output_path, 'w')
+    self.__stream_path = output_path
+    self.__write_begin(self.__stream)
+    self.__stream.flush()
+
+  def flush(self):
+    """Flushes the body written so far into the file if streaming."""
+    if self.__stream is not None:
+      self.__stream.flush()
 
   def build_to_path(self, output_path):
     """Builds a complete HTML document and writes it to a file.
 
     This assumes we already wrote a body into it with write().
+    If the document is being streamed then this finishes the file instead.
 
     Args:
       output_path: [string] Path of file to write.
     """
-    with open(output_path, 'w') as f:
-      f.write(self.build_begin_html_document(self.__title))
-      f.write('<div class="title">{title}</div>\n'.format(title=self.__title))
-      if self.has_global_expand:
-        f.write(
-            '<a href="#" onclick="expand_tree(document.body,true)">'
-            'Expand All</a>')
-        f.write('&nbsp;&nbsp;&nbsp;')
-        f.write(
-            '<a href="#" onclick="expand_tree(document.body,false)">'
-            'Collapse All</a>')
-        f.write('\n<p/>\n')
-
-      if self.has_key:
-        f.write(self.build_key_html())
+    if self.__stream is not None:
+      if output_path != self.__stream_path:
+        raise ValueError('Streaming to "{0}" not "{1}"'.format(
+            self.__stream_path, output_path))
+      try:
+        self.__stream.write(self.build_end_html_document())
+      finally:
+        self.__stream.close()
+        self.__stream = None
+        self.__stream_path = None
+      return
 
+    with open(output_path, 'w') as f:
+      self.__write_begin(f)
       f.write(''.join(self.__parts))
       f.write(self.build_end_html_document())
+
+  def __write_begin(self, f):
+    """Writes the document up to where the body starts.
+
+    Args:
+      f: [stream] The stream to write into.
+    """
+    f.write(self.build_begin_html_document(self.__title))
+    f.write('<div class="title">{title}</div>\n'.format(title=self.__title))
+    if self.has_global_expand:
+      f.write(
+          '<a href="#" onclick="expand_tree(document.body,true)">'
+          'Expand All</a>')
+      f.write('&nbsp;&nbsp;&nbsp;')
+      f.write(
+          '<a href="#" onclick="expand_tree(document.body,false)">'
+          'Collapse All</a>')
+      f.write('\n<p/>\n')
+
+    if self.has_key:
+      f.write(self.build_key_html())
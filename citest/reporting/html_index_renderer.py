@@ -20,31 +20,33 @@ import sys
 from .journal_processor import JournalProcessor
 
 
-class HtmlIndexRenderer(JournalProcessor):
-  """Specialized JournalProcessor to produce HTML index pages."""
+class JournalSummary(object):
+  """Summarizes the tests recorded in a journal.
 
-  def __init__(self, document_manager):
-    """Constructor.
+  The summary is updated by calling it with each entry in the journal.
+  It only needs to see the JournalContextControl entries, and the first and
+  last entries for the overall time.
+  """
 
-    Args:
-      document_manager: [HtmlDocumentManager] Helps with look & feel,
-          and structure.
-    """
-    super(HtmlIndexRenderer, self).__init__()
-    self.__document_manager = document_manager
-    self.default_handler = self.__handle_generic
-    self.__total_passed = 0
-    self.__total_failed = 0
-    self.__total_secs = 0
+  @property
+  def passed_count(self):
+    """The number of tests that passed."""
+    return self.__passed_count
 
-    self.__first_timestamp = None
-    self.__last_timestamp = None
-    self.__passed_count = 0
-    self.__failed_count = 0
-    self.__depth = 0
-    self.__in_test = False
+  @property
+  def failed_count(self):
+    """The number of tests that failed or had errors."""
+    return self.__failed_count
 
-  def __reset_journal_counters(self):
+  @property
+  def secs(self):
+    """The time spanned by the journal entries, or None if unknown."""
+    if self.__last_timestamp is None:
+      return None
+    return self.__last_timestamp - self.__first_timestamp
+
+  def __init__(self):
+    """Constructor."""
     self.__first_timestamp = None
     self.__last_timestamp = None
     self.__passed_count = 0
@@ -52,8 +54,8 @@ class HtmlIndexRenderer(JournalProcessor):
     self.__depth = 0
     self.__in_test = False
 
-  def __handle_generic(self, entry):
-    """Handles entries from the journal to update the overall summary.
+  def __call__(self, entry):
+    """Updates the summary with an entry from the journal.
 
     Args:
       entry: JSON entry from the journal
@@ -94,12 +96,43 @@ class HtmlIndexRenderer(JournalProcessor):
             raise ValueError('Unhandled relation {0}'.format(relation))
         return
 
+
+class HtmlIndexRenderer(JournalProcessor):
+  """Specialized JournalProcessor to produce HTML index pages."""
+
+  def __init__(self, document_manager):
+    """Constructor.
+
+    Args:
+      document_manager: [HtmlDocumentManager] Helps with look & feel,
+          and structure.
+    """
+    # The index only needs the context controls to count the tests and
+    # the messages starting and finishing the journal for the timestamps.
+    # Skip everything else, especially the large snapshots.
+    super(HtmlIndexRenderer, self).__init__(
+        entry_types=['JournalContextControl', 'JournalMessage'])
+    self.__document_manager = document_manager
+    self.__summary = None
+    self.default_handler = self.__handle_generic
+    self.__total_passed = 0
+    self.__total_failed = 0
+    self.__total_secs = 0
+
+  def __handle_generic(self, entry):
+    """Handles entries from the journal to update the journal summary.
+
+    Args:
+      entry: JSON entry from the journal
+    """
+    self.__summary(entry)
+
   @property
   def output_column_names(self):
     """Returns list of column names for the summary table."""
     return ['Passed', 'Failed', 'Test Module', 'Time']
 
-  def process(self, journal):
+  def process(self, journal, mapping=None):
     """Overrides JournalProcessor.process() for an individual journal.
 
     When we process a journal, we're going to reduce it down to a summary
@@ -108,31 +141,45 @@ class HtmlIndexRenderer(JournalProcessor):
 
     Args:
       journal: [string] The path to the journal file to process.
+      mapping: [buffer] If provided, the journal contents already mapped
+         into memory. See JournalNavigator.open().
     """
-    self.__reset_journal_counters()
-    super(HtmlIndexRenderer, self).process(journal)
+    self.__summary = JournalSummary()
+    super(HtmlIndexRenderer, self).process(journal, mapping=mapping)
+    self.add_summary(journal, self.__summary)
+    self.__summary = None
 
-    if self.__passed_count == 0 and self.__failed_count == 0:
+  def add_summary(self, journal, summary):
+    """Adds the index row for a journal that was already summarized.
+
+    This is an alternative to process() when the summary was collected
+    while the journal was being processed for some other purpose.
+
+    Args:
+      journal: [string] The path to the journal file that was summarized.
+      summary: [JournalSummary] The summary of the journal.
+    """
+    passed_count = summary.passed_count
+    failed_count = summary.failed_count
+    if passed_count == 0 and failed_count == 0:
       sys.stderr.write(
           'No tests recorded in {0}. Assuming this is an error.\n'.format(
               journal))
-      self.__failed_count = 1
+      failed_count = 1
 
     journal_basename = os.path.basename(journal)
     if journal_basename.endswith('.journal'):
       journal_basename = os.path.splitext(journal_basename)[0]
     html_path = os.path.splitext(journal)[0] + '.html'
 
-    self.__total_passed += self.__passed_count
-    self.__total_failed += self.__failed_count
+    self.__total_passed += passed_count
+    self.__total_failed += failed_count
 
-    if self.__last_timestamp is not None:
-      secs = self.__last_timestamp - self.__first_timestamp
+    secs = summary.secs
+    if secs is not None:
       self.__total_secs += secs
-    else:
-      secs = None
 
-    self.__write_row(self.__passed_count, self.__failed_count,
+    self.__write_row(passed_count, failed_count,
                      '<a class="toggle" href="{html_path}">{name}</a>'.format(
                          html_path=html_path, name=journal_basename),
                      secs)
@@ -22,6 +22,7 @@ import collections
 import datetime
 import json
 
+from ..base import apply_json_diff
 from .journal_processor import (JournalProcessor, ProcessedEntityManager)
 
 
@@ -288,6 +289,47 @@ class ProcessToRenderInfo(object):
     else:
       return HtmlInfo(cgi.escape(_to_string(value)))
 
+  def process_delta_value(self, edge, diff, base):
+    """Render the value of an edge that is a diff from an earlier edge.
+
+    Args:
+      edge: [dict] The JSON encoding of a JsonSnapshot Edge whose 'delta_of'
+         names the label of the earlier edge within the same entity.
+      diff: [list] The edge value, which is a diff from the json_diff module.
+      base: [obj] The reconstructed value of the earlier edge, or None
+         if it is not known.
+
+    Returns:
+      A (HtmlInfo, value) tuple where value is the value reconstructed by
+      applying diff to base, or None if it could not be reconstructed.
+    """
+    delta_of = edge['delta_of']
+    value = None
+    if base is not None:
+      try:
+        value = apply_json_diff(base, diff)
+      except (KeyError, IndexError, TypeError, ValueError):
+        pass
+
+    if not diff and value is not None:
+      return HtmlInfo('<i>Unchanged from {0}</i>'.format(
+          cgi.escape(delta_of))), value
+
+    diff_info = self.process_json_html_if_possible(diff)
+    fragments = ['<i>{count} changes from {label}</i>'.format(
+        count=len(diff), label=cgi.escape(delta_of)),
+                 diff_info.detail_html]
+    if value is not None:
+      value_info = self.process_json_html_if_possible(value)
+      fragments.extend(['<i>Reconstructed {0}</i>'.format(
+          cgi.escape(edge.get('label', 'value'))), value_info.detail_html])
+    else:
+      fragments.append('<i>Could not reconstruct from {0}</i>'.format(
+          cgi.escape(delta_of)))
+    summary = '{count} changes from {label}'.format(
+        count=len(diff), label=cgi.escape(delta_of))
+    return HtmlInfo('<br/>'.join(fragments), summary), value
+
   def process_list(self, value, snapshot, edge_to_list, default_expanded=None):
     """Renders value as HTML.
 
@@ -410,13 +452,19 @@ class ProcessToRenderInfo(object):
                                   default_expanded=False)])
 
     num_rows = 0
+    values_by_label = {}  # For reconstructing delta values from earlier ones.
     for edge in subject.get('_edges', []):
         # pylint: disable=bad-indentation
         label = edge.get('label', '?unlabled')
         target_id = None
         value_info = None
         value = edge.get('_value', None)
-        if isinstance(value, list):
+        if 'delta_of' in edge and isinstance(value, list):
+          formatter.push_level()
+          value_info, value = self.process_delta_value(
+              edge, value, values_by_label.get(edge['delta_of']))
+          formatter.pop_level()
+        elif isinstance(value, list):
           formatter.push_level()
           value_info = self.process_list(value, snapshot, edge)
           formatter.pop_level()
@@ -430,6 +478,7 @@ class ProcessToRenderInfo(object):
         else:
           target_id = edge.get('_to', None)
 
+        values_by_label[label] = value
         if target_id is not None:
             formatter.push_level()
             value_info = self.process_entity_id(target_id, snapshot)
@@ -544,6 +593,10 @@ class HtmlRenderer(JournalProcessor):
             title=title_html, rows=''.join(held.html))
         context_title = '%s <small>+%.3fs</small>' % (title_html, delta_time)
         self.render_log_tr(held.control['_timestamp'], context_title, html)
+
+      if not self.__context_stack:
+        # The completed top-level context is in the document now.
+        self.__document_manager.flush()
     else:
       raise ValueError(
           'Invalid JournalContextControl control={0}'.format(direction))
@@ -552,7 +605,8 @@ class HtmlRenderer(JournalProcessor):
     """Default method for rendering a JsonSnapshot into HTML."""
     subject_id = snapshot.get('_subject_id')
     entities = snapshot.get('_entities', {})
-    self.__entity_manager.push_entity_map(entities)
+    self.__entity_manager.push_entity_map(
+        entities, released=snapshot.get('_released'))
     date_str = self.timestamp_to_string(snapshot.get('_timestamp'))
 
     # This is only for the final relation.
@@ -14,38 +14,271 @@
 
 """Various journal iterators to facilitate navigating through journal JSON."""
 
-import json
+import logging
+import os
 
-from citest.base import RecordInputStream
+from citest.base import (
+    GzipOutputStream,
+    JournalIndex,
+    JsonJournalCodec,
+    MappedRecordInputStream,
+    RecordInputStream,
+    can_detect_compression,
+    decode_journal_header,
+    index_path_for_journal,
+    open_possibly_compressed)
 
 
 class JournalNavigator(object):
-  """Iterates over journal JSON."""
+  """Iterates over journal JSON.
+
+  If the journal was written with an index then the navigator can also
+  seek directly to individual entries, contexts, or time windows without
+  decoding the entries before them.
+
+  The navigator can also follow a journal that is still being written.
+  In that case iteration stops at the last complete entry written so far
+  and can be resumed later to continue with the entries written since.
+  """
+
+  @property
+  def following(self):
+    """Whether the journal is being followed while it is being written."""
+    return self.__follow
+
+  @property
+  def index(self):
+    """The JournalIndex for the open journal, or None if it has no index.
+
+    An index sidecar that was not written for the journal as it is now
+    (e.g. left over from an earlier journal at the same path) is ignored.
+    """
+    self.__check_open()
+    if self.__index is None:
+      index_path = index_path_for_journal(self.__path)
+      if os.path.exists(index_path):
+        index = JournalIndex.load_from_path(index_path)
+        if index.matches_journal(self.__path):
+          self.__index = index
+        else:
+          logging.getLogger(__name__).warning(
+              'Ignoring %s because it does not match %s.',
+              index_path, self.__path)
+    return self.__index
 
   def __init__(self):
     """Constructor"""
     self.__input_stream = None
+    self.__codec = None
+    self.__pending_record = None
+    self.__path = None
+    self.__mapping = None
+    self.__index = None
+    self.__next_entry = 0
+    self.__follow = False
 
   def __iter__(self):
     """Iterate over the contents of the journal."""
     self.__check_open()
     return self
 
-  def open(self, path):
+  def open(self, path, mapping=None, follow=False):
     """Open the journal to be able to iterate over its contents.
 
+    The journal may be compressed, in which case it is decompressed
+    as it is read.
+
     Args:
       path: [string] The path to load the journal from.
+      mapping: [buffer] If provided then the journal contents already
+         mapped into memory using map_record_file(). The records are read
+         from the mapping rather than the file. Mappings can be shared among
+         multiple navigators. Compressed journals cannot be mapped.
+      follow: [bool] If True then the journal might still be being written.
+         An incomplete entry at the end of the journal ends the iteration
+         rather than being an error, and iterating again later continues
+         from there. Journals being followed cannot be mapped.
     """
-    if self.__input_stream != None:
+    if self.__path != None:
       raise ValueError('Navigator is already open.')
-    self.__input_stream = RecordInputStream(open(path, 'r'))
+    if follow and mapping is not None:
+      raise ValueError('Journal {0} cannot be mapped while following it.'
+                       .format(path))
+    if follow:
+      # The journal might be too new to know whether it is compressed yet.
+      self.__input_stream = None
+    elif mapping is None:
+      self.__input_stream = RecordInputStream(open_possibly_compressed(path))
+    elif mapping[:len(GzipOutputStream.MAGIC)] == GzipOutputStream.MAGIC:
+      raise ValueError('Compressed journal {0} cannot be mapped.'.format(path))
+    else:
+      self.__input_stream = MappedRecordInputStream(mapping)
+    self.__path = path
+    self.__mapping = mapping
+    self.__next_entry = 0
+    self.__follow = follow
+    self.__determine_codec()
+
+  def __determine_codec(self):
+    """Determine the codec from the journal header, if any.
+
+    Journals without a header are JSON. In that case the first record is
+    an ordinary entry so is held for the first call to next().
+
+    When following a journal whose first record was not yet written,
+    the codec remains undetermined until the first record is available.
+    """
+    first_record = self.__read_record()
+    if first_record is None and self.__follow:
+      return
+
+    self.__codec = (decode_journal_header(first_record)
+                    if first_record is not None
+                    else None)
+    if self.__codec is None:
+      self.__codec = JsonJournalCodec()
+      self.__pending_record = first_record
 
   def close(self):
     """Close the journal."""
     self.__check_open()
-    self.__input_stream.close()
+    if self.__input_stream is not None:
+      self.__input_stream.close()
     self.__input_stream = None
+    self.__codec = None
+    self.__pending_record = None
+    self.__path = None
+    self.__mapping = None
+    self.__index = None
+    self.__follow = False
+
+  def seek_to_entry(self, entry_number):
+    """Positions the navigator so next() returns the given entry.
+
+    Args:
+      entry_number: [int] The entry number within the journal index.
+
+    Raises:
+      ValueError if the journal has no index.
+    """
+    index = self.index
+    if index is None:
+      raise ValueError('{0} has no index.'.format(self.__path))
+    if self.__codec is None:
+      # Following a journal that we have not read from yet. The index is
+      # not written until the journal is finished, so it is readable now.
+      self.__determine_codec()
+    self.__input_stream.seek(index.get_entry_offset(entry_number))
+    self.__pending_record = None
+    self.__next_entry = entry_number
+
+  def find_interned_snapshot(self, digest):
+    """Reads the snapshot entry that wrote an interned entity.
+
+    This does not change which entry next() returns, so can be given to an
+    InternedEntityResolver to resolve the stubs in snapshots read after
+    seeking past the entries that wrote the entities they refer to.
+
+    Args:
+      digest: [string] The hash of the interned entity.
+
+    Returns:
+      The JSON snapshot entry, or None if the journal has no index or
+      the entity is not in it.
+    """
+    index = self.index
+    entry_number = (index.find_interned_entry(digest)
+                    if index is not None
+                    else None)
+    if entry_number is None:
+      return None
+
+    # Read with another navigator to remain positioned where we are.
+    navigator = JournalNavigator()
+    navigator.open(self.__path, mapping=self.__mapping)
+    try:
+      navigator.seek_to_entry(entry_number)
+      return navigator.next()
+    finally:
+      navigator.close()
+
+  def iterate_entries(self, entry_numbers):
+    """Iterates over the given entries, seeking only where there are gaps.
+
+    Args:
+      entry_numbers: [list of int] The entry numbers in increasing order.
+    """
+    for entry_number in entry_numbers:
+      if entry_number != self.__next_entry:
+        self.seek_to_entry(entry_number)
+      yield self.next()
+
+  def iterate_context(self, title, depth=None):
+    """Iterates over the entries in the contexts with the given title.
+
+    The entries include the BEGIN and END controls for each context.
+    A context that never ended extends to the end of the journal.
+
+    Args:
+      title: [string] The title of the contexts to iterate over.
+      depth: [int] If provided then only contexts at this nesting depth.
+         Top level contexts have a depth of 1.
+
+    Raises:
+      ValueError if the journal has no index.
+    """
+    index = self.index
+    if index is None:
+      raise ValueError('{0} has no index.'.format(self.__path))
+    for context in index.find_contexts(title, depth=depth):
+      end_entry = (context.end_entry if context.end_entry is not None
+                   else index.num_entries - 1)
+      for entry in self.iterate_entries(
+          range(context.begin_entry, end_entry + 1)):
+        yield entry
+
+  def iterate_time_window(self, start_time=None, end_time=None):
+    """Iterates over the entries timestamped within a time window.
+
+    Args:
+      start_time: [float] If provided, the earliest timestamp to include.
+      end_time: [float] If provided, the latest timestamp to include.
+
+    Raises:
+      ValueError if the journal has no index.
+    """
+    index = self.index
+    if index is None:
+      raise ValueError('{0} has no index.'.format(self.__path))
+    return self.iterate_entries(
+        index.find_entries_in_time_window(start_time, end_time))
+
+  def iterate_types(self, entry_types):
+    """Iterates over the remaining entries having one of the given types.
+
+    Entries of other types are skipped without being decoded where possible.
+    If the journal has an index then they are not even read.
+
+    Args:
+      entry_types: [list of string] The _type values of the entries to return.
+    """
+    self.__check_open()
+    index = self.index
+    if index is not None:
+      for entry in self.iterate_entries(
+          [entry_number
+           for entry_number in range(self.__next_entry, index.num_entries)
+           if index.get_entry_type(entry_number) in entry_types]):
+        yield entry
+      return
+
+    while True:
+      record = self.__next_record()
+      if not self.__codec.could_be_type(record, entry_types):
+        continue
+      entry = self.__decode(record)
+      if entry.get('_type') in entry_types:
+        yield entry
 
   def next(self):
     """Return the next item in the journal.
@@ -54,14 +287,61 @@ class JournalNavigator(object):
       StopIteration when there are no more elements.
     """
     self.__check_open()
-    json_str = self.__input_stream.next()
+    return self.__decode(self.__next_record())
+
+  def __next_record(self):
+    """Returns the next raw record in the journal without decoding it."""
+    if self.__codec is None:
+      self.__determine_codec()
+      if self.__codec is None:
+        raise StopIteration()
+
+    if self.__pending_record is not None:
+      record = self.__pending_record
+      self.__pending_record = None
+    else:
+      record = self.__read_record()
+      if record is None:
+        raise StopIteration()
+    self.__next_entry += 1
+    return record
+
+  def __read_record(self):
+    """Reads the next raw record from the stream, or None if there are none.
+
+    When following the journal, an incomplete record is not yet available.
+    """
+    if self.__follow:
+      if not self.__open_followed_stream():
+        return None
+      return self.__input_stream.try_next()
+    try:
+      return self.__input_stream.next()
+    except StopIteration:
+      return None
+
+  def __open_followed_stream(self):
+    """Opens the input stream for a followed journal once it is possible.
+
+    Returns:
+      False if the journal is still too short to open.
+    """
+    if self.__input_stream is None:
+      if not can_detect_compression(self.__path):
+        return False
+      self.__input_stream = RecordInputStream(
+          open_possibly_compressed(self.__path))
+    return True
+
+  def __decode(self, record):
+    """Decodes a raw record into its journal entry."""
     try:
-      return json.JSONDecoder().decode(json_str)
+      return self.__codec.decode(record)
     except ValueError:
-      print 'Invalid json record:\n{0}'.format(json_str)
+      print 'Invalid {0} record:\n{1}'.format(self.__codec.name, record)
       raise
 
   def __check_open(self):
     """Verify that the navigator is open (and thus valid to iterate)."""
-    if self.__input_stream == None:
+    if self.__path == None:
       raise ValueError('Navigator is not open.')
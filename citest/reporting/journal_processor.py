@@ -15,6 +15,10 @@
 
 """Processes a journal by calling specialized handlers on each entry."""
 
+import time
+
+from citest.base import (InternedEntityResolver, Journal)
+
 from .journal_navigator import JournalNavigator
 
 class ProcessedEntityManager(object):
@@ -26,6 +30,9 @@ class ProcessedEntityManager(object):
   It maintains a stack of the Entity id's that we are processing in order to
   detect cycles. It maintains a mapping of id's to entities in order to resolve
   linked relationships among entities.
+
+  It also resolves the stubs of interned entities as entity maps are pushed,
+  which requires that the entity maps are pushed in journal order.
   """
 
   @property
@@ -37,6 +44,7 @@ class ProcessedEntityManager(object):
     """Constructor."""
     self.__map_stack = []
     self.__id_stack = []
+    self.__resolver = InternedEntityResolver()
 
   def lookup_entity_with_id(self, entity_id):
     """Find the referenced JsonSnapshot journal entity.
@@ -64,12 +72,15 @@ class ProcessedEntityManager(object):
           entity_id, self.__map_stack[-1], len(self.__map_stack)))
     return found
 
-  def push_entity_map(self, entity_map):
+  def push_entity_map(self, entity_map, released=None):
     """Add a map of entities for future lookup.
 
     Args:
       entity_map: [map of int to JSON entity]
+      released: [list of string] The '_released' interned entity hashes
+         of the snapshot containing the entity map, if any.
     """
+    self.__resolver.resolve_entities(entity_map, released=released)
     self.__map_stack.append(entity_map)
 
   def pop_entity_map(self, expect_map):
@@ -128,39 +139,117 @@ class JournalProcessor(object):
     """
     self.__default_handler = handler if handler else self.handle_unknown
 
-  def __init__(self, registry=None):
+  @property
+  def entry_observers(self):
+    """List of callable objects taking every JSON entry before it is handled.
+
+    Observers let other components see the entries as they are processed
+    without having to process the journal again themselves.
+    """
+    return self.__entry_observers
+
+  @property
+  def entry_types(self):
+    """If not None then the only "_type" of entries to process.
+
+    Entries of other types are skipped without decoding them.
+    """
+    return self.__entry_types
+
+  def __init__(self, registry=None, entry_types=None):
     """Constructor.
 
     Args:
       registry: [dict] Keyed by string matching the "_type" attribute in the
          journal object read. The values are callable objects that take the
          decoded JSON object from the journal. Return values are ignored.
+      entry_types: [list of string] If provided, only process entries with
+         these "_type" values and skip all the others.
     """
     self.__handler_registry = dict(registry or {})
     self.__default_handler = self.handle_unknown
+    self.__entry_types = entry_types
+    self.__entry_observers = []
 
   def terminate(self):
     """Terminate the processor (finished processing)."""
     pass
 
-  def process(self, input_path):
+  def process(self, input_path, mapping=None):
     """Process the contents of the journal indicatd by input_path.
 
     Args:
       input_path: [string] The path to the journal.
+      mapping: [buffer] If provided, the journal contents already mapped
+         into memory. See JournalNavigator.open().
     """
     navigator = JournalNavigator()
-    navigator.open(input_path)
+    navigator.open(input_path, mapping=mapping)
     try:
-      for obj in navigator:
-        entry_type = obj.get('_type')
-        handler = (self.__handler_registry.get(entry_type)
-                   or self.__default_handler)
-        handler(obj)
+      entries = (navigator if self.__entry_types is None
+                 else navigator.iterate_types(self.__entry_types))
+      for obj in entries:
+        self.__process_entry(obj)
+
+    finally:
+      navigator.close()
+
+  def follow(self, input_path, poll_interval=1.0, idle_timeout=None):
+    """Process the journal indicated by input_path while it is being written.
 
+    Entries are processed as they are written, until the journal is
+    terminated. An incomplete entry at the end of the journal is assumed
+    to still be being written and is processed once it is complete.
+
+    Args:
+      input_path: [string] The path to the journal.
+      poll_interval: [float] Seconds to wait before looking for more entries
+         after processing all those written so far.
+      idle_timeout: [float] If provided, stop waiting for more entries once
+         none have been written for this many seconds, such as when the
+         program writing the journal died.
+
+    Returns:
+      True if the journal was finished, False if it timed out.
+    """
+    # The finishing message is needed to know when to stop even if it
+    # is not among the entry types to process.
+    entry_types = self.__entry_types
+    if entry_types is not None and 'JournalMessage' not in entry_types:
+      entry_types = list(entry_types) + ['JournalMessage']
+
+    navigator = JournalNavigator()
+    navigator.open(input_path, follow=True)
+    try:
+      idle_secs = 0
+      while True:
+        entries = (navigator if entry_types is None
+                   else navigator.iterate_types(entry_types))
+        for obj in entries:
+          idle_secs = 0
+          if (self.__entry_types is None
+              or obj.get('_type') in self.__entry_types):
+            self.__process_entry(obj)
+          if (obj.get('_type') == 'JournalMessage'
+              and obj.get('_value') == Journal.FINISHED_MESSAGE):
+            return True
+
+        if idle_timeout is not None and idle_secs >= idle_timeout:
+          return False
+        time.sleep(poll_interval)
+        idle_secs += poll_interval
     finally:
       navigator.close()
 
+  def __process_entry(self, obj):
+    """Passes an entry to the observers then to its handler."""
+    for observer in self.__entry_observers:
+      observer(obj)
+    entry_type = obj.get('_type')
+    handler = (self.__handler_registry.get(entry_type)
+               or self.__default_handler)
+    handler(obj)
+
   def handle_unknown(self, obj):
     """The default handler for processing entries with unregistered _type.
 
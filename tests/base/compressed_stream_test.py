@@ -0,0 +1,120 @@
+# Copyright 2015 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Test compressed_stream module."""
+# pylint: disable=missing-docstring
+# pylint: disable=invalid-name
+
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+
+from StringIO import StringIO
+
+from citest.base import (
+    GzipInputStream,
+    GzipOutputStream,
+    Journal,
+    RecordInputStream,
+    RecordOutputStream,
+    open_possibly_compressed)
+from citest.reporting import JournalNavigator
+
+from test_clock import TestClock
+
+
+class UncloseableStringIO(StringIO):
+  def close(self):
+    pass
+
+
+class CompressedStreamTest(unittest.TestCase):
+  def setUp(self):
+    self.temp_dir = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.temp_dir)
+
+  def test_roundtrip(self):
+    output = UncloseableStringIO()
+    stream = GzipOutputStream(output)
+    stream.write('Hello, ')
+    stream.write('World!' * 1000)
+    stream.close()
+
+    compressed = output.getvalue()
+    self.assertTrue(compressed.startswith(GzipOutputStream.MAGIC))
+    self.assertLess(len(compressed), 1000)
+
+    expect = 'Hello, ' + 'World!' * 1000
+    self.assertEquals(expect, GzipInputStream(StringIO(compressed)).read())
+
+    # Standard gzip tools can read it too.
+    self.assertEquals(
+        expect, gzip.GzipFile(fileobj=StringIO(compressed)).read())
+
+  def test_truncated_records(self):
+    output = UncloseableStringIO()
+    records = RecordOutputStream(GzipOutputStream(output))
+    records.append('first')
+    records.append('second')
+    size = len(output.getvalue())
+    records.append('third' * 100)
+
+    # Simulate a crash in the middle of writing the last record.
+    truncated = output.getvalue()[:size + 10]
+    got = RecordInputStream(GzipInputStream(StringIO(truncated)))
+    self.assertEquals('first', got.next())
+    self.assertEquals('second', got.next())
+    self.assertRaises(ValueError, got.next)
+
+  def test_open_possibly_compressed(self):
+    plain_path = os.path.join(self.temp_dir, 'plain')
+    with open(plain_path, 'wb') as f:
+      f.write('plain text')
+    gzip_path = os.path.join(self.temp_dir, 'gzip')
+    stream = GzipOutputStream(open(gzip_path, 'wb'))
+    stream.write('gzip text')
+    stream.close()
+
+    for path, expect in [(plain_path, 'plain text'), (gzip_path, 'gzip text')]:
+      stream = open_possibly_compressed(path)
+      self.assertEquals(expect, stream.read(100))
+      stream.close()
+
+  def test_navigate_compressed_journal(self):
+    entries = []
+    for compression in [None, 'gzip']:
+      path = os.path.join(self.temp_dir, 'test.journal')
+      journal = Journal(now_function=TestClock())
+      journal.open_with_path(path, _compression=compression)
+      journal.write_message('A simple message.', num=123)
+      journal.terminate()
+
+      navigator = JournalNavigator()
+      navigator.open(path)
+      entries.append([entry for entry in navigator])
+      navigator.close()
+
+    self.assertEquals(3, len(entries[0]))
+    self.assertEquals(entries[0], entries[1])
+
+
+if __name__ == '__main__':
+  loader = unittest.TestLoader()
+  suite = loader.loadTestsFromTestCase(CompressedStreamTest)
+  unittest.TextTestRunner(verbosity=2).run(suite)
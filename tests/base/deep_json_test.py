@@ -0,0 +1,84 @@
+# Copyright 2015 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test deep_json module."""
+# pylint: disable=missing-docstring
+
+import json
+import sys
+import unittest
+
+from citest.base import (DeepJsonDecoder, DeepJsonEncoder)
+
+
+def make_deep_value(depth):
+  value = 'leaf'
+  for index in range(depth):
+    value = [value, 1.5] if index % 2 else {'nested': value, 'n': None}
+  return value
+
+
+def unwrap_deep_value(test, depth, value):
+  for index in reversed(range(depth)):
+    if index % 2:
+      test.assertEquals(1.5, value[1])
+      value = value[0]
+    else:
+      test.assertEquals(['n', 'nested'], sorted(value.keys()))
+      value = value['nested']
+  test.assertEquals('leaf', value)
+
+
+class DeepJsonTest(unittest.TestCase):
+  def test_same_as_json(self):
+    value = {'list': [1, 2L, -3.25, float('inf'), True, False, None, []],
+             'dict': {'a': {}, 3: 'int', 1.5: 'float', None: 'none'},
+             'text': u'Unicode \u00e9 "quoted"\n',
+             'tuple': ('a', 'b')}
+    deep = make_deep_value(2 * sys.getrecursionlimit())
+    for options in [{},
+                    {'indent': 2, 'separators': (',', ': ')},
+                    {'separators': (',', ':'), 'sort_keys': True},
+                    {'ensure_ascii': False}]:
+      expect = json.JSONEncoder(**options).encode(value)
+      encoder = DeepJsonEncoder(**options)
+      self.assertEquals(expect, encoder.encode(value))
+
+      # Following the value with a deep one means the fallback encodes both.
+      deep_text = encoder.encode([value, deep])
+      head = json.JSONEncoder(**options).encode([value, 'X']).split('"X"')[0]
+      self.assertTrue(deep_text.startswith(head))
+      got = DeepJsonDecoder().decode(deep_text)
+      self.assertEquals(json.JSONDecoder().decode(expect), got[0])
+      unwrap_deep_value(self, 2 * sys.getrecursionlimit(), got[1])
+
+  def test_circular(self):
+    value = [1]
+    value.append([make_deep_value(2 * sys.getrecursionlimit()), value])
+    with self.assertRaises(ValueError):
+      DeepJsonEncoder().encode(value)
+
+  def test_invalid(self):
+    depth = 2 * sys.getrecursionlimit()
+    for text in ['[' * depth + ']' * (depth - 1),
+                 '[' * depth + ']' * depth + 'x',
+                 '[' * depth + '{1: 2}' + ']' * depth]:
+      with self.assertRaises(ValueError):
+        DeepJsonDecoder().decode(text)
+
+
+if __name__ == '__main__':
+  loader = unittest.TestLoader()
+  suite = loader.loadTestsFromTestCase(DeepJsonTest)
+  unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,309 @@
+# Copyright 2015 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Test entity_interning module."""
+# pylint: disable=missing-docstring
+# pylint: disable=too-few-public-methods
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from StringIO import StringIO
+
+from citest.base import (
+    InternedEntityResolver,
+    Journal,
+    JsonSnapshot,
+    JsonSnapshotable,
+    SnapshotEntityInterner)
+from citest.reporting import JournalNavigator
+
+from test_clock import TestClock
+
+
+class TestLinkedList(JsonSnapshotable):
+  def __init__(self, name, next_elem=None):
+    self.name = name
+    self.next = next_elem
+
+  def export_to_json_snapshot(self, snapshot, entity):
+    entity.add_metadata('name', self.name)
+    if self.next:
+      snapshot.edge_builder.make(entity, 'Next', self.next)
+
+
+class TestContainer(JsonSnapshotable):
+  def __init__(self, attempt, elements):
+    self.attempt = attempt
+    self.elements = elements
+
+  def export_to_json_snapshot(self, snapshot, entity):
+    snapshot.edge_builder.make_data(entity, 'Attempt', self.attempt)
+    snapshot.edge_builder.make_data(entity, 'Elements', self.elements)
+
+
+def snapshot_json(obj):
+  snapshot = JsonSnapshot()
+  snapshot.add_data(obj)
+  return snapshot.to_json_object()
+
+
+def roundtrip(json_object):
+  """Encode and decode json_object like a journal reader would see it."""
+  return json.JSONDecoder().decode(json.JSONEncoder().encode(json_object))
+
+
+def inline_entity(entity_map, entity_id, in_progress=()):
+  """Replaces entity references with the entities to compare snapshots."""
+  if entity_id in in_progress:
+    return '^{0}'.format(in_progress.index(entity_id))
+  in_progress = in_progress + (entity_id,)
+  entity = dict(entity_map[str(entity_id)])
+  del entity['_id']
+
+  def inline_value(value):
+    if isinstance(value, list):
+      return [inline_value(elem) for elem in value]
+    if isinstance(value, dict) and value.get('_type') == 'EntityReference':
+      return inline_entity(entity_map, value['_id'], in_progress)
+    return value
+
+  edges = []
+  for edge in entity.get('_edges', []):
+    edge = dict(edge)
+    if '_to' in edge:
+      edge['_to'] = inline_entity(entity_map, edge['_to'], in_progress)
+    if '_value' in edge:
+      edge['_value'] = inline_value(edge['_value'])
+    edges.append(edge)
+  if edges:
+    entity['_edges'] = edges
+  return entity
+
+
+def inline_snapshot(snapshot):
+  snapshot = roundtrip(snapshot)
+  return inline_entity(snapshot['_entities'], snapshot['_subject_id'])
+
+
+class EntityInterningTest(unittest.TestCase):
+  def test_intern_repeated(self):
+    shared = TestLinkedList('A', TestLinkedList('B', TestLinkedList('C')))
+    interner = SnapshotEntityInterner()
+    resolver = InternedEntityResolver()
+    for attempt in range(3):
+      original = snapshot_json(TestContainer(attempt, [shared, 'x']))
+      written = interner.intern_snapshot(original)
+      if attempt == 0:
+        self.assertEquals(4, len(written['_entities']))
+      else:
+        # The container is new but the list is a stub. The remainder of
+        # the list is only referenced through the stub so was omitted.
+        self.assertEquals(2, len(written['_entities']))
+        stubs = [entity for entity in written['_entities'].values()
+                 if '_interned' in entity]
+        self.assertEquals(1, len(stubs))
+
+      read = roundtrip(written)
+      resolver.resolve_entities(read['_entities'])
+      self.assertEquals(inline_snapshot(original), inline_snapshot(read))
+
+  def test_intern_subject(self):
+    interner = SnapshotEntityInterner()
+    resolver = InternedEntityResolver()
+    for _ in range(2):
+      original = snapshot_json(TestLinkedList('A', TestLinkedList('B')))
+      written = interner.intern_snapshot(original)
+      read = roundtrip(written)
+      resolver.resolve_entities(read['_entities'])
+      self.assertEquals(inline_snapshot(original), inline_snapshot(read))
+    self.assertEquals([1], written['_entities'].keys())
+    self.assertEquals(['_id', '_interned'],
+                      sorted(written['_entities'][1].keys()))
+
+  def test_intern_cycle(self):
+    interner = SnapshotEntityInterner()
+    resolver = InternedEntityResolver()
+    for tail_name in ['C', 'C', 'D']:
+      tail = TestLinkedList(tail_name)
+      head = TestLinkedList('A', TestLinkedList('B', tail))
+      tail.next = head
+      original = snapshot_json(TestContainer(1, [head]))
+      written = interner.intern_snapshot(original)
+      read = roundtrip(written)
+      resolver.resolve_entities(read['_entities'])
+      self.assertEquals(inline_snapshot(original), inline_snapshot(read))
+
+  def test_intern_with_hashes(self):
+    shared = TestLinkedList('A', TestLinkedList('B'))
+    interner = SnapshotEntityInterner()
+    hashed_interner = SnapshotEntityInterner()
+    for attempt in range(3):
+      original = snapshot_json(TestContainer(attempt, [shared]))
+      hashes = hashed_interner.hash_snapshot(original)
+      self.assertEquals(
+          interner.intern_snapshot(original),
+          hashed_interner.intern_snapshot(original, hashes=hashes))
+
+  def test_journal_hashes_outside_lock(self):
+    journal = Journal(now_function=TestClock(), intern_entities=True)
+    journal.open_with_file(StringIO())
+    original_hash_snapshot = SnapshotEntityInterner.hash_snapshot
+    written = []
+
+    def hash_snapshot(interner, snapshot):
+      # Another thread can write while the snapshot is being hashed.
+      thread = threading.Thread(
+          target=lambda: written.append(journal.write_message('Other')))
+      thread.start()
+      thread.join(5)
+      return original_hash_snapshot(interner, snapshot)
+
+    SnapshotEntityInterner.hash_snapshot = hash_snapshot
+    try:
+      journal.store(TestLinkedList('A'))
+    finally:
+      SnapshotEntityInterner.hash_snapshot = original_hash_snapshot
+      journal.terminate()
+    self.assertEquals([None], written)
+
+  def test_journal(self):
+    sizes = []
+    temp_dir = tempfile.mkdtemp()
+    try:
+      for intern in [False, True]:
+        path = os.path.join(temp_dir, 'test.journal')
+        journal = Journal(now_function=TestClock(), intern_entities=intern)
+        journal.open_with_path(path)
+        shared = TestLinkedList('A', TestLinkedList('B'))
+        for attempt in range(5):
+          journal.store(TestContainer(attempt, [shared]))
+        journal.terminate()
+        sizes.append(os.path.getsize(path))
+
+        navigator = JournalNavigator()
+        navigator.open(path)
+        resolver = InternedEntityResolver()
+        try:
+          snapshots = [entry for entry in navigator
+                       if entry['_type'] == 'JsonSnapshot']
+        finally:
+          navigator.close()
+        for attempt, snapshot in enumerate(snapshots):
+          resolver.resolve_entities(snapshot['_entities'])
+          self.assertEquals(
+              inline_snapshot(snapshot_json(TestContainer(attempt, [shared]))),
+              inline_snapshot(snapshot))
+    finally:
+      shutil.rmtree(temp_dir)
+
+    self.assertLess(sizes[1], sizes[0])
+
+  def test_release(self):
+    interner = SnapshotEntityInterner(max_interned=3)
+    resolver = InternedEntityResolver()
+    tail = TestLinkedList('Tail')
+    released = []
+    for attempt in range(20):
+      # The tail stays referenced by each new list, even once released.
+      shared = TestLinkedList('List {0}'.format(attempt % 10), tail)
+      original = snapshot_json(TestContainer(attempt, [shared]))
+      written = interner.intern_snapshot(original)
+      released.extend(written.get('_released', []))
+      read = roundtrip(written)
+      resolver.resolve_entities(read['_entities'],
+                                released=read.get('_released'))
+      self.assertEquals(inline_snapshot(original), inline_snapshot(read))
+      self.assertLessEqual(interner.num_interned, 3)
+      self.assertLessEqual(resolver.num_remembered, 4)
+    self.assertTrue(released)
+
+  def test_unread_stub(self):
+    interner = SnapshotEntityInterner()
+    shared = TestLinkedList('A')
+    interner.intern_snapshot(snapshot_json(TestContainer(0, [shared])))
+    written = interner.intern_snapshot(
+        snapshot_json(TestContainer(1, [shared])))
+
+    resolver = InternedEntityResolver()
+    with self.assertRaisesRegexp(KeyError, 'was not read'):
+      resolver.resolve_entities(roundtrip(written)['_entities'])
+
+  def write_interned_journal(self, path, index):
+    journal = Journal(now_function=TestClock(), intern_entities=True)
+    journal.open_with_path(path, _index=index)
+    shared = TestLinkedList('A', TestLinkedList('B'))
+    for attempt in range(3):
+      journal.begin_context('Attempt {0}'.format(attempt))
+      journal.store(TestContainer(attempt, [shared]))
+      journal.end_context()
+    journal.terminate()
+    return shared
+
+  def test_seek_with_index(self):
+    temp_dir = tempfile.mkdtemp()
+    try:
+      path = os.path.join(temp_dir, 'test.journal')
+      shared = self.write_interned_journal(path, True)
+      navigator = JournalNavigator()
+      navigator.open(path)
+      try:
+        resolver = InternedEntityResolver(
+            lookup_snapshot=navigator.find_interned_snapshot)
+        snapshots = [entry for entry in navigator.iterate_context('Attempt 2')
+                     if entry['_type'] == 'JsonSnapshot']
+        navigator.seek_to_entry(0)
+        snapshots.extend(navigator.iterate_types(['JsonSnapshot']))
+
+        # The first snapshot is looked up to resolve the last one.
+        for attempt, snapshot in zip([2, 0, 1, 2], snapshots):
+          resolver.resolve_entities(snapshot['_entities'])
+          self.assertEquals(
+              inline_snapshot(snapshot_json(TestContainer(attempt, [shared]))),
+              inline_snapshot(snapshot))
+      finally:
+        navigator.close()
+    finally:
+      shutil.rmtree(temp_dir)
+
+  def test_seek_without_index(self):
+    temp_dir = tempfile.mkdtemp()
+    try:
+      path = os.path.join(temp_dir, 'test.journal')
+      self.write_interned_journal(path, False)
+      navigator = JournalNavigator()
+      navigator.open(path)
+      try:
+        resolver = InternedEntityResolver(
+            lookup_snapshot=navigator.find_interned_snapshot)
+        snapshots = list(navigator.iterate_types(['JsonSnapshot']))
+
+        # Without an index the snapshot that wrote the list cannot be found.
+        with self.assertRaisesRegexp(KeyError, 'was not read'):
+          resolver.resolve_entities(snapshots[1]['_entities'])
+      finally:
+        navigator.close()
+    finally:
+      shutil.rmtree(temp_dir)
+
+
+if __name__ == '__main__':
+  loader = unittest.TestLoader()
+  suite = loader.loadTestsFromTestCase(EntityInterningTest)
+  unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,183 @@
+# Copyright 2015 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Test journal_codec module."""
+# pylint: disable=missing-docstring
+# pylint: disable=invalid-name
+
+import base64
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+  import msgpack
+except ImportError:
+  msgpack = None
+
+from citest.base import (
+    Journal,
+    JournalCodec,
+    JsonJournalCodec,
+    JsonSnapshotable,
+    decode_journal_header,
+    encode_journal_header,
+    make_journal_codec,
+    register_journal_codec)
+from citest.base.journal_codec import MsgpackJournalCodec
+from citest.reporting import JournalNavigator
+
+from test_clock import TestClock
+
+
+class TestBase64Codec(JournalCodec):
+  """A non-JSON codec wrapping the compact JSON codec."""
+
+  @property
+  def name(self):
+    return 'test_base64'
+
+  def __init__(self):
+    self.__json_codec = JsonJournalCodec(compact=True)
+
+  def encode(self, json_object):
+    return base64.b64encode(self.__json_codec.encode(json_object))
+
+  def decode(self, data):
+    return self.__json_codec.decode(base64.b64decode(data))
+
+
+register_journal_codec('test_base64', TestBase64Codec)
+
+
+class TestData(JsonSnapshotable):
+  def __init__(self, name, value):
+    self.__name = name
+    self.__value = value
+
+  def export_to_json_snapshot(self, snapshot, entity):
+    snapshot.edge_builder.make(entity, 'Name', self.__name)
+    snapshot.edge_builder.make_data(entity, 'Value', self.__value)
+
+
+class JournalCodecTest(unittest.TestCase):
+  def setUp(self):
+    self.temp_dir = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.temp_dir)
+
+  def write_journal(self, codec):
+    path = os.path.join(self.temp_dir, 'test.journal')
+    journal = Journal(now_function=TestClock(), codec=codec)
+    journal.open_with_file(open(path, 'w'))
+    journal.begin_context('Test Context')
+    journal.write_message('A simple message.', num=123)
+    journal.store(TestData('NAME', [1, 'two', {'three': 3.0}]))
+    journal.end_context(relation='VALID')
+    journal.terminate()
+    return path
+
+  def read_journal(self, path):
+    navigator = JournalNavigator()
+    navigator.open(path)
+    try:
+      return [entry for entry in navigator]
+    finally:
+      navigator.close()
+
+  def test_json(self):
+    codec = JsonJournalCodec()
+    self.assertFalse(codec.needs_header)
+    self.assertEquals('{\n  "a": [\n    1\n  ]\n}', codec.encode({'a': [1]}))
+    self.assertEquals({'a': [1]}, codec.decode('{"a": [1]}'))
+
+  def test_compact_json(self):
+    codec = JsonJournalCodec(compact=True)
+    self.assertFalse(codec.needs_header)
+    self.assertEquals('{"a":[1,2]}', codec.encode({'a': [1, 2]}))
+
+  def test_could_be_type(self):
+    for codec in [JsonJournalCodec(), JsonJournalCodec(compact=True)]:
+      data = codec.encode({'_type': 'JournalMessage', '_value': 'Hello'})
+      self.assertTrue(codec.could_be_type(data, ['JournalMessage']))
+      self.assertTrue(codec.could_be_type(data, ['A', 'JournalMessage']))
+      self.assertFalse(codec.could_be_type(data, ['JsonSnapshot']))
+      self.assertFalse(codec.could_be_type(data, ['Journal']))
+
+    # Codecs that cannot tell must assume it could be.
+    self.assertTrue(TestBase64Codec().could_be_type('', ['JournalMessage']))
+
+  def test_header(self):
+    codec = TestBase64Codec()
+    header = encode_journal_header(codec)
+    self.assertEquals('{"_type":"JournalHeader","codec":"test_base64"}',
+                      header)
+    self.assertIsInstance(decode_journal_header(header), TestBase64Codec)
+    self.assertIsNone(decode_journal_header('{"_type":"JournalMessage"}'))
+    self.assertIsNone(decode_journal_header(codec.encode({'a': 1})))
+
+  def test_navigate_codecs(self):
+    expect = None
+    for codec in [None, JsonJournalCodec(compact=True), TestBase64Codec()]:
+      entries = self.read_journal(self.write_journal(codec))
+      self.assertEquals(
+          ['JournalMessage', 'JournalContextControl', 'JournalMessage',
+           'JsonSnapshot', 'JournalContextControl', 'JournalMessage'],
+          [entry['_type'] for entry in entries])
+      if expect is None:
+        expect = entries
+      self.assertEquals(expect, entries)
+
+  @unittest.skipIf(msgpack is None, 'msgpack is not installed')
+  def test_msgpack(self):
+    codec = make_journal_codec('msgpack')
+    self.assertIsInstance(codec, MsgpackJournalCodec)
+    self.assertTrue(codec.needs_header)
+
+    # Entity maps are keyed by int, which msgpack preserves.
+    value = {'a': [1, u'two', {'three': 3.0}], 'b': None, 1: True}
+    self.assertEquals(value, codec.decode(codec.encode(value)))
+
+    header = encode_journal_header(codec)
+    self.assertIsInstance(decode_journal_header(header), MsgpackJournalCodec)
+    self.assertIsNone(decode_journal_header(codec.encode({'a': 1})))
+
+    path = self.write_journal(codec)
+    with open(path, 'rb') as stream:
+      self.assertNotIn('A simple message', stream.read(100))
+    entries = self.read_journal(path)
+    expect = self.read_journal(self.write_journal(None))
+    self.assertEquals([entry['_type'] for entry in expect],
+                      [entry['_type'] for entry in entries])
+    self.assertEquals(expect[2], entries[2])
+
+    # The snapshot entity ids stay ints rather than becoming JSON strings.
+    snapshot = entries[3]
+    self.assertEquals(sorted([int(key) for key in expect[3]['_entities']]),
+                      sorted(snapshot['_entities'].keys()))
+
+  def test_compact_is_smaller(self):
+    indented = os.path.getsize(self.write_journal(None))
+    compact = os.path.getsize(
+        self.write_journal(JsonJournalCodec(compact=True)))
+    self.assertLess(compact, indented)
+
+
+if __name__ == '__main__':
+  loader = unittest.TestLoader()
+  suite = loader.loadTestsFromTestCase(JournalCodecTest)
+  unittest.TextTestRunner(verbosity=2).run(suite)
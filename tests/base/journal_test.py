@@ -19,6 +19,7 @@
 # pylint: disable=invalid-name
 
 
+import Queue
 import json
 import threading
 import unittest
@@ -26,7 +27,7 @@ import unittest
 from StringIO import StringIO
 from citest.base import Journal
 
-from citest.base import JsonSnapshot, JsonSnapshotable
+from citest.base import JsonJournalCodec, JsonSnapshot, JsonSnapshotable
 from citest.base import RecordOutputStream, RecordInputStream
 
 from test_clock import TestClock
@@ -54,14 +55,35 @@ class TestData(JsonSnapshotable):
     return entity
 
 
+class TestValue(JsonSnapshotable):
+  def __init__(self, value):
+    self.value = value
+
+  def export_to_json_snapshot(self, snapshot, entity):
+    snapshot.edge_builder.make_data(entity, 'Value', self.value)
+
+
+class TestExportThread(JsonSnapshotable):
+  def __init__(self, fail=False):
+    self.fail = fail
+    self.export_thread = None
+
+  def export_to_json_snapshot(self, snapshot, entity):
+    self.export_thread = threading.current_thread()
+    if self.fail:
+      raise ValueError('Failed to export')
+
+
 class TestJournal(Journal):
   @property
   def clock(self):
     return self.__clock
 
-  def __init__(self, output):
+  def __init__(self, output, queue_size=None, defer_snapshots=False):
     self.__clock = TestClock()
-    super(TestJournal, self).__init__(now_function=self.__clock)
+    super(TestJournal, self).__init__(now_function=self.__clock,
+                                      queue_size=queue_size,
+                                      defer_snapshots=defer_snapshots)
     self.open_with_file(output)
     self.__output = output
     self.final_content = None
@@ -168,6 +190,28 @@ class JournalTest(unittest.TestCase):
     json_object['_thread'] = threading.current_thread().ident
     self.assertItemsEqual(json_object, got)
 
+  def test_store_deep_value(self):
+    """Verify we store and read back values nested beyond recursion limits."""
+    depth = 3000
+    value = 'leaf'
+    for _ in range(depth):
+      value = [{'nested': value}]
+
+    output = StringIO()
+    journal = TestJournal(output)
+    journal.store(TestValue(value))
+    journal.terminate()
+
+    codec = JsonJournalCodec()
+    entries = [codec.decode(record)
+               for record in RecordInputStream(StringIO(journal.final_content))]
+    self.assertEquals(['JournalMessage', 'JsonSnapshot', 'JournalMessage'],
+                      [entry['_type'] for entry in entries])
+    got = entries[1]['_entities']['1']['_edges'][0]['_value']
+    for _ in range(depth):
+      got = got[0]['nested']
+    self.assertEquals('leaf', got)
+
   def test_lifecycle(self):
     """Verify we store multiple objects as a list of snapshots."""
     first = TestData('first', 1, TestDetails())
@@ -200,6 +244,116 @@ class JournalTest(unittest.TestCase):
     json_object['_thread'] = threading.current_thread().ident
     self.assertItemsEqual(json_object, got[2])
 
+  def test_background_writer(self):
+    """Verify the background writer preserves the order within each thread."""
+    num_threads = 8
+    num_messages = 50
+    journal = Journal(now_function=TestClock(), queue_size=4)
+    output = StringIO()
+    journal.open_with_file(output)
+
+    def write_messages(name):
+      for index in range(num_messages):
+        journal.write_message('{0} {1}'.format(name, index), thread=name)
+
+    threads = [threading.Thread(target=write_messages, args=['T{0}'.format(i)])
+               for i in range(num_threads)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+
+    journal.flush()
+    decoder = json.JSONDecoder(encoding='ASCII')
+    got = [decoder.decode(text)
+           for text in RecordInputStream(StringIO(output.getvalue()))]
+    self.assertEquals(1 + num_threads * num_messages, len(got))
+
+    for name in ['T{0}'.format(i) for i in range(num_threads)]:
+      self.assertEquals(
+          ['{0} {1}'.format(name, index) for index in range(num_messages)],
+          [entry['_value'] for entry in got if entry.get('thread') == name])
+
+  def test_background_writer_terminate(self):
+    """Verify terminate writes all the queued entries before closing."""
+    expect_journal = TestJournal(StringIO())
+    background_journal = TestJournal(StringIO(), queue_size=1)
+    for journal in [expect_journal, background_journal]:
+      journal.write_message('A simple message.')
+      journal.store(TestData('NAME', 1234, TestDetails()))
+      journal.terminate()
+
+    self.assertEquals(expect_journal.final_content,
+                      background_journal.final_content)
+
+  def test_terminate_waits_for_pending_puts(self):
+    """Verify entries being queued when terminate is called are written."""
+    entered_put = threading.Event()
+    finish_put = threading.Event()
+
+    original_queue = Queue.Queue
+    class SlowQueue(original_queue):
+      def put(self, item, block=True, timeout=None):
+        if isinstance(item, dict) and item.get('_value') == 'Late message.':
+          entered_put.set()
+          finish_put.wait()
+        original_queue.put(self, item, block, timeout)
+
+    Queue.Queue = SlowQueue
+    try:
+      journal = TestJournal(StringIO(), queue_size=1)
+    finally:
+      Queue.Queue = original_queue
+
+    writer = threading.Thread(
+        target=journal.write_message, args=['Late message.'])
+    writer.daemon = True
+    writer.start()
+    entered_put.wait()
+    terminator = threading.Thread(target=journal.terminate)
+    terminator.daemon = True
+    terminator.start()
+    terminator.join(0.2)
+    self.assertTrue(terminator.is_alive())
+
+    finish_put.set()
+    writer.join(5)
+    terminator.join(5)
+    self.assertFalse(writer.is_alive())
+    self.assertFalse(terminator.is_alive())
+    decoder = json.JSONDecoder(encoding='ASCII')
+    got = [decoder.decode(text)['_value'] for text in
+           RecordInputStream(StringIO(journal.final_content))]
+    self.assertIn('Late message.', got)
+
+  def test_defer_snapshots(self):
+    """Verify deferred snapshots are exported by the background writer."""
+    self.assertRaises(ValueError, Journal, defer_snapshots=True)
+
+    expect_journal = TestJournal(StringIO())
+    deferred_journal = TestJournal(StringIO(), queue_size=4,
+                                   defer_snapshots=True)
+    for journal in [expect_journal, deferred_journal]:
+      journal.write_message('A simple message.')
+      journal.store(TestData('NAME', 1234, TestDetails()), title='Test')
+      journal.write_message('Another message.')
+      journal.terminate()
+
+    self.assertEquals(expect_journal.final_content,
+                      deferred_journal.final_content)
+
+    journal = TestJournal(StringIO(), queue_size=4, defer_snapshots=True)
+    exported = TestExportThread()
+    journal.store(exported)
+    journal.flush()
+    self.assertIsNotNone(exported.export_thread)
+    self.assertNotEquals(threading.current_thread(), exported.export_thread)
+
+    # Export errors are reported back at the next barrier.
+    journal.store(TestExportThread(fail=True))
+    self.assertRaises(ValueError, journal.flush)
+    journal.terminate()
+
 
 if __name__ == '__main__':
   loader = unittest.TestLoader()
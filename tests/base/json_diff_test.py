@@ -0,0 +1,99 @@
+# Copyright 2015 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Test json_diff module."""
+# pylint: disable=missing-docstring
+
+import sys
+import unittest
+
+from citest.base import (apply_json_diff, diff_json)
+
+
+class JsonDiffTest(unittest.TestCase):
+  def assertRoundtrip(self, old, new):
+    diff = diff_json(old, new)
+    self.assertEquals(new, apply_json_diff(old, diff))
+    return diff
+
+  def test_equal(self):
+    value = {'a': [1, {'b': 'B'}], 'c': None}
+    self.assertEquals([], self.assertRoundtrip(value, value))
+
+  def test_primitives(self):
+    self.assertEquals([{'op': 'replace', 'path': [], 'value': 2}],
+                      self.assertRoundtrip(1, 2))
+    self.assertRoundtrip(1, True)
+    self.assertRoundtrip('a', None)
+    self.assertRoundtrip([1], {'a': 1})
+
+  def test_dict(self):
+    old = {'a': 1, 'b': {'x': 'X', 'y': 'Y'}, 'c': 3}
+    new = {'a': 1, 'b': {'x': 'X', 'z': 'Z'}, 'd': 4}
+    self.assertEquals(
+        [{'op': 'remove', 'path': ['b', 'y']},
+         {'op': 'add', 'path': ['b', 'z'], 'value': 'Z'},
+         {'op': 'remove', 'path': ['c']},
+         {'op': 'add', 'path': ['d'], 'value': 4}],
+        self.assertRoundtrip(old, new))
+
+  def test_list_insert_and_remove(self):
+    old = [{'name': str(index)} for index in range(10)]
+    new = list(old)
+    new.insert(3, {'name': 'new'})
+    del new[8]
+    self.assertEquals(
+        [{'op': 'remove', 'path': [7]},
+         {'op': 'add', 'path': [3], 'value': {'name': 'new'}}],
+        self.assertRoundtrip(old, new))
+
+  def test_list_change(self):
+    old = [{'name': 'a', 'state': 'PENDING'}, {'name': 'b', 'state': 'DONE'}]
+    new = [{'name': 'a', 'state': 'DONE'}, {'name': 'b', 'state': 'DONE'}]
+    self.assertEquals(
+        [{'op': 'replace', 'path': [0, 'state'], 'value': 'DONE'}],
+        self.assertRoundtrip(old, new))
+
+  def test_mixed_changes(self):
+    old = [1, 2, [3, 4], 5, {'a': [6]}, 7]
+    new = [0, 2, [3], {'a': [6, 8]}, 7, 9, 10]
+    self.assertRoundtrip(old, new)
+    self.assertRoundtrip(new, old)
+    self.assertRoundtrip([], new)
+    self.assertRoundtrip(old, [])
+
+  def test_apply_does_not_modify(self):
+    old = {'a': [1, 2]}
+    apply_json_diff(old, diff_json(old, {'a': [1]}))
+    self.assertEquals({'a': [1, 2]}, old)
+    self.assertRaises(KeyError, apply_json_diff, {},
+                      [{'op': 'remove', 'path': ['missing']}])
+
+  def test_deep(self):
+    depth = 2 * sys.getrecursionlimit()
+    old = 'old'
+    new = 'new'
+    for _ in range(depth):
+      old = {'nested': [old, 1]}
+      new = {'nested': [new, 1]}
+    self.assertEquals(
+        [{'op': 'replace', 'path': ['nested', 0] * depth, 'value': 'new'}],
+        diff_json(old, new))
+
+
+if __name__ == '__main__':
+  loader = unittest.TestLoader()
+  suite = loader.loadTestsFromTestCase(JsonDiffTest)
+  unittest.TextTestRunner(verbosity=2).run(suite)
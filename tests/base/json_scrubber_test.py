@@ -74,6 +74,26 @@ class JsonScrubberTest(unittest.TestCase):
     d = {'A': '---BEGIN PRIVATE KEY---\nABC\n123+/==\n---END PRIVATE KEY---\n'}
     self.assertEqual({'A': scrubber.REDACTED}, scrubber(d))
 
+  def test_does_not_modify(self):
+    scrubber = JsonScrubber()
+    d = {'parent': [{'key': 'password', 'value': 'p'}], 'secret': 's'}
+    self.assertEqual({'parent': [{'key': 'password',
+                                  'value': scrubber.REDACTED}],
+                      'secret': scrubber.REDACTED},
+                     scrubber(d))
+    self.assertEqual(
+        {'parent': [{'key': 'password', 'value': 'p'}], 'secret': 's'}, d)
+
+  def test_key_cache_limit(self):
+    scrubber = JsonScrubber()
+    scrubber.MAX_CACHED_KEYS = 3
+    d = {'key{0}'.format(i): 'v' for i in range(10)}
+    d['password'] = 'p'
+    expect = dict(d)
+    expect['password'] = scrubber.REDACTED
+    for _ in range(2):
+      self.assertEqual(expect, scrubber(d))
+
   def test_json(self):
     text = u"""[
   {{
@@ -111,6 +131,42 @@ class JsonScrubberTest(unittest.TestCase):
     self.assertEqual(expect, decoder.decode(scrubber(original)))
 
 
+  def test_json_text(self):
+    scrubber = JsonScrubber()
+    key = '---BEGIN PRIVATE KEY---\nABC\n123+/==\n---END PRIVATE KEY---\n'
+    documents = [
+        {'a': 1, 'b': [True, None, 1.5e3]},
+        {'password': {'nested': ['x', {'secret': 1}]}, 'after': 'A'},
+        {'items': [{'value': {'deep': [1, 2]}, 'key': 'apassword'},
+                   {'key': 'plain', 'value': 'v'},
+                   {'key': 'secret', 'value': 'v', 'extra': 'e'}]},
+        {'value': {'key': 'private', 'value': [1]}, 'key': 'passwords'},
+        {'pass\u0077ord': 'p', 'cert': key, 'list': [key]},
+        [{'PRIVATE': None}, 'password', -0.5],
+        'just a secret string',
+        {}]
+    decoder = JSONDecoder()
+    for document in documents:
+      for indent in [None, 2]:
+        text = JSONEncoder(indent=indent).encode(document)
+        scrubbed = scrubber.process_json_text(text)
+        self.assertEqual(scrubber(decoder.decode(text)),
+                         decoder.decode(scrubbed))
+
+  def test_json_text_preserves_format(self):
+    scrubber = JsonScrubber()
+    text = '{\n  "name" : "n",\n  "password":"p" ,"x": [ 1 ]\n}\n'
+    self.assertEqual(
+        '{\n  "name" : "n",\n  "password":"*****" ,"x": [ 1 ]\n}\n',
+        scrubber(text))
+
+  def test_json_text_invalid(self):
+    scrubber = JsonScrubber()
+    for text in ['{"password": "p"', '{"password": "p"} extra',
+                 '["password",]', '{"password" "p"}', '{"a": "secret"]',
+                 'secret: 1']:
+      self.assertEqual(text, scrubber(text))
+
 
 if __name__ == '__main__':
   loader = unittest.TestLoader()
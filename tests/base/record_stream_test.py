@@ -0,0 +1,124 @@
+# Copyright 2015 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Test record_stream module."""
+# pylint: disable=missing-docstring
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from StringIO import StringIO
+
+from citest.base import (
+    MappedRecordInputStream,
+    RecordInputStream,
+    RecordOutputStream,
+    map_record_file)
+
+
+class RecordStreamTest(unittest.TestCase):
+  def setUp(self):
+    self.temp_dir = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.temp_dir)
+
+  def write_records(self, records):
+    path = os.path.join(self.temp_dir, 'records')
+    output = RecordOutputStream(open(path, 'wb'))
+    offsets = []
+    for record in records:
+      offsets.append(output.position)
+      output.append(record)
+    output.close()
+    return path, offsets
+
+  def test_roundtrip(self):
+    output = RecordOutputStream(StringIO())
+    output.append('first')
+    output.append('')
+    output.append('third')
+    self.assertEquals(4 + 5 + 4 + 4 + 5, output.position)
+
+    got = RecordInputStream(StringIO(output.stream.getvalue()))
+    self.assertEquals(['first', '', 'third'], [record for record in got])
+
+  def test_mapped(self):
+    path, offsets = self.write_records(['first', 'second', 'third'])
+    mapping = map_record_file(path)
+    first = MappedRecordInputStream(mapping)
+    second = MappedRecordInputStream(mapping)
+
+    self.assertEquals(['first', 'second', 'third'],
+                      [str(record) for record in first])
+
+    # The second reader has its own position within the shared mapping.
+    second.seek(offsets[1])
+    record = second.next()
+    self.assertIsInstance(record, buffer)
+    self.assertEquals('second', str(record))
+    self.assertEquals(offsets[2], second.tell())
+
+  def test_mapped_empty(self):
+    path, _ = self.write_records([])
+    self.assertEquals([], [record for record in
+                           MappedRecordInputStream(map_record_file(path))])
+
+  def test_mapped_truncated(self):
+    output = RecordOutputStream(StringIO())
+    output.append('first')
+    output.append('second')
+    data = output.stream.getvalue()
+
+    got = MappedRecordInputStream(data[:-1])
+    self.assertEquals('first', str(got.next()))
+    self.assertRaises(ValueError, got.next)
+
+    got = MappedRecordInputStream(data[:len('first') + 6])
+    self.assertEquals('first', str(got.next()))
+    self.assertRaises(ValueError, got.next)
+
+  def test_try_next(self):
+    output = RecordOutputStream(StringIO())
+    output.append('first')
+    output.append('second')
+    data = output.stream.getvalue()
+
+    path = os.path.join(self.temp_dir, 'records')
+    writer = open(path, 'wb')
+    got = RecordInputStream(open(path, 'rb'))
+    self.assertIsNone(got.try_next())
+
+    # Write the data a few bytes at a time as if it were still being written.
+    records = []
+    for start in range(0, len(data), 3):
+      writer.write(data[start:start + 3])
+      writer.flush()
+      record = got.try_next()
+      if record is not None:
+        records.append(record)
+    writer.close()
+
+    self.assertEquals(['first', 'second'], records)
+    self.assertIsNone(got.try_next())
+    got.close()
+
+
+if __name__ == '__main__':
+  loader = unittest.TestLoader()
+  suite = loader.loadTestsFromTestCase(RecordStreamTest)
+  unittest.TextTestRunner(verbosity=2).run(suite)
@@ -18,9 +18,20 @@
 # pylint: disable=too-few-public-methods
 # pylint: disable=invalid-name
 
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
 import unittest
 
-from citest.base import (JsonSnapshot, JsonSnapshotable, JsonSnapshotHelper)
+from citest.base import (
+    JsonSnapshot,
+    JsonSnapshotable,
+    JsonSnapshotHelper,
+    SnapshotSizePolicy)
 
 
 class TestLinkedList(JsonSnapshotable):
@@ -200,6 +211,166 @@ class SnapshotTest(unittest.TestCase):
 
     self.assertItemsEqual(expect, json_object)
 
+  def test_snapshot_deep_list(self):
+    """Test snapshotting data nested deeper than the recursion limit."""
+    depth = 10 * sys.getrecursionlimit()
+    value = 'leaf'
+    for _ in range(depth):
+      value = [TestLinkedList('elem'), {'nested': value}]
+
+    snapshot = JsonSnapshot()
+    got = JsonSnapshotHelper.ToJsonSnapshotValue(value, snapshot)
+    for index in range(depth):
+      self.assertEquals({'_type': 'EntityReference', '_id': index + 1}, got[0])
+      got = got[1]['nested']
+    self.assertEquals('leaf', got)
+
+  def test_snapshot_deep_links(self):
+    """Test snapshotting links deeper than the recursion limit."""
+    depth = 10 * sys.getrecursionlimit()
+    elem = None
+    for index in reversed(range(depth)):
+      elem = TestLinkedList(str(index), elem)
+
+    snapshot = JsonSnapshot()
+    snapshot.add_data(elem)
+    json_object = snapshot.to_json_object()
+    self.assertEquals(depth, len(json_object['_entities']))
+    self.assertEquals({'_id': 2, 'class': 'type TestLinkedList', 'name': '1',
+                       '_edges': [{'_to': 3, 'label': 'Next'}]},
+                      json_object['_entities'][2])
+
+  def test_snapshot_size_policy(self):
+    """Test bounding the size of values per edge, entity and snapshot."""
+    policy = SnapshotSizePolicy(max_value_bytes=100, max_entity_bytes=150,
+                                max_snapshot_bytes=300, excerpt_bytes=10)
+    snapshot = JsonSnapshot(_size_policy=policy)
+    builder = snapshot.edge_builder
+    first = snapshot.new_entity()
+    second = snapshot.new_entity()
+
+    big = 'x' * 1000
+    small = 'y' * 80
+    edge = builder.make_output(first, 'Big', big)
+    self.assertEquals(1000, edge.metadata['truncated_bytes'])
+    self.assertEquals(hashlib.sha1(big).hexdigest(), edge.metadata['sha1'])
+    self.assertTrue(edge.value.startswith('x' * 10))
+    self.assertTrue(edge.value.endswith('x' * 10))
+    self.assertIn('980 bytes omitted', edge.value)
+
+    # Fits in the value limit but not the remaining entity budget.
+    self.assertEquals(small, builder.make(first, 'Small', small).value)
+    edge = builder.make(first, 'Small', small)
+    self.assertEquals(80, edge.metadata['truncated_bytes'])
+
+    # Fits in the entity but not the remaining snapshot budget.
+    self.assertEquals(small, builder.make(second, 'Small', small).value)
+    edge = builder.make(second, 'Small', small[:60])
+    self.assertEquals(60, edge.metadata['truncated_bytes'])
+
+    # Primitive and entity values are not bounded.
+    self.assertEquals(123, builder.make(second, 'Number', 123).value)
+    self.assertNotIn('truncated_bytes',
+                     builder.make(second, 'Entity', first).metadata)
+
+  def test_snapshot_size_policy_references(self):
+    """Test that values referencing entities are not truncated."""
+    policy = SnapshotSizePolicy(max_value_bytes=100, max_entity_bytes=1000,
+                                excerpt_bytes=10)
+    snapshot = JsonSnapshot(_size_policy=policy)
+    builder = snapshot.edge_builder
+    entity = snapshot.new_entity()
+    elements = [TestLinkedList('element {0}'.format(index))
+                for index in range(10)]
+    edge = builder.make_data(entity, 'Elements', elements)
+    self.assertNotIn('truncated_bytes', edge.metadata)
+    self.assertEquals(
+        [{'_type': 'EntityReference', '_id': index + 2}
+         for index in range(10)],
+        edge.value)
+
+    # Every entity is still referenced from the subject.
+    json_object = snapshot.to_json_object()
+    self.assertEquals(11, len(json_object['_entities']))
+
+    # The references still count towards the entity's budget.
+    num_bytes = len(json.JSONEncoder(separators=(',', ':')).encode(
+        edge.value))
+    self.assertGreater(num_bytes, 100)
+    edge = builder.make_data(entity, 'Text', 'x' * (1000 - num_bytes + 1))
+    self.assertIn('truncated_bytes', edge.metadata)
+
+  def test_snapshot_size_policy_blob(self):
+    """Test spilling truncated values into blob files."""
+    blob_dir = tempfile.mkdtemp()
+    try:
+      policy = SnapshotSizePolicy(max_value_bytes=10, excerpt_bytes=2,
+                                  blob_dir=blob_dir)
+      value = [{'name': 'item{0}'.format(index)} for index in range(10)]
+      text = json.JSONEncoder(separators=(',', ':')).encode(value)
+      for _ in range(2):
+        snapshot = JsonSnapshot(_size_policy=policy)
+        edge = snapshot.edge_builder.make_data(
+            snapshot.new_entity(), 'Items', value)
+        digest = hashlib.sha1(text).hexdigest()
+        self.assertEquals(os.path.join(blob_dir, digest + '.json'),
+                          edge.metadata['blob'])
+        with open(edge.metadata['blob'], 'rb') as stream:
+          self.assertEquals(value, json.JSONDecoder().decode(stream.read()))
+      self.assertEquals([digest + '.json'], os.listdir(blob_dir))
+    finally:
+      shutil.rmtree(blob_dir)
+
+  def test_snapshot_size_policy_blob_threads(self):
+    """Test threads concurrently spilling the same value into a blob."""
+    blob_dir = tempfile.mkdtemp()
+    original_mkstemp = tempfile.mkstemp
+    arrived = threading.Condition()
+    num_arrived = [0]
+
+    def mkstemp(*args, **kwargs):
+      # Hold each thread until both found the blob is missing.
+      with arrived:
+        num_arrived[0] += 1
+        arrived.notify_all()
+        while num_arrived[0] < 2:
+          arrived.wait(5)
+      return original_mkstemp(*args, **kwargs)
+
+    errors = []
+    paths = []
+    def store(policy, value):
+      try:
+        snapshot = JsonSnapshot(_size_policy=policy)
+        edge = snapshot.edge_builder.make_data(
+            snapshot.new_entity(), 'Value', value)
+        paths.append(edge.metadata['blob'])
+      except Exception as ex:
+        errors.append(ex)
+
+    tempfile.mkstemp = mkstemp
+    try:
+      policy = SnapshotSizePolicy(max_value_bytes=10, blob_dir=blob_dir)
+      value = 'x' * 1000
+      threads = [threading.Thread(target=store, args=(policy, value))
+                 for _ in range(2)]
+      for thread in threads:
+        thread.daemon = True
+        thread.start()
+      for thread in threads:
+        thread.join(10)
+        self.assertFalse(thread.is_alive())
+
+      self.assertEquals([], errors)
+      digest = hashlib.sha1(value).hexdigest()
+      self.assertEquals([os.path.join(blob_dir, digest + '.txt')] * 2, paths)
+      self.assertEquals([digest + '.txt'], os.listdir(blob_dir))
+      with open(paths[0], 'rb') as stream:
+        self.assertEquals(value, stream.read())
+    finally:
+      tempfile.mkstemp = original_mkstemp
+      shutil.rmtree(blob_dir)
+
 
 if __name__ == '__main__':
   loader = unittest.TestLoader()
@@ -14,12 +14,19 @@
 
 
 import argparse
+import logging
+import os
 import os.path
+import shutil
 import sys
+import tempfile
+import unittest
 import __main__
 
 from citest.base import BaseTestCase
+from citest.base import Journal
 from citest.base import TestRunner
+from citest.base.test_runner import write_journal_html_report
 
 
 tested_main = False
@@ -45,8 +52,85 @@ class TestRunnerTest(BaseTestCase):
       TestRunner.global_runner().bindings['LOG_FILEBASE'])
 
 
+class RecordingHandler(logging.Handler):
+  def __init__(self):
+    super(RecordingHandler, self).__init__()
+    self.records = []
+
+  def emit(self, record):
+    self.records.append(record)
+
+
+class JournalProcessorTest(unittest.TestCase):
+  def setUp(self):
+    # Constructing runners replaces the global runner that other tests use.
+    # pylint: disable=protected-access
+    self.global_runner = TestRunner._TestRunner__global_runner
+    self.original_dir = os.getcwd()
+    self.temp_dir = tempfile.mkdtemp()
+    os.chdir(self.temp_dir)
+
+  def tearDown(self):
+    os.chdir(self.original_dir)
+    shutil.rmtree(self.temp_dir)
+    TestRunner._TestRunner__global_runner = self.global_runner
+
+  def write_journal(self):
+    path = os.path.join(self.temp_dir, 'processed.journal')
+    journal = Journal()
+    journal.open_with_path(path)
+    journal.write_message('A message.')
+    journal.terminate()
+    return path
+
+  def test_processor_receives_journal_path(self):
+    runner = TestRunner()
+    processed = []
+    runner.journal_processors[:] = [processed.append]
+    path = self.write_journal()
+    runner.process_journal(path)
+    self.assertEquals([path], processed)
+
+  def test_failing_processor_does_not_stop_others(self):
+    def fail(path):
+      raise ValueError('Failed on ' + path)
+
+    runner = TestRunner()
+    processed = []
+    runner.journal_processors[:] = [fail, processed.append]
+    handler = RecordingHandler()
+    logger = logging.getLogger('citest.base.test_runner')
+    # The runner's logging configuration may have disabled the logger.
+    original_state = (logger.disabled, logger.level)
+    logger.disabled = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+    try:
+      path = self.write_journal()
+      runner.process_journal(path)
+    finally:
+      logger.removeHandler(handler)
+      logger.disabled, logger.level = original_state
+
+    self.assertEquals([path], processed)
+    errors = [record for record in handler.records
+              if record.levelno >= logging.ERROR]
+    self.assertEquals(1, len(errors))
+    self.assertIn('fail failed to process', errors[0].getMessage())
+
+  def test_default_processor_writes_html(self):
+    runner = TestRunner()
+    self.assertEquals([write_journal_html_report], runner.journal_processors)
+    runner.process_journal(self.write_journal())
+    html_path = os.path.join(self.temp_dir, 'processed.html')
+    self.assertTrue(os.path.exists(html_path))
+    with open(html_path, 'r') as stream:
+      self.assertIn('A message.', stream.read())
+
+
 if __name__ == '__main__':
-  result = TestRunner.main(test_case_list=[TestRunnerTest])
+  result = TestRunner.main(
+      test_case_list=[TestRunnerTest, JournalProcessorTest])
   if not tested_main:
      raise Exception("Test Failed.")
 
@@ -16,9 +16,16 @@
 # pylint: disable=missing-docstring
 # pylint: disable=invalid-name
 
+import sys
 import unittest
 
-from citest.base import JsonSnapshotHelper
+from citest.base import (
+    Journal,
+    JsonSnapshot,
+    JsonSnapshotHelper,
+    apply_json_diff,
+    set_global_journal,
+    unset_global_journal)
 import citest.json_contract as jc
 import citest.json_predicate as jp
 
@@ -42,6 +49,35 @@ class FakeObserver(jc.ObjectObserver):
     return observation.objects
 
 
+class ConvergingObserver(jc.ObjectObserver):
+  def __init__(self, states, extra_objects=()):
+    super(ConvergingObserver, self).__init__()
+    self.__states = list(states)
+    self.__extra_objects = list(extra_objects)
+
+  def collect_observation(self, observation, trace=True):
+    state = self.__states.pop(0) if len(self.__states) > 1 else self.__states[0]
+    observation.add_all_objects([{'name': 'a', 'state': state},
+                                 {'name': 'b', 'state': 'STABLE'}]
+                                + self.__extra_objects)
+    return observation.objects
+
+
+class StoreRecordingJournal(Journal):
+  def __init__(self):
+    super(StoreRecordingJournal, self).__init__()
+    self.stored = []
+
+  def store(self, obj, **metadata):
+    self.stored.append(obj)
+
+  def begin_context(self, _title, **metadata):
+    pass
+
+  def end_context(self, **metadata):
+    pass
+
+
 class JsonContractTest(unittest.TestCase):
   def assertEqual(self, expect, have, msg=''):
     if not msg:
@@ -208,6 +244,89 @@ class JsonContractTest(unittest.TestCase):
     self.assertEqual(expect_result, result)
     self.assertEqual(True, result.valid)
 
+  def test_clause_attempt_history(self):
+    observer = ConvergingObserver(['PENDING', 'PENDING', 'DONE'])
+    verifier = jc.ValueObservationVerifier(
+        'Is Done', constraints=[jp.PathContainsPredicate('state', 'DONE')])
+    self.assertIsNone(
+        jc.ContractClause('Untracked', observer, verifier).attempt_history)
+
+    clause = jc.ContractClause('TestClause', observer, verifier,
+                               record_attempts=True)
+    for _ in range(3):
+      clause.verify_once()
+    history = clause.attempt_history
+    self.assertEquals(3, history.num_attempts)
+
+    snapshot = JsonSnapshot()
+    snapshot.add_data(history)
+    edges = snapshot.to_json_object()['_entities'][1]['_edges']
+    self.assertEquals(['INVALID', 'INVALID', 'VALID'],
+                      [edge['relation'] for edge in edges])
+    self.assertEquals('PENDING', edges[0]['_value']['objects'][0]['state'])
+    self.assertEquals([], edges[1]['_value'])
+    self.assertEquals('Attempt 2', edges[2]['delta_of'])
+
+    value = edges[0]['_value']
+    for edge in edges[1:]:
+      value = apply_json_diff(value, edge['_value'])
+    self.assertEquals({'objects': [{'name': 'a', 'state': 'DONE'},
+                                   {'name': 'b', 'state': 'STABLE'}],
+                       'errors': [], 'valid': True},
+                      value)
+
+    # Observations nested deeper than the recursion limit are recorded too.
+    depth = 2 * sys.getrecursionlimit()
+    deep = 'leaf'
+    for _ in range(depth):
+      deep = {'nested': [deep]}
+    clause = jc.ContractClause(
+        'DeepClause',
+        ConvergingObserver(['PENDING', 'DONE'], extra_objects=[deep]),
+        verifier, record_attempts=True)
+    for _ in range(2):
+      clause.verify_once()
+
+    snapshot = JsonSnapshot()
+    snapshot.add_data(clause.attempt_history)
+    edges = snapshot.to_json_object()['_entities'][1]['_edges']
+    self.assertEquals(
+        [{'op': 'replace', 'path': ['objects', 0, 'state'], 'value': 'DONE'},
+         {'op': 'replace', 'path': ['valid'], 'value': True}],
+        edges[1]['_value'])
+    got = edges[0]['_value']['objects'][2]
+    for _ in range(depth):
+      got = got['nested'][0]
+    self.assertEquals('leaf', got)
+
+  def test_clause_journals_frozen_attempt_history(self):
+    observer = ConvergingObserver(['PENDING', 'DONE'])
+    verifier = jc.ValueObservationVerifier(
+        'Is Done', constraints=[jp.PathContainsPredicate('state', 'DONE')])
+    clause = jc.ContractClause('TestClause', observer, verifier,
+                               retryable_for_secs=1, record_attempts=True)
+
+    journal = StoreRecordingJournal()
+    previous_journal = unset_global_journal()
+    set_global_journal(journal)
+    try:
+      clause.verify()
+    finally:
+      unset_global_journal()
+      if previous_journal is not None:
+        set_global_journal(previous_journal)
+
+    stored = [obj for obj in journal.stored
+              if isinstance(obj, jc.ClauseAttemptHistory)]
+    self.assertEquals(1, len(stored))
+    self.assertIsNot(clause.attempt_history, stored[0])
+    self.assertEquals(2, stored[0].num_attempts)
+
+    # Later attempts do not change the journaled history.
+    clause.verify_once()
+    self.assertEquals(3, clause.attempt_history.num_attempts)
+    self.assertEquals(2, stored[0].num_attempts)
+
   def test_contract_observation_failure(self):
     observation = jc.Observation()
     observation.add_error(
@@ -257,6 +376,30 @@ class JsonContractTest(unittest.TestCase):
           'EXPECT\n{0}\n\nACTUAL\n{1}'.format(
               expect_results, verify_results))
 
+  def test_clause_decide_fast(self):
+    observer = ConvergingObserver(['PENDING', 'PENDING', 'DONE'])
+    verifier = jc.ValueObservationVerifier(
+        'Is Done', constraints=[
+            jp.PathContainsPredicate('state', 'DONE'),
+            jp.CardinalityPredicate(jp.PathPredicate('name'), min=1)])
+    builder = jc.ContractClauseBuilder('TestClause', observer=observer,
+                                       retryable_for_secs=2)
+    builder.verifier_builder = jc.ObservationVerifierBuilder('Is Done')
+    builder.verifier_builder.append_verifier(verifier)
+    builder.decide_fast = True
+    clause = builder.build()
+    self.assertTrue(clause.decide_fast)
+
+    # The final attempt is verified again in full for the report.
+    result = clause.verify()
+    self.assertTrue(result)
+    observation = jc.Observation()
+    observation.add_all_objects([{'name': 'a', 'state': 'DONE'},
+                                 {'name': 'b', 'state': 'STABLE'}])
+    expect_result = jc.contract.ContractClauseVerifyResult(
+        True, clause, clause.verifier(observation))
+    self.assertEqual(expect_result, result)
+
 
 if __name__ == '__main__':
   loader = unittest.TestLoader()
@@ -69,6 +69,30 @@ class JsonObserverTest(unittest.TestCase):
     self.assertEqual(expect, observation)
 
 
+  def test_observation_path_index(self):
+    observation = jc.Observation()
+    observation.add_object(_LETTER_DICT)
+    index = observation.path_index
+    self.assertIs(observation.objects, index.source)
+    self.assertIs(index, observation.path_index)
+    values, _ = index.collect('a')
+    self.assertEqual([jp.PathValue('[0]/a', 'A')], values)
+
+    # Adding objects invalidates the index.
+    observation.add_object(_NUMBER_DICT)
+    index = observation.path_index
+    values, _ = index.collect('a')
+    self.assertEqual([jp.PathValue('[0]/a', 'A'), jp.PathValue('[1]/a', 1)],
+                     values)
+
+    observation.add_all_objects([_MIXED_DICT])
+    self.assertIsNot(index, observation.path_index)
+    index = observation.path_index
+    other = jc.Observation()
+    other.extend(observation)
+    observation.extend(other)
+    self.assertIsNot(index, observation.path_index)
+
   def test_object_observer_map(self):
     # Test no filter.
     observer = jc.ObjectObserver()
@@ -251,6 +251,28 @@ class JsonValueObservationVerifierTest(unittest.TestCase):
       except:
         print 'testing {0}'.format(obj_list)
         raise
+  def test_decide_fast_stops_at_first_failure(self):
+    count_a = jp.CardinalityPredicate(jp.PathPredicate('a'), min=1)
+    missing = jp.PathPredicate('missing', jp.STR_EQ('X'))
+    count_z = jp.CardinalityPredicate(jp.PathPredicate('z'), max=0)
+    verifier = jc.ValueObservationVerifier(
+        title='Decide Fast', constraints=[count_a, missing, count_z])
+
+    observation = jc.Observation()
+    observation.add_all_objects([_LETTER_DICT, _LETTER_DICT])
+
+    full_result = verifier(observation)
+    fast_result = verifier(observation, decide_fast=True)
+    self.assertFalse(full_result)
+    self.assertFalse(fast_result)
+    self.assertIn(count_z, full_result.failed_constraints)
+    self.assertIn(missing, fast_result.failed_constraints)
+    self.assertNotIn(count_z, fast_result.failed_constraints)
+
+    # The compiled constraints do not explain which objects matched.
+    self.assertEquals(4, len(full_result.good_results))
+    self.assertEquals([], fast_result.good_results)
+
 
   def _try_verify(self, verifier, observation, expect_ok, expect_results=None,
                   dump=False):
@@ -238,6 +238,17 @@ class JsonBinaryPredicateTest(unittest.TestCase):
         PathValue('', big_nested), nested_subset_pred,
         nested_subset_pred(big_nested))
 
+  def test_dict_subset_agrees_with_explanation(self):
+    big = {'a': 'ABC', 'b': [{'c': ['x', 'y'], 'd': 4}, {'d': 5}],
+           'e': {'f': [['g']], 'h': None}, 'i': 1.5, 'k': [1, 2]}
+    for small in [{}, {'a': 'B'}, {'a': 'D'}, {'k': 1}, {'k': 3},
+                  {'b': {'d': 4}}, {'b': [{'c': ['y']}, {'d': 5}]},
+                  {'b': [{'c': ['z']}]}, {'e': {'f': [['g']], 'h': None}},
+                  {'e': {'f': [[]]}}, {'i': 1.5}, {'i': 1}, {'j': 1}]:
+      pred = jp.DICT_SUBSET(small)
+      self.assertEqual(pred._is_subset(big, '', small, big), pred(big),
+                       str(small))
+
   def test_standard_dict_operator_type_mismatch(self):
     operand = {'a': 'A'}
     for value in [['a'], 'a', 1]:
@@ -339,6 +350,52 @@ class JsonBinaryPredicateTest(unittest.TestCase):
         PathValue('', source), common_subset_pred,
         common_subset_pred(source))
 
+  def test_list_subset_of_many(self):
+    rules = [{'protocol': 'tcp', 'ports': [str(port), 'any'], 'index': port}
+             for port in range(200)]
+    rules.append({'protocol': 'udp', 'ports': {'first': '1'}})
+    source = rules + ['tcp', 1, [2, 3]]
+
+    for operand, strict, valid in [
+        ([{'protocol': 'tcp', 'ports': ['5']}, {'ports': ['7', 'any']}],
+         False, True),
+        ([{'protocol': 'tcp', 'ports': ['5']}, {'protocol': 'tcp',
+                                                'ports': ['500']}],
+         False, False),
+        ([{'protocol': 'udp', 'ports': {'first': '1'}}, {'index': 3}],
+         False, True),
+        ([{'protocol': 'udp', 'index': 3}, {'index': 3}], False, False),
+        ([{}, {'index': 99.0}, 'tcp', 1, [2]], False, True),
+        ([{'protocol': 'tcp', 'ports': ['5']}, 'tcp'], True, False),
+        ([rules[5], 'tcp', True, [2, 3]], True, True),
+        ([rules[5], [3, 2]], True, False)]:
+      pred = jp.LIST_SUBSET(operand, strict=strict)
+      result = pred(source)
+      self.assertEqual(valid, result.valid,
+                       '{0} strict={1}'.format(operand, strict))
+
+  def test_list_subset_of_non_json(self):
+    source = [('a', 'b'), {'a': 'A'}]
+    self.assertTrue(jp.LIST_SUBSET([('a', 'b'), {'a': 'A'}], strict=True)(
+        source))
+    self.assertFalse(jp.LIST_SUBSET([['a', 'b'], {'a': 'A'}], strict=True)(
+        source))
+
+  def test_lists_equivalent_unordered(self):
+    # Complex numbers cannot be sorted.
+    self.assertTrue(jp.binary_predicate.lists_equivalent(
+        [1j, {'a': [2j]}, 'x'], ['x', 1j, {'a': [2j]}]))
+    self.assertFalse(jp.binary_predicate.lists_equivalent(
+        [1j, {'a': [2j]}, 'x'], ['x', 1j, {'a': [1j]}]))
+    self.assertFalse(jp.binary_predicate.lists_equivalent(
+        [1j, 1j, 2j], [1j, 2j, 2j]))
+
+    # Sets can be compared but are not ordered, nor are they JSON.
+    self.assertTrue(jp.binary_predicate.lists_equivalent(
+        [set([1]), set([2]), set([1, 2])], [set([1, 2]), set([1]), set([2])]))
+    self.assertFalse(jp.binary_predicate.lists_equivalent(
+        [set([1]), set([2]), set([2])], [set([1]), set([1]), set([2])]))
+
   def test_list_equivalent(self):
     source = [{'a':'A', 'b':'B'}, {'one':1, 'two':2}]
     pred = jp.EQUIVALENT([source[1], source[0]])
@@ -349,6 +406,26 @@ class JsonBinaryPredicateTest(unittest.TestCase):
                            pred=jp.LIST_SIMILAR(pred.operand)),
         result)
 
+  def test_compile(self):
+    values = ['ab', u'b', 0, 2, 2.5, {}, {'a': 'A', 'n': [1, {'x': 2}]},
+              [], [1, 'ab', {'x': 2}], [[1, 2], 3]]
+    preds = [jp.STR_EQ('ab'), jp.STR_SUBSTR('b'), jp.NUM_LE(2), jp.NUM_NE(0),
+             jp.DICT_EQ({}), jp.DICT_SUBSET({'n': [{'x': 2}]}),
+             jp.LIST_SIMILAR([3, [1, 2]]), jp.LIST_SUBSET([{}, 1]),
+             jp.LIST_SUBSET([1], strict=True), jp.LIST_MEMBER(1),
+             jp.CONTAINS(2), jp.CONTAINS('b'), jp.CONTAINS([[1]]),
+             jp.EQUIVALENT([3, [1, 2]]), jp.EQUIVALENT(2),
+             jp.DIFFERENT({}), jp.DIFFERENT('ab')]
+    for pred in preds:
+      compiled = pred.compile()
+      for value in values:
+        try:
+          expect = bool(pred(value))
+        except (NotImplementedError, TypeError):
+          continue
+        self.assertEquals(expect, compiled(value),
+                          '{0} on {1!r}'.format(pred, value))
+
 
 if __name__ == '__main__':
   # pylint: disable=invalid-name
@@ -144,6 +144,14 @@ class CardinalityPredicateTest(unittest.TestCase):
                   predicate, expect_path_result),
               result)
 
+  def test_cardinality_compile(self):
+    source = ['A'] * 5 + ['B'] * 5
+    for min in range(0, 7):
+      for max in [None] + range(0, 7):
+        predicate = jp.CardinalityPredicate(_eq_A, min=min, max=max)
+        self.assertEquals(bool(predicate(source)), predicate.compile()(source),
+                          'min={0} max={1}'.format(min, max))
+
 
 if __name__ == '__main__':
   # pylint: disable=invalid-name
@@ -199,6 +199,18 @@ class LogicPredicateTest(unittest.TestCase):
       self.assertFalse(result)
       self.assertEqual(expect, result)
 
+  def test_compile(self):
+    aA = jp.PathEqPredicate('a', 'A')
+    bB = jp.PathEqPredicate('b', 'B')
+    cC = jp.PathEqPredicate('c', 'C')
+    tests = [{'a': 'A', 'b': 'B'}, {'a': 'A', 'c': 'C'}, {'b': 'B'}, {}]
+    for pred in [jc.AND([aA, bB]), jc.AND([]), jc.OR([aA, cC]), jc.OR([]),
+                 jc.NOT(aA), jc.IF(aA, bB), jc.IF(aA, bB, cC)]:
+      compiled = pred.compile()
+      for test in tests:
+        self.assertEquals(bool(pred(test)), compiled(test),
+                          '{0} on {1}'.format(pred, test))
+
 
 if __name__ == '__main__':
   # pylint: disable=invalid-name
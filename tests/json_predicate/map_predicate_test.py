@@ -157,6 +157,14 @@ class JsonMapPredicateTest(unittest.TestCase):
     aA = jp.PathPredicate('a', jp.STR_EQ('A'))
     self._try_map(aA, None, True, min=0)
 
+  def test_compile(self):
+    aA = jp.PathPredicate('a', jp.STR_EQ('A'))
+    for obj in [_LETTER_DICT, _NUMBER_DICT, _MULTI_ARRAY, [], None]:
+      for min, max in [(1, None), (0, 0), (2, 2), (None, 1)]:
+        pred = jp.MapPredicate(aA, min=min, max=max)
+        self.assertEquals(bool(pred(obj)), pred.compile()(obj),
+                          '{0!r} {1}..{2}'.format(obj, min, max))
+
 
 if __name__ == '__main__':
   loader = unittest.TestLoader()
@@ -27,8 +27,10 @@ from citest.json_predicate import (
     PathPredicate,
     PathPredicateResultBuilder,
     PathValue,
+    PathValueIndex,
     PathValueResult,
     MissingPathError,
+    TypeMismatchError,
     ValuePredicate
     )
 
@@ -282,6 +284,35 @@ class JsonPathPredicateTest(unittest.TestCase):
     self.assertEqual([], values.path_failures)
 
 
+  def test_collect_with_index_into_dict(self):
+    # """Path with a list index where there is a dict."""
+    source = {'outer': _LETTER_DICT}
+    pred = PathPredicate('outer[0]')
+    values = pred(source)
+    self.assertEqual([], values.path_values)
+    self.assertEqual(
+        [TypeMismatchError(
+            list, dict, _LETTER_DICT, 'outer[0]',
+            path_value=PathValue('outer', _LETTER_DICT))],
+        values.path_failures)
+
+  def test_collect_with_path_index(self):
+    source = {'outer': [_LETTER_DICT, _NUMBER_DICT]}
+    index = PathValueIndex(source)
+    for path in ['outer/a', 'outer/z', 'outer[1]', 'outer' + PATH_SEP]:
+      pred = PathPredicate(path, TestEqualsPredicate(1))
+      self.assertEqual(pred(source), pred(source, path_index=index))
+
+    # The values along each path are only collected once.
+    self.assertIs(index.collect('outer/a'), index.collect('outer/a'))
+
+    # An index on another source is ignored.
+    pred = PathPredicate('outer/a')
+    other = {'outer': [_NUMBER_DICT]}
+    self.assertEqual(pred(other), pred(other, path_index=index))
+    self.assertEqual([PathValue('outer[0]/a', 1)],
+                     pred(other, path_index=index).path_values)
+
   def test_collect_from_nested_list_found(self):
     # """Ambiguous path through nested lists."""
     source = {'outer': [_LETTER_DICT, _NUMBER_DICT]}
@@ -359,6 +390,26 @@ class JsonPathPredicateTest(unittest.TestCase):
         pred_result.valid_candidates)
     self.assertEqual([], pred_result.path_failures)
 
+  def test_compile(self):
+    source = {'a': [{'b': 1}, {'b': [2, 3]}, {'c': 4}], 'd': [5, 6]}
+    tests = [('a/b', jp.NUM_EQ(3), True),
+             ('a/b', jp.NUM_GE(4), False),
+             ('a[1]/b' + DONT_ENUMERATE_TERMINAL, jp.LIST_EQ([2, 3]), True),
+             ('a[1]/b', jp.LIST_EQ([2, 3]), False),
+             ('a[3]/b', None, False),
+             ('a' + PATH_SEP, TestEqualsPredicate({'c': 4}), True),
+             ('d', TestEqualsPredicate(6), True),
+             ('d/e', None, False),
+             ('a/c', None, True)]
+    for path, pred, expect in tests:
+      path_pred = PathPredicate(path, pred)
+      self.assertEquals(expect, bool(path_pred(source)), path)
+      self.assertEquals(expect, path_pred.compile()(source), path)
+
+    count = PathPredicate('a/b', jp.NUM_GE(2)).compile_counter()
+    self.assertEquals(2, count(source))
+    self.assertEquals(1, count(source, 1))
+
 
 if __name__ == '__main__':
   # pylint: disable=invalid-name
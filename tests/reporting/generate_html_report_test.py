@@ -0,0 +1,159 @@
+# Copyright 2015 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test citest.reporting.generate_html_report module."""
+# pylint: disable=missing-docstring
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from citest.base import Journal
+from citest.reporting.html_document_manager import HtmlDocumentManager
+from citest.reporting.html_renderer import HtmlRenderer
+from citest.reporting.generate_html_report import (
+    build_index,
+    journal_to_html,
+    main)
+
+
+class TestClock(object):
+  def __init__(self):
+    self.next_time = 100
+
+  def __call__(self):
+    self.next_time += 1
+    return self.next_time - 1
+
+
+class GenerateHtmlReportTest(unittest.TestCase):
+  def setUp(self):
+    self.original_dir = os.getcwd()
+    self.temp_dir = tempfile.mkdtemp()
+    os.chdir(self.temp_dir)
+
+  def tearDown(self):
+    os.chdir(self.original_dir)
+    shutil.rmtree(self.temp_dir)
+
+  def write_journal(self, name, relations):
+    path = os.path.join(self.temp_dir, name + '.journal')
+    journal = Journal(now_function=TestClock())
+    journal.open_with_path(path)
+    for index, relation in enumerate(relations):
+      journal.begin_context('Test {0}'.format(index))
+      journal.write_message('Running test {0}'.format(index))
+      journal.end_context(relation=relation)
+    journal.terminate()
+    return path
+
+  def read_file(self, path):
+    with open(path, 'r') as stream:
+      return stream.read()
+
+  def test_summary(self):
+    path = self.write_journal('test', ['VALID', 'INVALID', 'VALID'])
+    summary = journal_to_html(path)
+    self.assertTrue(os.path.exists('test.html'))
+    self.assertEquals(2, summary.passed_count)
+    self.assertEquals(1, summary.failed_count)
+    self.assertEquals(10, summary.secs)
+
+  def test_index_from_summaries(self):
+    paths = [self.write_journal('first', ['VALID']),
+             self.write_journal('second', ['VALID', 'ERROR'])]
+    build_index(paths)
+    expect = self.read_file('index.html')
+
+    build_index(paths, summaries={path: journal_to_html(path)
+                                  for path in paths})
+    self.assertEquals(expect, self.read_file('index.html'))
+
+  def test_stream_document(self):
+    documents = []
+    for stream in [False, True]:
+      path = os.path.join(self.temp_dir, 'stream{0}.html'.format(stream))
+      document_manager = HtmlDocumentManager(title='Test')
+      document_manager.has_key = False
+      if stream:
+        document_manager.begin_stream_to_path(path)
+        self.assertTrue(document_manager.is_streaming)
+      document_manager.write('<table>')
+      document_manager.write('</table>')
+      if stream:
+        # The start of the document is already there.
+        self.assertTrue(self.read_file(path).startswith('<!DOCTYPE html>'))
+        self.assertRaises(ValueError, document_manager.build_to_path, 'x.html')
+      document_manager.build_to_path(path)
+      self.assertFalse(document_manager.is_streaming)
+      documents.append(self.read_file(path))
+    self.assertEquals(documents[0], documents[1])
+
+  def test_follow(self):
+    path = os.path.join(self.temp_dir, 'live.journal')
+    journal = Journal(now_function=TestClock())
+    journal.open_with_path(path)
+
+    def write_tests():
+      for index in range(3):
+        journal.begin_context('Test {0}'.format(index))
+        journal.write_message('Running test {0}'.format(index))
+        journal.end_context(relation='VALID')
+        journal.flush()
+      journal.terminate()
+
+    writer = threading.Thread(target=write_tests)
+    writer.start()
+    summary = journal_to_html(path, follow=True)
+    writer.join()
+    self.assertEquals(3, summary.passed_count)
+
+    live_html = self.read_file('live.html')
+    journal_to_html(path)
+    self.assertEquals(self.read_file('live.html'), live_html)
+
+  def test_follow_timeout(self):
+    path = os.path.join(self.temp_dir, 'unfinished.journal')
+    journal = Journal(now_function=TestClock())
+    journal.open_with_path(path)
+    journal.begin_context('Test')
+    journal.flush()
+
+    processor = HtmlRenderer(HtmlDocumentManager(title='Test'))
+    self.assertFalse(
+        processor.follow(path, poll_interval=0.01, idle_timeout=0.05))
+    journal.end_context()
+    journal.terminate()
+
+  def test_parallel(self):
+    paths = [self.write_journal('journal{0}'.format(index), ['VALID'] * index)
+             for index in range(1, 5)]
+    main(['generate_html_report'] + paths)
+    expect = {name: self.read_file(name)
+              for name in os.listdir(self.temp_dir)
+              if name.endswith('.html')}
+    self.assertEquals(5, len(expect))
+
+    for name in expect:
+      os.remove(name)
+    main(['generate_html_report', '--jobs=3'] + paths)
+    self.assertEquals(expect, {name: self.read_file(name) for name in expect})
+
+
+if __name__ == '__main__':
+  loader = unittest.TestLoader()
+  suite = loader.loadTestsFromTestCase(GenerateHtmlReportTest)
+  unittest.TextTestRunner(verbosity=2).run(suite)
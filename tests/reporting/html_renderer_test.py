@@ -15,7 +15,7 @@
 """Test citest.reporting.html_renderer module."""
 
 import unittest
-from citest.base import (JsonSnapshotable, JsonSnapshot)
+from citest.base import (JsonSnapshotable, JsonSnapshot, diff_json)
 from citest.reporting.html_document_manager import HtmlDocumentManager
 from citest.reporting.html_renderer import HtmlRenderer
 from citest.reporting.html_renderer import ProcessToRenderInfo
@@ -183,6 +183,32 @@ class HtmlRendererTest(unittest.TestCase):
     entity_manager.push_entity_map(json_snapshot.get('_entities'))
     info = processor.process_entity_id(1, snapshot)
 
+  def test_delta_values(self):
+    """Test rendering edges whose values are diffs from earlier edges."""
+    snapshot = JsonSnapshot()
+    entity = snapshot.new_entity()
+    builder = snapshot.edge_builder
+    builder.make(entity, 'First', {'state': 'PENDING'}, format='json')
+    builder.make(entity, 'Second', [], delta_of='First')
+    builder.make(entity, 'Third',
+                 diff_json({'state': 'PENDING'}, {'state': 'DONE'}),
+                 delta_of='Second')
+    builder.make(entity, 'Orphan', [], delta_of='Missing')
+    json_snapshot = snapshot.to_json_object()
+
+    entity_manager = ProcessedEntityManager()
+    processor = ProcessToRenderInfo(
+        HtmlDocumentManager('test_json'), entity_manager)
+    entity_manager.push_entity_map(json_snapshot['_entities'])
+    html = processor.process_entity_id(1, json_snapshot).detail_html
+    entity_manager.pop_entity_map(json_snapshot['_entities'])
+
+    self.assertIn('Unchanged from First', html)
+    self.assertIn('1 changes from Second', html)
+    self.assertIn('Reconstructed Third', html)
+    self.assertIn('"state": "DONE"', html)
+    self.assertIn('Could not reconstruct from Missing', html)
+
 
 if __name__ == '__main__':
   loader = unittest.TestLoader()
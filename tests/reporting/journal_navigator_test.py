@@ -0,0 +1,259 @@
+# Copyright 2015 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test citest.reporting.journal_navigator module."""
+# pylint: disable=missing-docstring
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from citest.base import (
+    Journal,
+    JournalIndex,
+    JsonSnapshotable,
+    index_path_for_journal,
+    map_record_file)
+from citest.reporting import JournalNavigator
+
+
+class TestClock(object):
+  def __init__(self):
+    self.next_time = 100
+
+  def __call__(self):
+    self.next_time += 1
+    return self.next_time - 1
+
+
+class TestSnapshotable(JsonSnapshotable):
+  def export_to_json_snapshot(self, snapshot, entity):
+    snapshot.edge_builder.make_data(entity, 'Message', 'Snapshot message')
+
+
+class JournalNavigatorTest(unittest.TestCase):
+  def setUp(self):
+    self.temp_dir = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.temp_dir)
+
+  def write_journal(self, compression=None, index=True):
+    path = os.path.join(self.temp_dir, 'test.journal')
+    journal = Journal(now_function=TestClock())
+    journal.open_with_path(path, _compression=compression, _index=index)
+    for test in ['A', 'B']:
+      journal.begin_context('Test ' + test)
+      journal.write_message('Starting ' + test)
+      journal.begin_context('Inner')
+      journal.write_message('Inside ' + test)
+      journal.end_context(relation='VALID')
+      journal.end_context(relation='VALID' if test == 'A' else 'INVALID')
+    journal.terminate()
+    return path
+
+  def test_index(self):
+    path = self.write_journal()
+    index = JournalIndex.load_from_path(index_path_for_journal(path))
+
+    # start + 2 * (begin, message, begin, message, end, end) + finish
+    self.assertEquals(14, index.num_entries)
+    self.assertEquals(0, index.get_entry_offset(0))
+    self.assertEquals(100, index.get_entry_timestamp(0))
+    self.assertEquals('JournalMessage', index.get_entry_type(0))
+    self.assertEquals('JournalContextControl', index.get_entry_type(1))
+
+    self.assertEquals(
+        [('Test A', 1, 1, 6, 'VALID'), ('Inner', 2, 3, 5, 'VALID'),
+         ('Test B', 1, 7, 12, 'INVALID'), ('Inner', 2, 9, 11, 'VALID')],
+        [(context.title, context.depth, context.begin_entry,
+          context.end_entry, context.relation)
+         for context in index.contexts])
+    self.assertEquals([9], [context.begin_entry
+                            for context in index.find_contexts('Inner')[1:]])
+    self.assertEquals([2, 3, 4], index.find_entries_in_time_window(102, 104))
+
+  def test_iterate_context(self):
+    for compression in [None, 'gzip']:
+      navigator = JournalNavigator()
+      navigator.open(self.write_journal(compression=compression))
+      try:
+        self.assertEquals(
+            ['Test B', 'Starting B', 'Inner', 'Inside B', None, None],
+            [entry.get('_title', entry.get('_value'))
+             for entry in navigator.iterate_context('Test B')])
+        self.assertEquals(
+            ['Inside A', 'Inside B'],
+            [entry['_value']
+             for entry in navigator.iterate_context('Inner')
+             if entry['_type'] == 'JournalMessage'])
+      finally:
+        navigator.close()
+
+  def test_iterate_time_window(self):
+    navigator = JournalNavigator()
+    navigator.open(self.write_journal())
+    try:
+      self.assertEquals(
+          [110, 111, 112],
+          [entry['_timestamp']
+           for entry in navigator.iterate_time_window(110, 112)])
+
+      # Seeking backwards and resuming normal iteration.
+      navigator.seek_to_entry(1)
+      self.assertEquals('Test A', navigator.next()['_title'])
+      self.assertEquals('Starting A', navigator.next()['_value'])
+    finally:
+      navigator.close()
+
+  def test_iterate_types(self):
+    for index in [False, True]:
+      path = os.path.join(self.temp_dir, 'types.journal')
+      journal = Journal(now_function=TestClock())
+      journal.open_with_path(path, _index=index)
+      journal.begin_context('Test A')
+      journal.store(TestSnapshotable())
+      journal.write_message('A message')
+      journal.end_context(relation='VALID')
+      journal.terminate()
+
+      navigator = JournalNavigator()
+      navigator.open(path)
+      try:
+        self.assertEquals(
+            ['BEGIN', 'END'],
+            [entry['control'] for entry in
+             navigator.iterate_types(['JournalContextControl'])])
+      finally:
+        navigator.close()
+
+      navigator.open(path)
+      try:
+        self.assertEquals(
+            ['JsonSnapshot'],
+            [entry['_type'] for entry in
+             navigator.iterate_types(['JsonSnapshot'])])
+      finally:
+        navigator.close()
+
+  def test_shared_mapping(self):
+    path = self.write_journal()
+    mapping = map_record_file(path)
+    first = JournalNavigator()
+    second = JournalNavigator()
+    first.open(path, mapping=mapping)
+    second.open(path, mapping=mapping)
+    try:
+      self.assertEquals(
+          ['JournalContextControl', 'JournalMessage'],
+          [entry['_type'] for entry in first.iterate_context('Test B')][:2])
+      self.assertEquals(
+          [entry for entry in second],
+          [entry for entry in first.iterate_time_window(None, None)])
+    finally:
+      first.close()
+      second.close()
+
+    path = self.write_journal(compression='gzip')
+    navigator = JournalNavigator()
+    self.assertRaises(ValueError, navigator.open, path,
+                      mapping=map_record_file(path))
+
+  def test_no_index(self):
+    navigator = JournalNavigator()
+    navigator.open(self.write_journal(index=False))
+    try:
+      self.assertIsNone(navigator.index)
+      self.assertRaises(ValueError, navigator.seek_to_entry, 1)
+      self.assertEquals(14, len([entry for entry in navigator]))
+    finally:
+      navigator.close()
+
+  def test_rewritten_over_stale_index(self):
+    path = os.path.join(self.temp_dir, 'rewritten.journal')
+    for entry_type, index in [('A', True), ('B', False)]:
+      journal = Journal(now_function=TestClock())
+      journal.open_with_path(path, _index=index)
+      for count in range(5):
+        journal.write_message('Message {0}'.format(count), _type=entry_type)
+      journal.terminate()
+    self.assertFalse(os.path.exists(index_path_for_journal(path)))
+
+    navigator = JournalNavigator()
+    navigator.open(path)
+    try:
+      self.assertIsNone(navigator.index)
+      self.assertEquals(5, len([entry for entry in
+                                navigator.iterate_types(['B'])]))
+      self.assertRaises(ValueError, navigator.seek_to_entry, 3)
+    finally:
+      navigator.close()
+
+  def test_index_for_other_journal(self):
+    path = self.write_journal()
+    other_path = os.path.join(self.temp_dir, 'other.journal')
+    journal = Journal(now_function=TestClock())
+    journal.open_with_path(other_path)
+    journal.write_message('Other message', _type='B')
+    journal.terminate()
+
+    # The journal is replaced without going through open_with_path.
+    os.rename(other_path, path)
+    navigator = JournalNavigator()
+    navigator.open(path)
+    try:
+      self.assertIsNone(navigator.index)
+      self.assertEquals(['Other message'],
+                        [entry['_value'] for entry in
+                         navigator.iterate_types(['B'])])
+    finally:
+      navigator.close()
+
+  def test_follow(self):
+    for compression in [None, 'gzip']:
+      complete = open(self.write_journal(compression=compression),
+                      'rb').read()
+      path = os.path.join(self.temp_dir, 'follow.journal')
+      writer = open(path, 'wb')
+      navigator = JournalNavigator()
+      navigator.open(path, follow=True)
+      try:
+        self.assertTrue(navigator.following)
+        self.assertEquals([], [entry for entry in navigator])
+
+        # Write the journal in uneven pieces as if it were still being written.
+        entries = []
+        for start in range(0, len(complete), 100):
+          writer.write(complete[start:start + 100])
+          writer.flush()
+          entries.extend([entry for entry in navigator])
+        writer.close()
+      finally:
+        navigator.close()
+
+      navigator.open(path)
+      try:
+        self.assertEquals([entry for entry in navigator], entries)
+      finally:
+        navigator.close()
+
+    self.assertRaises(ValueError, navigator.open, path,
+                      mapping=map_record_file(path), follow=True)
+
+
+if __name__ == '__main__':
+  loader = unittest.TestLoader()
+  suite = loader.loadTestsFromTestCase(JournalNavigatorTest)
+  unittest.TextTestRunner(verbosity=2).run(suite)
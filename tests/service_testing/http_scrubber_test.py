@@ -74,13 +74,12 @@ class HttpScrubberTest(unittest.TestCase):
                'sEcReT': redacted,
                'priVate': redacted,
                'whatever' : 'secret'}
-     # The scrubber scrubs the original for extra safety.
+     # The scrubber leaves the original alone so it can be shared.
      actual_payload = dict(payload)
      self.assertEquals(expect, scrubber.scrub_request(actual_payload))
-     self.assertEquals(expect, actual_payload)
-     actual_payload = dict(payload)
+     self.assertEquals(payload, actual_payload)
      self.assertEquals(expect, scrubber.scrub_response(actual_payload))
-     self.assertEquals(expect, actual_payload)
+     self.assertEquals(payload, actual_payload)
 
      url = 'http://path?password=VALUE'
      self.assertEquals(url, scrubber.scrub_url(url))